@@ -0,0 +1,44 @@
+"""Add pipeline_jobs table
+
+Revision ID: c3a7d91e4f20
+Revises: b1fac52e0cd8
+Create Date: 2026-10-17 10:12:41.508211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7d91e4f20'
+down_revision: Union[str, None] = 'b1fac52e0cd8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('pipeline_jobs',
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('content_id', sa.String(length=36), nullable=False),
+    sa.Column('queue_status', sa.String(length=20), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('ix_pipeline_jobs_user_id', 'pipeline_jobs', ['user_id'], unique=False)
+    op.create_index('ix_pipeline_jobs_queue', 'pipeline_jobs', ['queue_status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pipeline_jobs_queue', table_name='pipeline_jobs')
+    op.drop_index('ix_pipeline_jobs_user_id', table_name='pipeline_jobs')
+    op.drop_table('pipeline_jobs')
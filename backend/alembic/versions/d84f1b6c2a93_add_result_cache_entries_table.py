@@ -0,0 +1,37 @@
+"""Add result_cache_entries table
+
+Revision ID: d84f1b6c2a93
+Revises: c3a7d91e4f20
+Create Date: 2026-10-17 13:40:02.771930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd84f1b6c2a93'
+down_revision: Union[str, None] = 'c3a7d91e4f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('result_cache_entries',
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('stage', sa.String(length=50), nullable=False),
+    sa.Column('blob_path', sa.String(length=500), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index('ix_result_cache_entries_last_accessed_at', 'result_cache_entries', ['last_accessed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_result_cache_entries_last_accessed_at', table_name='result_cache_entries')
+    op.drop_table('result_cache_entries')
@@ -0,0 +1,28 @@
+"""Add batch_id to pipeline_jobs
+
+Revision ID: e5b0c7a41d58
+Revises: d84f1b6c2a93
+Create Date: 2026-10-17 15:02:17.114062
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b0c7a41d58'
+down_revision: Union[str, None] = 'd84f1b6c2a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pipeline_jobs', sa.Column('batch_id', sa.String(length=36), nullable=True))
+    op.create_index('ix_pipeline_jobs_batch_id', 'pipeline_jobs', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pipeline_jobs_batch_id', table_name='pipeline_jobs')
+    op.drop_column('pipeline_jobs', 'batch_id')
@@ -13,16 +13,12 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import uuid
-import os
+import asyncio
 from pathlib import Path
 from PIL import Image
 import io
-from google.cloud import storage
-from google.oauth2 import service_account
 import json
-import tempfile
 import time
-import requests
 import httpx
 
 from app.db.base import get_db
@@ -32,8 +28,10 @@ from app.models.reward_system import AIPrediction, UserCorrection, RewardScore
 from app.schemas.content import ContentResponse, GenerateBackgroundRequest, GenerateBackgroundResponse
 from app.api.routes.auth import get_current_user
 from config import settings
+from app.core.storage import get_storage
 from app.services.vision.product_analyzer import ProductAnalyzer
-from app.services.img_processing.background_removal import BackgroundRemovalService
+from app.services.img_processing.background_removal import get_background_removal_service
+from app.services.img_processing.image_decode import ImageSource, THUMBNAIL_SIZE, make_thumbnail
 
 # ⭐ Few-shot Learning import
 from app.services.fewshot_vision import EnhancedVisionAnalyzer, FewShotVisionAnalyzer
@@ -44,34 +42,6 @@ router = APIRouter()
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-# ===== GCS 클라이언트 (Lazy Initialization) =====
-_storage_client = None
-_bucket = None
-
-def get_gcs_bucket():
-    """GCS 버킷 가져오기 (Lazy Initialization)"""
-    global _storage_client, _bucket
-    
-    if _storage_client is None:
-        # credentials 로드
-        if settings.GOOGLE_APPLICATION_CREDENTIALS:
-            credentials = service_account.Credentials.from_service_account_file(
-                settings.GOOGLE_APPLICATION_CREDENTIALS
-            )
-            _storage_client = storage.Client(credentials=credentials)
-        else:
-            # 환경 변수 기반 (배포 환경)
-            _storage_client = storage.Client()
-        
-        # 버킷 설정
-        bucket_name = settings.GCS_BUCKET_NAME or "adgen-uploads-2026"
-        _bucket = _storage_client.bucket(bucket_name)
-        
-        print(f"✅ GCS 클라이언트 초기화 완료: {bucket_name}")
-    
-    return _bucket
-
-
 # ===== AI Services (Lazy Initialization) =====
 _background_remover = None
 
@@ -79,7 +49,7 @@ def get_background_remover():
     """배경 제거 서비스 가져오기"""
     global _background_remover
     if _background_remover is None:
-        _background_remover = BackgroundRemovalService()
+        _background_remover = get_background_removal_service()
         print("✅ Background Remover initialized")
     return _background_remover
 
@@ -105,7 +75,7 @@ async def upload_content(
     3. UserContent 저장 (예측 결과 포함)
     """
     
-    bucket = get_gcs_bucket()
+    storage = get_storage()
     
     # ===== 1. 파일 검증 =====
     file_ext = Path(file.filename).suffix.lower()
@@ -125,81 +95,66 @@ async def upload_content(
         )
     
     try:
-        image = Image.open(io.BytesIO(contents))
-        width, height = image.size
+        # 헤더만 파싱 (픽셀 디코딩은 썸네일/분석용 축소 디코딩에서만)
+        source = ImageSource(contents)
+        width, height = source.size
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid image file"
         )
     
-    # ===== 2. GCS에 업로드 =====
+    # ===== 2~3. 스토리지 업로드 + Vision AI 분석 (동시 실행) =====
+    # 원본 업로드 / 썸네일 생성·업로드 / Vision 분석은 서로 독립 → 가장 느린 작업만큼만 기다림
     unique_filename = f"{uuid.uuid4()}{file_ext}"
     thumbnail_filename = f"thumb_{unique_filename}"
     
     gcs_path = f"{current_user.user_id}/{unique_filename}"
     gcs_thumb_path = f"{current_user.user_id}/{thumbnail_filename}"
     
-    # 원본 업로드
-    try:
-        blob = bucket.blob(gcs_path)
-        blob.upload_from_string(contents, content_type=f"image/{file_ext[1:]}")
+    async def upload_original():
+        await storage.put(gcs_path, contents, content_type=f"image/{file_ext[1:]}")
         print(f"✅ Uploaded: {gcs_path}")
-    except Exception as e:
-        print(f"❌ GCS Upload Error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to upload image to storage"
-        )
     
-    # 썸네일 업로드
-    try:
-        thumb_image = image.copy()
-        thumb_image.thumbnail((300, 300))
-        thumb_buffer = io.BytesIO()
-        thumb_image.save(thumb_buffer, format=image.format or 'JPEG')
-        thumb_buffer.seek(0)
-        
-        thumb_blob = bucket.blob(gcs_thumb_path)
-        thumb_blob.upload_from_string(
-            thumb_buffer.read(),
-            content_type=f"image/{file_ext[1:]}"
-        )
-        print(f"✅ Uploaded thumbnail: {gcs_thumb_path}")
-    except Exception as e:
-        print(f"❌ Thumbnail Upload Error: {e}")
+    async def upload_thumbnail():
+        try:
+            # 축소 디코딩 (JPEG은 DCT 스케일링으로 원본 전체를 디코딩하지 않음), 스레드에서 실행
+            thumb_bytes = await asyncio.to_thread(source.encode_reduced, THUMBNAIL_SIZE)
+            
+            await storage.put(gcs_thumb_path, thumb_bytes, content_type=f"image/{file_ext[1:]}")
+            print(f"✅ Uploaded thumbnail: {gcs_thumb_path}")
+        except Exception as e:
+            print(f"❌ Thumbnail Upload Error: {e}")
     
-    # ===== 3. ⭐ Vision AI 분석 (Few-shot Learning 적용) =====
-    vision_data = {}
-
-    try:
-        # 임시 파일로 저장
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            tmp_file.write(contents)
-            tmp_path = tmp_file.name
-        
-        print(f"\n{'='*60}")
-        print(f"🔍 Vision AI 분석 시작 (Few-shot Learning)")
-        print(f"{'='*60}")
-        print(f"임시 파일: {tmp_path}")
-        print(f"카테고리 힌트: {category}")
-
-        # ⭐ Few-shot Vision Analyzer 사용
-        base_analyzer = ProductAnalyzer(provider="gemini")
-        enhanced_analyzer = EnhancedVisionAnalyzer(db, base_analyzer)
-        
-        vision_result = await enhanced_analyzer.analyze(
-            tmp_path,
-            category=category,
-            use_fewshot=True  # ⭐ Few-shot 활성화
-        )
-        
-        # 임시 파일 삭제
-        os.unlink(tmp_path)
-        
-        print(f"📊 Vision AI 결과: {vision_result}")
-        
-        if vision_result.get('success'):
+    # ⭐ Vision AI 분석 (Few-shot Learning 적용)
+    async def analyze_vision() -> dict:
+        try:
+            # 분석 입력: VISION_MAX_SIDE 이하로 축소 디코딩한 bytes (임시 파일 없이 직접 전달)
+            vision_bytes, vision_mime = await asyncio.to_thread(source.vision_input, settings.VISION_MAX_SIDE)
+            
+            print(f"\n{'='*60}")
+            print(f"🔍 Vision AI 분석 시작 (Few-shot Learning)")
+            print(f"{'='*60}")
+            print(f"분석 입력: {len(vision_bytes)} bytes ({vision_mime})")
+            print(f"카테고리 힌트: {category}")
+
+            # ⭐ Few-shot Vision Analyzer 사용
+            base_analyzer = ProductAnalyzer(provider="gemini")
+            enhanced_analyzer = EnhancedVisionAnalyzer(db, base_analyzer)
+            
+            vision_result = await enhanced_analyzer.analyze(
+                vision_bytes,
+                category=category,
+                use_fewshot=True,  # ⭐ Few-shot 활성화
+                mime_type=vision_mime
+            )
+            
+            print(f"📊 Vision AI 결과: {vision_result}")
+            
+            if not vision_result.get('success'):
+                print(f"⚠️ Vision AI 분석 실패: {vision_result.get('error')}")
+                return {}
+            
             vision_data = {
                 'category': vision_result.get('category'),
                 'sub_category': vision_result.get('sub_category'),
@@ -210,18 +165,36 @@ async def upload_content(
                 'ai_confidence': vision_result.get('confidence')
             }
             print(f"✅ Vision AI 분석 완료 (Few-shot): {vision_data['category']}, {vision_data['color']}")
-        else:
-            print(f"⚠️ Vision AI 분석 실패: {vision_result.get('error')}")
+            return vision_data
 
+        except Exception as e:
+            print(f"⚠️ Vision AI 오류 (계속 진행): {e}")
+            import traceback
+            traceback.print_exc()
+            return {}
+    
+    original_task = asyncio.create_task(upload_original())
+    thumbnail_task = asyncio.create_task(upload_thumbnail())
+    vision_task = asyncio.create_task(analyze_vision())
+    
+    # 원본 업로드 실패 시 나머지 작업은 취소하고 바로 실패 응답
+    try:
+        await original_task
     except Exception as e:
-        print(f"⚠️ Vision AI 오류 (계속 진행): {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ GCS Upload Error: {e}")
+        thumbnail_task.cancel()
+        vision_task.cancel()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to upload image to storage"
+        )
+    
+    # DB 저장은 원본 업로드 + Vision 결과만 필요 (썸네일은 커밋 후 완료 대기)
+    vision_data = await vision_task
     
     # ===== 4. DB 저장 (UserContent 먼저 저장) =====
-    bucket_name = settings.GCS_BUCKET_NAME or "adgen-uploads-2026"
-    image_url = f"https://storage.googleapis.com/{bucket_name}/{gcs_path}"
-    thumbnail_url = f"https://storage.googleapis.com/{bucket_name}/{gcs_thumb_path}"
+    image_url = storage.public_url(gcs_path)
+    thumbnail_url = storage.public_url(gcs_thumb_path)
     
     content_id = str(uuid.uuid4())
     
@@ -284,6 +257,8 @@ async def upload_content(
     db.commit()
     db.refresh(new_content)
     
+    await thumbnail_task  # 실패해도 예외 없음 (로그만)
+    
     return new_content
 
 
@@ -795,10 +770,9 @@ async def generate_background(
     # ===== 2. 원본 이미지 다운로드 =====
     try:
         print(f"📥 Downloading image: {content.image_url}")
-        response = requests.get(content.image_url)
-        response.raise_for_status()
+        image_bytes = await get_storage().get_url(content.image_url)
         
-        original_image = Image.open(io.BytesIO(response.content))
+        original_image = Image.open(io.BytesIO(image_bytes))
         print(f"✅ Image downloaded: {original_image.size}")
         
     except Exception as e:
@@ -876,7 +850,7 @@ async def generate_background(
 
     # ===== 5. 결과를 GCS에 저장 =====
     try:
-        bucket = get_gcs_bucket()
+        storage = get_storage()
         
         # 결과 이미지 저장
         result_filename = f"generated_{uuid.uuid4()}.png"
@@ -886,33 +860,19 @@ async def generate_background(
         result_image.save(result_buffer, format='PNG')
         result_buffer.seek(0)
         
-        result_blob = bucket.blob(result_gcs_path)
-        result_blob.upload_from_string(
-            result_buffer.read(),
-            content_type="image/png"
-        )
-        
-        bucket_name = settings.GCS_BUCKET_NAME or "adgen-uploads-2026"
-        result_url = f"https://storage.googleapis.com/{bucket_name}/{result_gcs_path}"
+        result_url = await storage.put(result_gcs_path, result_buffer.read(), content_type="image/png")
         print(f"✅ Result uploaded: {result_url}")
         
         # 썸네일 저장
         thumb_filename = f"thumb_{result_filename}"
         thumb_gcs_path = f"{current_user.user_id}/generated/{thumb_filename}"
         
-        thumb_image = result_image.copy()
-        thumb_image.thumbnail((300, 300))
+        thumb_image = make_thumbnail(result_image, THUMBNAIL_SIZE)
         thumb_buffer = io.BytesIO()
         thumb_image.save(thumb_buffer, format='PNG')
         thumb_buffer.seek(0)
         
-        thumb_blob = bucket.blob(thumb_gcs_path)
-        thumb_blob.upload_from_string(
-            thumb_buffer.read(),
-            content_type="image/png"
-        )
-        
-        thumbnail_url = f"https://storage.googleapis.com/{bucket_name}/{thumb_gcs_path}"
+        thumbnail_url = await storage.put(thumb_gcs_path, thumb_buffer.read(), content_type="image/png")
         print(f"✅ Thumbnail uploaded: {thumbnail_url}")
         
     except Exception as e:
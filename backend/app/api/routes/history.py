@@ -4,12 +4,12 @@
 /api/v1/history/{history_id} (DELETE) - 히스토리 삭제
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-import zipfile
-from io import BytesIO
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
 from datetime import datetime, timedelta, timezone
 import math
 
@@ -17,9 +17,21 @@ from app.db.base import get_db
 from app.models.schemas import GenerationHistory, UserContent, User
 from app.api.routes.auth import get_current_user
 from app.models.caption_system import AdCopyHistory
+from app.core.image_encoding import MIME_TYPES
+from app.core.image_delivery import image_response
+from app.core.zip_stream import ZipEntry, stream_zip
 
 router = APIRouter()
 
+# 일괄 다운로드 최대 개수
+MAX_BATCH_DOWNLOAD = 50
+
+
+def _image_type(url: str) -> tuple:
+    """결과 URL 확장자 → (확장자, MIME 타입) - 단계별 인코딩 정책에 따라 png / jpg / webp"""
+    ext = PurePosixPath(urlparse(url).path).suffix.lower().lstrip(".") or "png"
+    return ext, MIME_TYPES.get(ext, "image/png")
+
 
 # ===== Response Schema =====
 from pydantic import BaseModel
@@ -186,46 +198,11 @@ async def delete_history(
         "history_id": history_id
     }
 
-def download_from_gcs(image_url: str) -> bytes:
-    """
-    GCS에서 이미지 다운로드
-    
-    Args:
-        image_url: GCS URL (예: https://storage.googleapis.com/bucket/path/file.png)
-    
-    Returns:
-        이미지 바이트
-    """
-    from google.cloud import storage
-    from google.oauth2 import service_account
-    from config import settings
-    
-    # GCS 클라이언트
-    if settings.GOOGLE_APPLICATION_CREDENTIALS:
-        credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_APPLICATION_CREDENTIALS
-        )
-        client = storage.Client(credentials=credentials)
-    else:
-        client = storage.Client()
-    
-    # URL에서 버킷명과 경로 추출
-    # https://storage.googleapis.com/bucket-name/user_id/generations/file.png
-    parts = image_url.replace("https://storage.googleapis.com/", "").split("/")
-    bucket_name = parts[0]
-    gcs_path = "/".join(parts[1:])
-    
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(gcs_path)
-    
-    # 다운로드
-    image_bytes = blob.download_as_bytes()
-    
-    return image_bytes
-
 @router.get("/history/{history_id}/download")
 async def download_vton_result(
     history_id: str,
+    request: Request,
+    mode: str | None = Query(None, pattern="^(redirect|proxy)$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -234,9 +211,10 @@ async def download_vton_result(
     
     Args:
         history_id: GenerationHistory ID
+        mode: redirect (서명 URL) / proxy (None이면 IMAGE_DELIVERY_MODE)
     
     Returns:
-        PNG 이미지 파일
+        이미지 파일 (또는 서명 URL로 리다이렉트)
     """
     
     print(f"\n📥 VTON 이미지 다운로드 요청: {history_id}")
@@ -259,30 +237,23 @@ async def download_vton_result(
             detail="이미지 URL이 없습니다."
         )
     
-    # 2. GCS에서 이미지 다운로드
+    # 2. 파일명 생성
+    created_date = history.created_at.strftime("%Y%m%d")
+    ext, media_type = _image_type(history.result_url)
+    filename = f"vton_{history.style}_{created_date}_{history_id[:8]}.{ext}"
+    
+    # 3. 다운로드 응답 (서명 URL 리다이렉트 또는 스토리지에서 읽어 전달)
     try:
-        image_bytes = download_from_gcs(history.result_url)
-        print(f"✅ 이미지 다운로드 완료: {len(image_bytes)} bytes")
+        return await image_response(
+            request, history.result_url, media_type,
+            f"attachment; filename={filename}", mode=mode
+        )
     except Exception as e:
-        print(f"❌ GCS 다운로드 실패: {e}")
+        print(f"❌ 스토리지 다운로드 실패: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"이미지 다운로드 실패: {str(e)}"
         )
-    
-    # 3. 파일명 생성
-    created_date = history.created_at.strftime("%Y%m%d")
-    filename = f"vton_{history.style}_{created_date}_{history_id[:8]}.png"
-    
-    # 4. 다운로드 응답
-    return Response(
-        content=image_bytes,
-        media_type="image/png",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}",
-            "Content-Length": str(len(image_bytes))
-        }
-    )
 
 
 @router.post("/history/download-batch")
@@ -303,48 +274,36 @@ async def download_multiple_vton_results(
     
     print(f"\n📦 일괄 다운로드 요청: {len(history_ids)}개")
     
-    if len(history_ids) > 50:
+    if len(history_ids) > MAX_BATCH_DOWNLOAD:
         raise HTTPException(
             status_code=400,
-            detail="한 번에 최대 50개까지만 다운로드 가능합니다."
+            detail=f"한 번에 최대 {MAX_BATCH_DOWNLOAD}개까지만 다운로드 가능합니다."
         )
     
-    # ZIP 파일 생성
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for idx, history_id in enumerate(history_ids, 1):
-            # 히스토리 조회
-            history = db.query(GenerationHistory).filter(
-                GenerationHistory.generation_id == history_id,
-                GenerationHistory.user_id == current_user.user_id
-            ).first()
-            
-            if not history or not history.result_url:
-                print(f"⚠️ {history_id}: 건너뜀 (없거나 URL 없음)")
-                continue
-            
-            try:
-                # GCS에서 다운로드
-                image_bytes = download_from_gcs(history.result_url)
-                
-                # ZIP에 추가
-                created_date = history.created_at.strftime("%Y%m%d")
-                filename = f"{idx:02d}_vton_{history.style}_{created_date}.png"
-                zip_file.writestr(filename, image_bytes)
-                
-                print(f"✅ {idx}/{len(history_ids)}: {filename} 추가")
-                
-            except Exception as e:
-                print(f"❌ {history_id} 실패: {e}")
-                continue
-    
-    # ZIP 버퍼 되돌리기
-    zip_buffer.seek(0)
-    
-    # 다운로드 응답
-    return Response(
-        content=zip_buffer.getvalue(),
+    # 히스토리 한 번에 조회 (본인 것만)
+    histories = {
+        h.generation_id: h
+        for h in db.query(GenerationHistory).filter(
+            GenerationHistory.generation_id.in_(history_ids),
+            GenerationHistory.user_id == current_user.user_id
+        ).all()
+    }
+    
+    entries = []
+    for idx, history_id in enumerate(history_ids, 1):
+        history = histories.get(history_id)
+        if not history or not history.result_url:
+            print(f"⚠️ {history_id}: 건너뜀 (없거나 URL 없음)")
+            continue
+        
+        created_date = history.created_at.strftime("%Y%m%d")
+        ext, _ = _image_type(history.result_url)
+        filename = f"{idx:02d}_vton_{history.style}_{created_date}.{ext}"
+        entries.append(ZipEntry(filename, history.result_url))
+    
+    # ZIP 스트리밍 응답 (다운로드되는 대로 기록)
+    return StreamingResponse(
+        stream_zip(entries),
         media_type="application/zip",
         headers={
             "Content-Disposition": f"attachment; filename=vton_results_{len(history_ids)}.zip"
@@ -355,6 +314,8 @@ async def download_multiple_vton_results(
 @router.get("/history/{history_id}/preview")
 async def preview_vton_result(
     history_id: str,
+    request: Request,
+    mode: str | None = Query(None, pattern="^(redirect|proxy)$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -363,9 +324,10 @@ async def preview_vton_result(
     
     Args:
         history_id: GenerationHistory ID
+        mode: redirect (서명 URL) / proxy (None이면 IMAGE_DELIVERY_MODE)
     
     Returns:
-        PNG 이미지 (inline)
+        결과 이미지 (inline)
     """
     
     # GenerationHistory 조회
@@ -380,23 +342,17 @@ async def preview_vton_result(
     if not history.result_url:
         raise HTTPException(status_code=400, detail="No image URL")
     
-    # GCS에서 이미지 다운로드
+    # 미리보기 응답 (inline: 다운로드 대신 표시)
     try:
-        image_bytes = download_from_gcs(history.result_url)
+        return await image_response(
+            request, history.result_url, _image_type(history.result_url)[1],
+            "inline", mode=mode
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to load image: {str(e)}"
         )
-    
-    # 미리보기 응답 (inline)
-    return Response(
-        content=image_bytes,
-        media_type="image/png",
-        headers={
-            "Content-Disposition": "inline"  # 다운로드 대신 표시
-        }
-    )
 
 @router.get("/ad-copy-history", response_model=AdCopyHistoryResponse)
 async def get_ad_copy_history(
@@ -533,6 +489,8 @@ async def delete_ad_copy(
 @router.get("/ad-copy-history/{ad_copy_id}/download")
 async def download_ad_copy_image(
     ad_copy_id: str,
+    request: Request,
+    mode: str | None = Query(None, pattern="^(redirect|proxy)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -544,14 +502,60 @@ async def download_ad_copy_image(
     if not ad_copy or not ad_copy.final_image_url:
         raise HTTPException(status_code=404, detail="Content not found")
 
+    ext, media_type = _image_type(ad_copy.final_image_url)
+    filename = f"ad_{ad_copy.template_used}_{ad_copy_id[:8]}.{ext}"
     try:
-        image_bytes = download_from_gcs(ad_copy.final_image_url)
+        return await image_response(
+            request, ad_copy.final_image_url, media_type,
+            f"attachment; filename={filename}", mode=mode
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"이미지 다운로드 실패: {str(e)}")
 
-    filename = f"ad_{ad_copy.template_used}_{ad_copy_id[:8]}.png"
-    return Response(
-        content=image_bytes,
-        media_type="image/png",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
\ No newline at end of file
+
+@router.post("/ad-copy-history/download-batch")
+async def download_multiple_ad_copy_images(
+    ad_copy_ids: List[str],
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    여러 광고 이미지(final_image_url)를 ZIP으로 일괄 다운로드
+
+    Args:
+        ad_copy_ids: AdCopyHistory ID 목록
+
+    Returns:
+        ZIP 파일 (스트리밍)
+    """
+    if len(ad_copy_ids) > MAX_BATCH_DOWNLOAD:
+        raise HTTPException(
+            status_code=400,
+            detail=f"한 번에 최대 {MAX_BATCH_DOWNLOAD}개까지만 다운로드 가능합니다."
+        )
+
+    ad_copies = {
+        a.ad_copy_id: a
+        for a in db.query(AdCopyHistory).filter(
+            AdCopyHistory.ad_copy_id.in_(ad_copy_ids),
+            AdCopyHistory.user_id == current_user.user_id
+        ).all()
+    }
+
+    entries = []
+    for idx, ad_copy_id in enumerate(ad_copy_ids, 1):
+        ad_copy = ad_copies.get(ad_copy_id)
+        if not ad_copy or not ad_copy.final_image_url:
+            continue
+        ext, _ = _image_type(ad_copy.final_image_url)
+        filename = f"{idx:02d}_ad_{ad_copy.template_used}_{ad_copy_id[:8]}.{ext}"
+        entries.append(ZipEntry(filename, ad_copy.final_image_url))
+
+    if not entries:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=ad_images_{len(entries)}.zip"}
+    )
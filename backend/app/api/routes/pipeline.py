@@ -2,12 +2,17 @@
 파이프라인 실행 API 엔드포인트
 POST /api/v1/pipeline/run  → 파이프라인 실행
 GET  /api/v1/pipeline/{job_id}/status → 상태 조회
+POST /api/v1/pipeline/{job_id}/resume → 실패한 단계부터 재개
+POST /api/v1/pipeline/batch → 여러 상품 × 여러 스타일 배치 실행
+GET  /api/v1/pipeline/batch/{batch_id}/status → 배치 진행 상황 조회
+WS   /ws/pipeline/batch/{batch_id} → 배치 진행 상황 스트리밍
 WS   /ws/pipeline/{job_id} → 실시간 상태 스트리밍
 """
 import uuid
+import time
 import asyncio
 import logging
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
@@ -15,18 +20,33 @@ from pydantic import BaseModel
 from app.db.base import get_db
 from app.models.schemas import User, UserContent
 from app.api.routes.auth import get_current_user
-from app.services.pipeline.state import create_initial_state, PipelineState
+from app.services.pipeline.state import (
+    create_initial_state,
+    create_resume_state,
+    mark_upload_failed,
+    apply_state_update,
+    summarize_branches,
+    PipelineState,
+)
 from app.services.pipeline.graph import get_pipeline_graph
 from app.services.pipeline.nodes import set_ws_broadcast
+from app.services.pipeline.artifacts import get_artifact_store, release_artifact_store
+from app.services.pipeline.job_queue import get_job_queue
+from app.services.pipeline.result_cache import get_result_cache
+from app.services.pipeline.batch import summarize_batch
+from app.services.pipeline.worker import start_worker_pool, stop_worker_pool, get_worker_pool
 from app.api.routes.websocket import manager
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 실행 중인 파이프라인 상태 저장 (인메모리)
-# 프로덕션에서는 Redis로 교체 권장
-_pipeline_states: dict[str, PipelineState] = {}
+# 이 인스턴스에서 실행 중인 job의 최신 상태 (노드 부분 업데이트 병합용)
+# 공유 상태는 job 큐 백엔드에 저장 → status 조회 / 다른 인스턴스 WebSocket
+_running_states: dict[str, PipelineState] = {}
+_running_workers: dict[str, str] = {}   # job_id → lease를 가진 worker_id (상태 저장 시 소유권 확인)
+_persist_locks: dict[str, asyncio.Lock] = {}
 
 
 # ===== Request/Response =====
@@ -37,12 +57,14 @@ class PipelineRunRequest(BaseModel):
     model_index: Optional[int] = None
     user_prompt: Optional[str] = None
     ad_inputs: Optional[dict] = None
+    styles: Optional[List[str]] = None  # 여러 스타일을 하나의 job으로 (공통 단계 1회 실행)
 
     class Config:
         json_schema_extra = {
             "example": {
                 "content_id": "uuid-here",
                 "style": "resort",
+                "styles": None,
                 "model_index": None,
                 "user_prompt": "밝고 화사한 느낌으로",
                 "ad_inputs": {
@@ -60,37 +82,148 @@ class PipelineRunResponse(BaseModel):
     ws_url: str     # 프론트에서 WebSocket 연결할 URL
 
 
+class PipelineBatchRequest(BaseModel):
+    content_ids: List[str]
+    styles: List[str] = ["resort"]  # 상품마다 모든 스타일 생성
+    model_index: Optional[int] = None
+    user_prompt: Optional[str] = None
+    ad_inputs: Optional[dict] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "content_ids": ["uuid-1", "uuid-2"],
+                "styles": ["resort", "retro", "romantic"],
+                "model_index": None,
+                "user_prompt": None,
+                "ad_inputs": None
+            }
+        }
+
+
+class PipelineBatchJob(BaseModel):
+    job_id: str
+    content_id: str
+    style: str
+
+
+class PipelineBatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    message: str
+    jobs: List[PipelineBatchJob]
+    ws_url: str     # 배치 전체 진행 상황 WebSocket URL
+
+
+VALID_STYLES = ["resort", "retro", "romantic"]
+
+
 # ===== 파이프라인 실행 함수 =====
 
-async def _run_pipeline(job_id: str, initial_state: PipelineState):
-    """백그라운드에서 파이프라인 실행"""
+async def _persist_state(job_id: str):
+    """
+    최신 상태를 공유 저장소에 기록
+    job별 lock으로 직렬화하고 lock 획득 시점의 최신 상태를 쓰므로 오래된 상태가 덮어쓰지 않음
+    """
+    lock = _persist_locks.setdefault(job_id, asyncio.Lock())
+    async with lock:
+        state = _running_states.get(job_id)
+        worker_id = _running_workers.get(job_id)
+        if state is not None and worker_id is not None:
+            if not await get_job_queue().save_state(job_id, state, worker_id):
+                logger.warning(f"[Pipeline] lease 상실로 상태 저장 무시: job_id={job_id}, worker={worker_id}")
+
+
+async def _broadcast_update(job_id: str, update: dict):
+    """
+    노드 부분 업데이트 병합 → WebSocket 전송 + 공유 저장소 기록
+    단계 성공 직후 기록된 상태가 재개(resume) 시 체크포인트로 사용됨
+    """
+    if job_id not in _running_states:
+        return
+    state = apply_state_update(_running_states[job_id], update)
+    _running_states[job_id] = state
+    await manager.broadcast(job_id, state)
     try:
-        # WebSocket 브로드캐스트 함수 주입
-        async def _broadcast(jid: str, state: PipelineState):
-            _pipeline_states[jid] = state
-            await manager.broadcast(jid, state)
+        await _persist_state(job_id)
+    except Exception as e:
+        logger.error(f"[Pipeline] 상태 저장 실패: job_id={job_id}, error={e}")
+
+
+async def _run_pipeline(initial_state: PipelineState, worker_id: str):
+    """워커 풀에서 claim한 job 실행 (worker_id: lease 소유 워커, 상태 저장 시 소유권 확인)"""
+    job_id = initial_state["job_id"]
+    queue = get_job_queue()
+    _running_states[job_id] = initial_state
+    _running_workers[job_id] = worker_id
 
-        set_ws_broadcast(_broadcast)
+    try:
+        # WebSocket 브로드캐스트 함수 주입
+        # 병렬 노드는 부분 업데이트만 전달하므로 저장된 상태에 병합 후 전송
+        set_ws_broadcast(_broadcast_update)
 
-        # LangGraph 실행
-        graph = get_pipeline_graph()
+        # LangGraph 실행 (스타일 여러 개 → 공통 단계 후 스타일별 분기)
+        graph = get_pipeline_graph(multi_style=bool(initial_state.get("styles")))
         final_state = await graph.ainvoke(initial_state)
 
+        # 백그라운드 GCS 업로드 완료 대기 (결과물 내구성 보장)
+        store = get_artifact_store(job_id)
+        upload_failures = []
+        try:
+            await store.flush()
+        except Exception as e:
+            logger.error(f"[Pipeline] 결과 업로드 실패: job_id={job_id}, error={e}", exc_info=True)
+            upload_failures = store.failed_uploads()
+            final_state["status"] = "failed"
+            final_state["error"] = final_state.get("error") or f"결과 업로드 실패: {e}"
+
         # 최종 상태 업데이트
         if final_state["status"] != "failed":
             final_state["status"] = "success"
 
-        _pipeline_states[job_id] = final_state
+        # 업로드 완료 시 전송된 result_url 등을 유지하며 병합
+        final_state = apply_state_update(_running_states[job_id], final_state)
+
+        # 업로드에 실패한 결과의 단계는 실패로 되돌림 → 재개 시 다시 실행
+        for owner, error in upload_failures:
+            if owner:
+                final_state = mark_upload_failed(final_state, owner[0], owner[1], str(error))
+        _running_states[job_id] = final_state
+        if not await queue.finish(job_id, final_state, worker_id):
+            # lease를 잃음 → 다른 워커가 이어서 실행 중이므로 결과를 기록하지 않음
+            logger.warning(f"[Pipeline] lease 상실로 결과 기록 무시: job_id={job_id}, worker={worker_id}")
+            return
         await manager.broadcast(job_id, final_state)
 
         logger.info(f"[Pipeline] 완료: job_id={job_id}, status={final_state['status']}")
 
+    except asyncio.CancelledError:
+        # 인스턴스 종료 → 워커 풀이 대기열로 반환
+        raise
     except Exception as e:
         logger.error(f"[Pipeline] 오류: job_id={job_id}, error={e}", exc_info=True)
-        if job_id in _pipeline_states:
-            _pipeline_states[job_id]["status"] = "failed"
-            _pipeline_states[job_id]["error"] = str(e)
-            await manager.broadcast(job_id, _pipeline_states[job_id])
+        state = dict(_running_states[job_id])
+        state["status"] = "failed"
+        state["error"] = str(e)
+        if await queue.finish(job_id, state, worker_id):
+            await manager.broadcast(job_id, state)
+    finally:
+        # 같은 인스턴스의 다른 워커가 이미 다시 claim했으면 그쪽 상태는 유지
+        if _running_workers.get(job_id) == worker_id:
+            _running_states.pop(job_id, None)
+            _running_workers.pop(job_id, None)
+            _persist_locks.pop(job_id, None)
+            release_artifact_store(job_id)
+
+
+# ===== 워커 풀 (main.py lifespan에서 호출) =====
+
+def start_pipeline_workers():
+    start_worker_pool(_run_pipeline)
+
+
+async def stop_pipeline_workers():
+    await stop_worker_pool()
 
 
 # ===== API 엔드포인트 =====
@@ -106,6 +239,7 @@ async def run_pipeline(
 
     - content_id: 이미 업로드된 상품 이미지 ID
     - style: resort / retro / romantic
+    - styles: 여러 스타일 동시 생성 (상품 선택 / 배경 제거는 1회만 실행, 결과는 branches[스타일])
     - 실행 후 즉시 job_id 반환
     - 실시간 상태는 WebSocket으로 수신
     """
@@ -119,11 +253,20 @@ async def run_pipeline(
         raise HTTPException(status_code=404, detail="콘텐츠를 찾을 수 없습니다.")
 
     # 스타일 검증
-    valid_styles = ["resort", "retro", "romantic"]
-    if request.style not in valid_styles:
+    styles = list(dict.fromkeys(request.styles or [request.style]))
+    invalid = [s for s in styles if s not in VALID_STYLES]
+    if not styles or invalid:
         raise HTTPException(
             status_code=400,
-            detail=f"유효하지 않은 스타일입니다. 선택 가능: {valid_styles}"
+            detail=f"유효하지 않은 스타일입니다. 선택 가능: {VALID_STYLES}"
+        )
+
+    # 대기열 포화 시 거절 (인스턴스 과부하 방지)
+    queue = get_job_queue()
+    if await queue.pending_count() >= settings.PIPELINE_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요."
         )
 
     # 초기 상태 생성
@@ -132,34 +275,150 @@ async def run_pipeline(
         job_id=job_id,
         user_id=current_user.user_id,
         content_id=request.content_id,
-        style=request.style,
+        style=styles[0],
         model_index=request.model_index,
         user_prompt=request.user_prompt,
         ad_inputs=request.ad_inputs,
+        styles=styles if len(styles) > 1 else None,
     )
 
-    _pipeline_states[job_id] = initial_state
-
-    # 백그라운드 실행
-    asyncio.create_task(_run_pipeline(job_id, initial_state))
+    # 대기열 등록 → 워커 풀이 실행
+    await queue.enqueue(initial_state)
+    pool = get_worker_pool()
+    if pool:
+        pool.notify()
 
-    logger.info(f"[Pipeline] 시작: job_id={job_id}, content_id={request.content_id}")
+    logger.info(f"[Pipeline] 대기열 등록: job_id={job_id}, content_id={request.content_id}")
 
     return PipelineRunResponse(
         job_id=job_id,
         status="pending",
-        message="파이프라인 시작됨. WebSocket으로 실시간 상태를 확인하세요.",
+        message="파이프라인 대기열에 등록됨. WebSocket으로 실시간 상태를 확인하세요.",
         ws_url=f"/ws/pipeline/{job_id}",
     )
 
 
+@router.post("/pipeline/batch", response_model=PipelineBatchResponse)
+async def run_pipeline_batch(
+    request: PipelineBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    여러 상품 × 여러 스타일 배치 실행
+
+    - 상품 × 스타일마다 job 1개 생성 (job 큐 / 워커 풀에서 실행)
+    - 스타일과 무관한 단계(상품 선택, 배경 제거)는 상품당 1회만 실행하여 스타일 간 공유
+    - provider 호출은 provider별 동시 호출 한도 내에서 병렬 처리
+    - 진행 상황은 배치 WebSocket 하나로 수신
+    """
+    content_ids = list(dict.fromkeys(request.content_ids))
+    styles = list(dict.fromkeys(request.styles))
+
+    if not content_ids or not styles:
+        raise HTTPException(status_code=400, detail="content_ids와 styles를 하나 이상 지정해주세요.")
+
+    invalid = [s for s in styles if s not in VALID_STYLES]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"유효하지 않은 스타일입니다: {invalid} (선택 가능: {VALID_STYLES})"
+        )
+
+    total = len(content_ids) * len(styles)
+    if total > settings.PIPELINE_BATCH_MAX_JOBS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"배치 최대 job 수를 초과했습니다: {total} > {settings.PIPELINE_BATCH_MAX_JOBS}"
+        )
+
+    # 상품 존재 확인 (한 번에 조회)
+    owned = {
+        row.content_id for row in db.query(UserContent.content_id).filter(
+            UserContent.content_id.in_(content_ids),
+            UserContent.user_id == current_user.user_id,
+        ).all()
+    }
+    missing = [c for c in content_ids if c not in owned]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"콘텐츠를 찾을 수 없습니다: {missing}")
+
+    # 배치 전체가 대기열 한도 안에 들어와야 등록 (한 요청으로 한도를 넘기지 않도록)
+    queue = get_job_queue()
+    if await queue.pending_count() + total > settings.PIPELINE_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요."
+        )
+
+    # 상품 단위로 연속 등록 → 같은 상품의 스타일별 job이 함께 실행되어 공유 단계 재사용
+    batch_id = str(uuid.uuid4())
+    states = [
+        create_initial_state(
+            job_id=str(uuid.uuid4()),
+            user_id=current_user.user_id,
+            content_id=content_id,
+            style=style,
+            model_index=request.model_index,
+            user_prompt=request.user_prompt,
+            ad_inputs=request.ad_inputs,
+            batch_id=batch_id,
+        )
+        for content_id in content_ids
+        for style in styles
+    ]
+    await queue.enqueue_many(states)
+    pool = get_worker_pool()
+    if pool:
+        pool.notify()
+
+    logger.info(f"[Pipeline] 배치 등록: batch_id={batch_id}, 상품 {len(content_ids)}개 × 스타일 {len(styles)}개")
+
+    return PipelineBatchResponse(
+        batch_id=batch_id,
+        status="pending",
+        message=f"{total}개 job이 대기열에 등록됨. WebSocket으로 전체 진행 상황을 확인하세요.",
+        jobs=[
+            PipelineBatchJob(job_id=s["job_id"], content_id=s["content_id"], style=s["style"])
+            for s in states
+        ],
+        ws_url=f"/ws/pipeline/batch/{batch_id}",
+    )
+
+
+async def _get_batch_summary(batch_id: str) -> Optional[dict]:
+    """배치 집계 (이 인스턴스에서 실행 중인 job은 최신 로컬 상태 사용)"""
+    states = await get_job_queue().get_batch_states(batch_id)
+    if not states:
+        return None
+    states = [_running_states.get(s["job_id"], s) for s in states]
+    return summarize_batch(batch_id, states)
+
+
+@router.get("/pipeline/batch/{batch_id}/status")
+async def get_pipeline_batch_status(
+    batch_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """배치 진행 상황 조회 (폴링용)"""
+    states = await get_job_queue().get_batch_states(batch_id)
+    if not states:
+        raise HTTPException(status_code=404, detail="배치를 찾을 수 없습니다.")
+
+    if states[0]["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=403, detail="접근 권한이 없습니다.")
+
+    states = [_running_states.get(s["job_id"], s) for s in states]
+    return summarize_batch(batch_id, states)
+
+
 @router.get("/pipeline/{job_id}/status")
 async def get_pipeline_status(
     job_id: str,
     current_user: User = Depends(get_current_user),
 ):
-    """파이프라인 상태 조회 (폴링용)"""
-    state = _pipeline_states.get(job_id)
+    """파이프라인 상태 조회 (폴링용, 모든 인스턴스에서 조회 가능)"""
+    state = _running_states.get(job_id) or await get_job_queue().get_state(job_id)
     if not state:
         raise HTTPException(status_code=404, detail="파이프라인을 찾을 수 없습니다.")
 
@@ -173,11 +432,109 @@ async def get_pipeline_status(
         "steps": state["steps"],
         "error": state.get("error"),
         "final_image_url": state.get("final_image_url"),
+        "styles": state.get("styles"),
+        "branches": summarize_branches(state),
+    }
+
+
+@router.post("/pipeline/{job_id}/resume", response_model=PipelineRunResponse)
+async def resume_pipeline(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    실패한 파이프라인 재개
+
+    - 성공한 단계(배경 제거 / 가상 피팅 / 배경 생성 등)의 결과를 재사용
+    - 실패한 단계(error_step)와 그 이후 단계만 다시 실행
+    """
+    queue = get_job_queue()
+    state = await queue.get_state(job_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="파이프라인을 찾을 수 없습니다.")
+
+    if state["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=403, detail="접근 권한이 없습니다.")
+
+    if state["status"] != "failed":
+        raise HTTPException(status_code=409, detail="실패한 파이프라인만 재개할 수 있습니다.")
+
+    if await queue.pending_count() >= settings.PIPELINE_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요."
+        )
+
+    resumed = create_resume_state(state)
+    # 종료(done)된 job일 때만 반영되는 조건부 갱신 → 동시 재개 요청 / 다른 인스턴스에서 실행 중인 job은 거부
+    if not await queue.resubmit(resumed):
+        raise HTTPException(status_code=409, detail="이미 재개되었거나 실행 중인 파이프라인입니다.")
+    pool = get_worker_pool()
+    if pool:
+        pool.notify()
+
+    reused = [name for name, step in resumed["steps"].items() if step["status"] == "success"]
+    logger.info(f"[Pipeline] 재개: job_id={job_id}, error_step={state.get('error_step')}, 재사용 단계={reused}")
+
+    return PipelineRunResponse(
+        job_id=job_id,
+        status="pending",
+        message=f"{state.get('error_step') or 1}단계부터 파이프라인을 재개합니다.",
+        ws_url=f"/ws/pipeline/{job_id}",
+    )
+
+
+@router.get("/pipeline/cache/stats")
+async def get_result_cache_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """결과 캐시 단계별 hit/miss 통계 (이 인스턴스 기준)"""
+    cache = get_result_cache()
+    return {
+        "backend": settings.RESULT_CACHE_BACKEND,
+        "stages": cache.get_stats() if cache else {},
     }
 
 
 # ===== WebSocket 엔드포인트 =====
 
+@router.websocket("/ws/pipeline/batch/{batch_id}")
+async def pipeline_batch_websocket(websocket: WebSocket, batch_id: str):
+    """
+    배치 진행 상황 스트리밍
+
+    job별 WebSocket 대신 배치 전체 집계를 하나의 스트림으로 전송
+    (공유 저장소를 주기적으로 조회하여 변경 시 전송 → 어느 인스턴스에 연결해도 동일)
+    """
+    await websocket.accept()
+
+    try:
+        last_sent = None
+        last_ping = time.monotonic()
+        while True:
+            summary = await _get_batch_summary(batch_id)
+            if summary:
+                fingerprint = (summary["updated_at"], tuple(
+                    (job["status"], job["completed_steps"]) for job in summary["jobs"]
+                ))
+                if fingerprint != last_sent:
+                    await websocket.send_json(summary)
+                    last_sent = fingerprint
+
+            try:
+                await asyncio.wait_for(websocket.receive_text(), timeout=settings.PIPELINE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                # 30초마다 ping
+                if time.monotonic() - last_ping >= 30.0:
+                    await websocket.send_text('{"type": "ping"}')
+                    last_ping = time.monotonic()
+
+    except WebSocketDisconnect:
+        logger.info(f"[WS] 배치 연결 해제: batch_id={batch_id}")
+    except Exception as e:
+        logger.error(f"[WS] 배치 오류: batch_id={batch_id}, error={e}")
+
+
 @router.websocket("/ws/pipeline/{job_id}")
 async def pipeline_websocket(websocket: WebSocket, job_id: str):
     """
@@ -185,22 +542,36 @@ async def pipeline_websocket(websocket: WebSocket, job_id: str):
 
     연결 즉시 현재 상태 전송 후
     각 노드 완료 시마다 상태 업데이트 전송
+
+    job이 다른 인스턴스에서 실행 중이면 공유 저장소를 주기적으로 조회하여 변경 시 전송
     """
     await manager.connect(job_id, websocket)
 
     try:
         # 연결 즉시 현재 상태 전송
-        current_state = _pipeline_states.get(job_id)
+        current_state = _running_states.get(job_id) or await get_job_queue().get_state(job_id)
+        last_sent = None
         if current_state:
-            await manager.broadcast(job_id, current_state)
+            await manager.send(job_id, websocket, current_state)
+            last_sent = current_state.get("updated_at")
 
         # 연결 유지 (클라이언트 disconnect 대기)
+        last_ping = time.monotonic()
         while True:
             try:
-                await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
+                await asyncio.wait_for(websocket.receive_text(), timeout=settings.PIPELINE_POLL_INTERVAL)
             except asyncio.TimeoutError:
+                # 다른 인스턴스에서 실행 중인 job 동기화
+                if job_id not in _running_states:
+                    state = await get_job_queue().get_state(job_id)
+                    if state and state.get("updated_at") != last_sent:
+                        await manager.send(job_id, websocket, state)
+                        last_sent = state.get("updated_at")
+
                 # 30초마다 ping
-                await websocket.send_text('{"type": "ping"}')
+                if time.monotonic() - last_ping >= 30.0:
+                    await websocket.send_text('{"type": "ping"}')
+                    last_ping = time.monotonic()
 
     except WebSocketDisconnect:
         manager.disconnect(job_id, websocket)
@@ -1,25 +1,67 @@
 """
 WebSocket 실시간 상태 스트리밍
 파이프라인 각 단계 상태를 프론트엔드로 전송
+
+- 연결 직후 전체 상태(snapshot) 1회, 이후에는 변경분만 JSON Patch(RFC 6902)로 전송
+- 짧은 시간 안에 연속으로 들어온 상태 변경은 하나로 합쳐 전송 (WS_COALESCE_INTERVAL)
+- 여러 연결에 동시에 전송 → 느린 클라이언트 하나가 다른 연결을 지연시키지 않음
 """
 import json
 import asyncio
 import logging
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 
+from config import settings
+from app.services.pipeline.state import summarize_branches
+
 logger = logging.getLogger(__name__)
 
+# 종료 상태: 합치지 않고 즉시 전송
+TERMINAL_STATUSES = ("success", "failed")
+
+
+def _escape_pointer(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def make_json_patch(old: dict, new: dict, path: str = "") -> list[dict]:
+    """
+    두 상태의 차이 → JSON Patch 연산 목록 (add / remove / replace)
+    dict는 재귀적으로 비교, 그 외 값(list 포함)은 통째로 교체
+    """
+    ops = []
+    for key, value in new.items():
+        pointer = f"{path}/{_escape_pointer(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": pointer, "value": value})
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            ops.extend(make_json_patch(old[key], value, pointer))
+        elif value != old[key]:
+            ops.append({"op": "replace", "path": pointer, "value": value})
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape_pointer(key)}"})
+    return ops
+
 
 class PipelineConnectionManager:
     """
     WebSocket 연결 관리
     job_id 기준으로 연결 관리 (한 job에 여러 클라이언트 가능)
+    연결별로 마지막으로 보낸 상태를 기억하여 변경분만 전송
     """
 
     def __init__(self):
         # job_id → {WebSocket} 매핑
         self.connections: Dict[str, Set[WebSocket]] = {}
+        # WebSocket → 마지막으로 전송한 상태 (patch 기준)
+        self._sent: Dict[WebSocket, dict] = {}
+        # job_id → 전송 대기 중인 최신 상태 / 예약된 전송 task
+        self._pending: Dict[str, dict] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        # job_id → 전송 순서 보장용 lock (patch가 기준 상태보다 먼저 도착하지 않도록)
+        self._send_locks: Dict[str, asyncio.Lock] = {}
 
     async def connect(self, job_id: str, websocket: WebSocket):
         await websocket.accept()
@@ -29,18 +71,18 @@ class PipelineConnectionManager:
         logger.info(f"[WS] 연결됨: job_id={job_id}")
 
     def disconnect(self, job_id: str, websocket: WebSocket):
+        self._sent.pop(websocket, None)
         if job_id in self.connections:
             self.connections[job_id].discard(websocket)
             if not self.connections[job_id]:
                 del self.connections[job_id]
+                self._pending.pop(job_id, None)
+                self._send_locks.pop(job_id, None)
         logger.info(f"[WS] 연결 해제: job_id={job_id}")
 
-    async def broadcast(self, job_id: str, state: dict):
-        """특정 job의 모든 연결에 상태 전송"""
-        if job_id not in self.connections:
-            return
-
-        message = json.dumps({
+    def _view(self, job_id: str, state: dict) -> dict:
+        """상태 → 클라이언트에 보여줄 필드"""
+        return {
             "job_id": job_id,
             "status": state.get("status"),
             "current_step": state.get("current_step"),
@@ -48,18 +90,87 @@ class PipelineConnectionManager:
             "error": state.get("error"),
             "error_step": state.get("error_step"),
             "final_image_url": state.get("final_image_url"),
+            "styles": state.get("styles"),
+            "branches": summarize_branches(state),
             "updated_at": state.get("updated_at"),
-        }, ensure_ascii=False)
+        }
+
+    def _message(self, job_id: str, view: dict, previous: Optional[dict]) -> Optional[str]:
+        """
+        이전 전송 상태가 없으면 snapshot, 있으면 patch
+        변경이 없으면 None
+        """
+        if previous is None:
+            return json.dumps({"type": "snapshot", **view}, ensure_ascii=False)
+        ops = make_json_patch(previous, view)
+        if not ops:
+            return None
+        return json.dumps({"type": "patch", "job_id": job_id, "ops": ops}, ensure_ascii=False)
+
+    async def send(self, job_id: str, websocket: WebSocket, state: dict):
+        """특정 연결 하나에 상태 전송 (연결 직후 / 다른 인스턴스 job 동기화)"""
+        async with self._send_locks.setdefault(job_id, asyncio.Lock()):
+            view = self._view(job_id, state)
+            message = self._message(job_id, view, self._sent.get(websocket))
+            if message is not None:
+                await websocket.send_text(message)
+            self._sent[websocket] = view
+
+    async def broadcast(self, job_id: str, state: dict):
+        """
+        특정 job의 모든 연결에 상태 전송
+        WS_COALESCE_INTERVAL 안에 들어온 변경은 마지막 상태 하나로 합쳐 전송 (종료 상태는 즉시)
+        """
+        if job_id not in self.connections:
+            return
+
+        self._pending[job_id] = state
+        if state.get("status") in TERMINAL_STATUSES or settings.WS_COALESCE_INTERVAL <= 0:
+            # 예약된 전송(_delayed_flush)은 이미 비워진 대기 상태를 보고 아무것도 보내지 않음
+            await self._flush(job_id)
+            return
+
+        if job_id not in self._flush_tasks:
+            self._flush_tasks[job_id] = asyncio.create_task(self._delayed_flush(job_id))
+
+    async def _delayed_flush(self, job_id: str):
+        await asyncio.sleep(settings.WS_COALESCE_INTERVAL)
+        self._flush_tasks.pop(job_id, None)
+        await self._flush(job_id)
+
+    async def _flush(self, job_id: str):
+        async with self._send_locks.setdefault(job_id, asyncio.Lock()):
+            state = self._pending.pop(job_id, None)
+            sockets = list(self.connections.get(job_id, ()))
+            if state is None or not sockets:
+                return
+            await self._send_all(job_id, state, sockets)
+
+    async def _send_all(self, job_id: str, state: dict, sockets: list):
+        view = self._view(job_id, state)
+
+        # 같은 상태를 기준으로 하는 연결끼리는 patch를 한 번만 계산·직렬화
+        messages: Dict[int, Optional[str]] = {}
+        targets = []
+        for ws in sockets:
+            previous = self._sent.get(ws)
+            key = id(previous)
+            if key not in messages:
+                messages[key] = self._message(job_id, view, previous)
+            if messages[key] is not None:
+                targets.append((ws, messages[key]))
+            self._sent[ws] = view
 
-        dead_sockets = set()
-        for ws in self.connections[job_id].copy():
-            try:
-                await ws.send_text(message)
-            except Exception:
-                dead_sockets.add(ws)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(message), timeout=settings.WS_SEND_TIMEOUT) for ws, message in targets),
+            return_exceptions=True,
+        )
 
-        for ws in dead_sockets:
-            self.connections[job_id].discard(ws)
+        # 전송 실패 / 시간 초과 연결 정리
+        for (ws, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[WS] 전송 실패, 연결 해제: job_id={job_id}, error={result!r}")
+                self.disconnect(job_id, ws)
 
 
 # 싱글톤
@@ -0,0 +1,218 @@
+"""
+AdGen 스토리지 읽기 캐시 (read-through)
+같은 객체(결과 미리보기 / 다운로드 등)를 반복해서 읽을 때 스토리지 요청 생략
+
+- 키: 객체 경로 + generation (GCS 객체 세대, 덮어쓰면 바뀜)
+- 메모리 LRU (BLOB_CACHE_MEMORY_MB) → 디스크 LRU (BLOB_CACHE_DISK_MB) → 스토리지 순서로 조회
+- 같은 객체를 동시에 요청하면 스토리지 조회는 한 번만 (single-flight)
+- 이 프로세스에서 put / delete 하면 해당 경로 무효화
+- 조회 결과는 adgen_blob_cache_lookups_total{tier} 메트릭 (memory / disk / shared / miss)
+
+저장된 객체는 UUID 경로라 내용이 바뀌지 않으므로, 캐시 적중 시 스토리지에 재검증하지 않음
+"""
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.metrics import BLOB_CACHE_BYTES, BLOB_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# 스토리지 조회 함수: path → (bytes, generation)
+Fetcher = Callable[[str], Awaitable[Tuple[bytes, Optional[str]]]]
+
+
+def _path_hash(path: str) -> str:
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()
+
+
+class _MemoryLRU:
+    """경로 → (generation, bytes), 전체 크기 한도"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_bytes // 4  # 큰 객체 하나가 캐시 전체를 밀어내지 않도록
+        self._items: "OrderedDict[str, Tuple[Optional[str], bytes]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[Tuple[Optional[str], bytes]]:
+        with self._lock:
+            item = self._items.get(path)
+            if item is not None:
+                self._items.move_to_end(path)
+            return item
+
+    def put(self, path: str, generation: Optional[str], data: bytes):
+        if len(data) > self.max_item_bytes:
+            return
+        with self._lock:
+            self._discard(path)
+            self._items[path] = (generation, data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                self._discard(next(iter(self._items)))
+            BLOB_CACHE_BYTES.labels(tier="memory").set(self._total_bytes)
+
+    def discard(self, path: str):
+        with self._lock:
+            self._discard(path)
+            BLOB_CACHE_BYTES.labels(tier="memory").set(self._total_bytes)
+
+    def _discard(self, path: str):
+        item = self._items.pop(path, None)
+        if item is not None:
+            self._total_bytes -= len(item[1])
+
+
+class _DiskLRU:
+    """
+    로컬 디스크 LRU: {root}/{hash[:2]}/{hash}.{generation}.bin
+    파일 접근 시각(atime)으로 LRU 순서 → 재시작 후에도 순서 유지
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, Tuple[str, int]]"] = None  # hash → (generation, size)
+        self._total_bytes = 0
+
+    def _file(self, key: str, generation: str) -> Path:
+        return self.root / key[:2] / f"{key}.{generation}.bin"
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        if self.root.exists():
+            entries = []
+            for file in self.root.glob("*/*.bin"):
+                key, _, generation = file.name[:-len(".bin")].partition(".")
+                st = file.stat()
+                entries.append((st.st_atime, key, generation, st.st_size))
+            for _, key, generation, size in sorted(entries):
+                self._remove(key)  # 같은 경로의 이전 세대 파일 정리
+                self._index[key] = (generation, size)
+                self._total_bytes += size
+        logger.info(f"[BlobCache] 디스크 캐시 로드: {len(self._index)}개, {self._total_bytes / 1024 / 1024:.1f}MB")
+
+    def _remove(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+            self._file(key, entry[0]).unlink(missing_ok=True)
+
+    def get(self, path: str, generation: Optional[str]) -> Optional[Tuple[str, bytes]]:
+        key = _path_hash(path)
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(key)
+            if entry is None or (generation is not None and entry[0] != generation):
+                return None
+            file = self._file(key, entry[0])
+            try:
+                data = file.read_bytes()
+            except FileNotFoundError:
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            os.utime(file)
+            return entry[0], data
+
+    def put(self, path: str, generation: str, data: bytes):
+        key = _path_hash(path)
+        with self._lock:
+            self._load_index()
+            self._remove(key)
+            file = self._file(key, generation)
+            file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = file.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, file)
+
+            self._index[key] = (generation, len(data))
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+            BLOB_CACHE_BYTES.labels(tier="disk").set(self._total_bytes)
+
+    def discard(self, path: str):
+        with self._lock:
+            self._load_index()
+            self._remove(_path_hash(path))
+            BLOB_CACHE_BYTES.labels(tier="disk").set(self._total_bytes)
+
+
+class BlobCache:
+    """메모리 + 디스크 2단 read-through 캐시"""
+
+    def __init__(self, root: str, memory_bytes: int, disk_bytes: int):
+        self._memory = _MemoryLRU(memory_bytes)
+        self._disk = _DiskLRU(root, disk_bytes) if disk_bytes > 0 else None
+        self._inflight: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
+
+    async def get(self, path: str, fetch: Fetcher, generation: Optional[str] = None) -> bytes:
+        """
+        객체 내용 조회 (캐시 → 없으면 fetch 후 저장)
+
+        Args:
+            path: 객체 경로
+            fetch: 스토리지 조회 함수 (path → (bytes, generation))
+            generation: 알고 있는 객체 세대 (None이면 캐시된 최신 세대 사용)
+        """
+        item = self._memory.get(path)
+        if item is not None and (generation is None or item[0] == generation):
+            BLOB_CACHE_LOOKUPS.labels(tier="memory").inc()
+            return item[1]
+
+        if self._disk is not None:
+            item = await asyncio.to_thread(self._disk.get, path, generation)
+            if item is not None:
+                BLOB_CACHE_LOOKUPS.labels(tier="disk").inc()
+                self._memory.put(path, item[0], item[1])
+                return item[1]
+
+        # single-flight: 같은 객체를 동시에 요청하면 먼저 시작한 조회를 공유
+        # (별도 task라서 먼저 요청한 쪽이 취소돼도 나머지는 계속 기다림)
+        flight_key = (path, generation)
+        flight = self._inflight.get(flight_key)
+        if flight is None:
+            BLOB_CACHE_LOOKUPS.labels(tier="miss").inc()
+            flight = asyncio.create_task(self._fill(path, fetch))
+            self._inflight[flight_key] = flight
+            flight.add_done_callback(lambda task: self._finish(flight_key, task))
+        else:
+            BLOB_CACHE_LOOKUPS.labels(tier="shared").inc()
+        return await asyncio.shield(flight)
+
+    async def _fill(self, path: str, fetch: Fetcher) -> bytes:
+        data, generation = await fetch(path)
+        generation = generation or "0"
+        self._memory.put(path, generation, data)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, path, generation, data)
+        return data
+
+    def _finish(self, flight_key: Tuple[str, Optional[str]], task: asyncio.Task):
+        self._inflight.pop(flight_key, None)
+        if not task.cancelled():
+            task.exception()  # 기다리는 쪽이 모두 취소돼도 "never retrieved" 경고가 나지 않도록
+
+    def invalidate(self, path: str):
+        """경로 무효화 (이 프로세스에서 덮어쓰기 / 삭제 시, 스레드에서 호출)"""
+        self._memory.discard(path)
+        if self._disk is not None:
+            self._disk.discard(path)
+
+    async def ainvalidate(self, path: str):
+        """invalidate의 async 버전 (디스크 lock 대기 / 첫 인덱스 스캔을 이벤트 루프 밖에서)"""
+        self._memory.discard(path)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.discard, path)
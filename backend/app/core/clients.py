@@ -0,0 +1,142 @@
+"""
+외부 API 클라이언트 레지스트리
+프로세스 전체에서 재사용하는 장수명 클라이언트 (connection keep-alive)
+
+- HTTP: httpx.AsyncClient (이미지 다운로드 등)
+- OpenAI: AsyncOpenAI
+- Gemini: google-genai Client (비동기 호출은 client.aio 사용)
+- Replicate: replicate.Client (async_run 사용)
+- provider별 동시 호출 제한 (세마포어)
+
+job마다 클라이언트를 새로 만들지 않고 여기서 가져와 사용
+"""
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+_openai_client = None
+_openai_sync_client = None
+_genai_clients: dict = {}
+_replicate_client = None
+_provider_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """공용 비동기 HTTP 클라이언트 (싱글톤)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            ),
+            follow_redirects=True,
+        )
+        logger.info("✅ 공용 HTTP 클라이언트 초기화 완료")
+    return _http_client
+
+
+async def fetch_bytes(url: str, timeout: Optional[float] = None) -> bytes:
+    """URL 내용을 공용 HTTP 클라이언트로 다운로드"""
+    resp = await get_http_client().get(url, timeout=timeout or settings.HTTP_TIMEOUT)
+    resp.raise_for_status()
+    return resp.content
+
+
+def get_openai_client():
+    """AsyncOpenAI 클라이언트 (싱글톤)"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not found in settings")
+        # 재시도는 provider_call에서 수행 (재시도 횟수 메트릭 기록)
+        _openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=30.0, max_retries=0)
+        logger.info("✅ AsyncOpenAI 클라이언트 초기화 완료")
+    return _openai_client
+
+
+def get_openai_sync_client():
+    """동기 OpenAI 클라이언트 (기존 동기 경로용, 싱글톤)"""
+    global _openai_sync_client
+    if _openai_sync_client is None:
+        from openai import OpenAI
+
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not found in settings")
+        _openai_sync_client = OpenAI(api_key=settings.OPENAI_API_KEY, timeout=30.0)
+    return _openai_sync_client
+
+
+def get_genai_client(api_key: str):
+    """
+    google-genai 클라이언트 (API 키별 싱글톤)
+    이미지 생성(GOOGLE_MODEL_API_KEY)과 Vision 분석(GOOGLE_API_KEY)이 다른 키 사용
+    """
+    client = _genai_clients.get(api_key)
+    if client is None:
+        from google import genai
+
+        client = genai.Client(api_key=api_key)
+        _genai_clients[api_key] = client
+        logger.info("✅ Gemini 클라이언트 초기화 완료")
+    return client
+
+
+def get_replicate_client():
+    """Replicate 클라이언트 (싱글톤, 내부 httpx 클라이언트 재사용)"""
+    global _replicate_client
+    if _replicate_client is None:
+        import replicate
+
+        if not settings.REPLICATE_API_TOKEN:
+            raise ValueError("REPLICATE_API_TOKEN not found in settings")
+        _replicate_client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+        logger.info("✅ Replicate 클라이언트 초기화 완료")
+    return _replicate_client
+
+
+def get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """
+    provider별 동시 호출 제한 (배치 등 job이 몰려도 rate limit 초과 방지)
+    설정에 없는 provider는 HTTP 연결 수 한도 사용
+    """
+    semaphore = _provider_semaphores.get(provider)
+    if semaphore is None:
+        limit = settings.PROVIDER_CONCURRENCY.get(provider, settings.HTTP_MAX_CONNECTIONS)
+        semaphore = asyncio.Semaphore(limit)
+        _provider_semaphores[provider] = semaphore
+    return semaphore
+
+
+async def close_clients():
+    """앱 종료 시 모든 클라이언트 연결 정리"""
+    global _http_client, _openai_client, _openai_sync_client, _replicate_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _openai_sync_client is not None:
+        _openai_sync_client.close()
+        _openai_sync_client = None
+    for client in _genai_clients.values():
+        try:
+            await client.aio.aclose()
+            client.close()
+        except Exception as e:
+            logger.warning(f"Gemini 클라이언트 종료 실패: {e}")
+    _genai_clients.clear()
+    _replicate_client = None
+    logger.info("외부 API 클라이언트 정리 완료")
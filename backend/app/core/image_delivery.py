@@ -0,0 +1,151 @@
+"""
+AdGen 이미지 응답 (미리보기 / 다운로드 엔드포인트 공용)
+권한 확인은 라우터에서 끝낸 뒤 호출
+
+- redirect: 짧은 만료의 서명 URL로 307 → 이미지 bytes가 API 컨테이너를 거치지 않음
+            (서명을 지원하지 않는 스토리지 / 외부 URL이면 proxy로 대체)
+- proxy:    API가 읽어서 전달 (읽기 캐시 경유)
+            ETag / If-None-Match(304), Range / If-Range(206), Cache-Control 지원
+
+기본 모드는 settings.IMAGE_DELIVERY_MODE, 요청별로 ?mode= 로 지정 가능
+(redirect를 XHR로 받으려면 버킷 CORS 설정 필요)
+"""
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import RedirectResponse, Response
+
+from config import settings
+from app.core.storage import get_storage
+from app.core.metrics import IMAGE_DELIVERY_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_MODES = ("redirect", "proxy")
+
+
+def make_etag(data: bytes) -> str:
+    """내용 기반 strong ETag"""
+    return f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 비교 (weak 비교, 여러 값 / * 허용)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip() for value in header.split(",")]
+    return any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    단일 byte range 파싱
+
+    Args:
+        header: Range 헤더 값 (bytes=a-b / bytes=a- / bytes=-n)
+        size: 전체 크기
+
+    Returns:
+        (start, end) 포함 구간, 범위를 만족할 수 없으면 None
+
+    Raises:
+        ValueError: 형식 오류 / 여러 구간 (→ Range 무시하고 전체 응답)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"unsupported range: {header}")
+
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        # 마지막 n바이트
+        length = int(last)
+        if length <= 0:
+            return None
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and start > end:
+        raise ValueError(f"invalid range: {header}")
+    if start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+async def image_response(
+    request: Request,
+    url: str,
+    media_type: str,
+    disposition: str,
+    mode: Optional[str] = None,
+) -> Response:
+    """
+    저장된 이미지 응답
+
+    Args:
+        request: 요청 (조건부 / Range 헤더)
+        url: 이미지 공개 URL
+        media_type: 응답 Content-Type
+        disposition: Content-Disposition (inline / attachment; filename=...)
+        mode: redirect / proxy (None이면 settings.IMAGE_DELIVERY_MODE)
+    """
+    mode = mode or settings.IMAGE_DELIVERY_MODE
+    if mode not in DELIVERY_MODES:
+        raise ValueError(f"Unknown delivery mode: {mode} (choose from {list(DELIVERY_MODES)})")
+
+    storage = get_storage()
+    if mode == "redirect":
+        path = storage.path_from_url(url)
+        signed = None
+        if path is None:
+            IMAGE_DELIVERY_FALLBACKS.labels(reason="external").inc()
+        else:
+            try:
+                signed = await storage.signed_url(path, settings.SIGNED_URL_TTL_SECONDS, disposition, media_type)
+                if not signed:
+                    IMAGE_DELIVERY_FALLBACKS.labels(reason="unsupported").inc()
+            except Exception as e:
+                IMAGE_DELIVERY_FALLBACKS.labels(reason="sign_error").inc()
+                logger.warning(f"[ImageDelivery] 서명 URL 생성 실패 → proxy: {e}")
+        if signed:
+            # 서명 URL은 곧 만료되므로 리다이렉트 자체는 캐시하지 않음
+            return RedirectResponse(signed, status_code=307, headers={"Cache-Control": "no-store"})
+
+    data = await storage.get_url(url, cached=True)
+    etag = make_etag(data)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.IMAGE_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": disposition,
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        size = len(data)
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            byte_range = (0, size - 1)  # 형식 오류 / 여러 구간은 무시하고 전체 응답
+        else:
+            if byte_range is None:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        start, end = byte_range
+        if (start, end) != (0, size - 1):
+            return Response(
+                content=data[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+
+    return Response(content=data, media_type=media_type, headers=headers)
@@ -0,0 +1,134 @@
+"""
+AdGen 이미지 인코딩 정책
+단계별 중간/결과 이미지 인코딩 방식 (settings.IMAGE_ENCODING)
+
+- png:           Pillow 기본 PNG (compress_level 6, 느림)
+- png-fast:      PNG compress_level 1 (약 4배 빠름, 파일은 조금 커짐)
+- webp-lossless: 무손실 WebP 최저 effort (PNG보다 빠르고 작음, 미지원 빌드는 png-fast)
+- jpeg:          JPEG quality 90 (불투명 결과 전용, 투명 영역이 있으면 png-fast)
+
+단계별 인코딩 시간 / 크기는 adgen_image_encode_* 메트릭으로 기록됨
+"""
+import io
+import time
+import logging
+from typing import Optional
+
+from PIL import Image, features
+
+from config import settings
+from app.core.metrics import observe_image_encode
+
+logger = logging.getLogger(__name__)
+
+
+class EncodingPolicy:
+    """이미지 인코딩 방식 (Pillow format + save 옵션)"""
+
+    def __init__(
+        self,
+        name: str,
+        format: str,
+        mime_type: str,
+        extension: str,
+        options: Optional[dict] = None,
+        opaque_only: bool = False,
+        fallback: Optional[str] = None,
+    ):
+        self.name = name
+        self.format = format
+        self.mime_type = mime_type
+        self.extension = extension
+        self.options = options or {}
+        self.opaque_only = opaque_only  # 알파 채널을 저장하지 못하는 포맷 (JPEG)
+        self.fallback = fallback        # 사용할 수 없을 때 대체 정책
+
+    def supports(self, image: Image.Image) -> bool:
+        if self.format == "WEBP" and not features.check("webp"):
+            return False
+        return not (self.opaque_only and has_transparency(image))
+
+
+ENCODING_POLICIES = {
+    "png": EncodingPolicy("png", "PNG", "image/png", "png"),
+    "png-fast": EncodingPolicy("png-fast", "PNG", "image/png", "png", {"compress_level": 1}),
+    "webp-lossless": EncodingPolicy(
+        "webp-lossless", "WEBP", "image/webp", "webp",
+        {"lossless": True, "quality": 0, "method": 0},  # 무손실에서 quality = 압축 effort
+        fallback="png-fast",
+    ),
+    "jpeg": EncodingPolicy(
+        "jpeg", "JPEG", "image/jpeg", "jpg",
+        {"quality": 90},
+        opaque_only=True, fallback="png-fast",
+    ),
+}
+
+# 확장자 → MIME 타입 (업로드된 결과 URL에서 포맷 판별용)
+MIME_TYPES = {policy.extension: policy.mime_type for policy in ENCODING_POLICIES.values()}
+
+
+class EncodedImage:
+    """인코딩 결과 (bytes + 업로드용 MIME 타입 / 확장자)"""
+
+    def __init__(self, data: bytes, policy: EncodingPolicy):
+        self.data = data
+        self.policy = policy
+
+    @property
+    def mime_type(self) -> str:
+        return self.policy.mime_type
+
+    @property
+    def extension(self) -> str:
+        return self.policy.extension
+
+
+def has_transparency(image: Image.Image) -> bool:
+    """실제로 투명한 픽셀이 있는지 (알파 채널이 전부 255면 불투명)"""
+    if image.mode in ("RGBA", "LA", "PA"):
+        return image.getchannel("A").getextrema()[0] < 255
+    return "transparency" in image.info
+
+
+def resolve_policy(image: Image.Image, stage: str) -> EncodingPolicy:
+    """
+    단계 + 이미지에 맞는 인코딩 정책 결정
+
+    Args:
+        image: 인코딩할 이미지 (투명 영역 여부 확인용)
+        stage: settings.IMAGE_ENCODING 키 (removed_bg / fitted / background / vton_garment / gemini_input)
+    """
+    name = settings.IMAGE_ENCODING.get(stage, "png")
+    policy = ENCODING_POLICIES.get(name)
+    if policy is None:
+        logger.warning(f"[Encoding] 알 수 없는 정책 '{name}' ({stage}) → png")
+        policy = ENCODING_POLICIES["png"]
+
+    while not policy.supports(image) and policy.fallback:
+        policy = ENCODING_POLICIES[policy.fallback]
+    return policy
+
+
+def encode_image(image: Image.Image, stage: str, policy: Optional[EncodingPolicy] = None) -> EncodedImage:
+    """
+    단계별 정책으로 이미지 인코딩 (소요 시간 / 크기 메트릭 기록)
+
+    Args:
+        image: PIL 이미지
+        stage: settings.IMAGE_ENCODING 키
+        policy: 이미 결정된 정책 (None이면 resolve_policy)
+    """
+    policy = policy or resolve_policy(image, stage)
+    if policy.format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    started = time.perf_counter()
+    buf = io.BytesIO()
+    image.save(buf, format=policy.format, **policy.options)
+    data = buf.getvalue()
+    elapsed = time.perf_counter() - started
+
+    observe_image_encode(stage, policy.name, elapsed, len(data))
+    logger.debug(f"[Encoding] {stage}: {policy.name} {image.size} → {len(data)} bytes ({elapsed * 1000:.0f}ms)")
+    return EncodedImage(data, policy)
@@ -0,0 +1,261 @@
+"""
+AdGen 메트릭
+Prometheus 히스토그램 (/metrics) + 파이프라인 단계별 provider 호출 기록
+
+- 단계 소요 시간: adgen_pipeline_step_duration_seconds{step, status}
+- provider 호출: 지연 시간 / payload 크기 / 재시도 횟수
+- 결과 캐시 조회: hit / miss / error
+- 배경 제거 추론 시간: adgen_background_removal_duration_seconds{model}
+- 이미지 처리 프로세스 풀: 대기 작업 수 / 작업 소요 시간
+- 이미지 인코딩: 단계·정책별 소요 시간 / 크기
+
+provider 호출 기록은 contextvar로 현재 실행 중인 단계에 누적되어
+PipelineState.steps[단계].provider_calls 로 저장됨
+"""
+import time
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from config import settings
+from app.core.clients import get_provider_semaphore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# ===== Prometheus 메트릭 =====
+
+STEP_DURATION = Histogram(
+    "adgen_pipeline_step_duration_seconds",
+    "파이프라인 단계별 소요 시간",
+    ["step", "status"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+
+PROVIDER_CALL_DURATION = Histogram(
+    "adgen_provider_call_duration_seconds",
+    "외부 API 호출 소요 시간 (재시도 포함)",
+    ["provider", "operation", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+
+PROVIDER_PAYLOAD_BYTES = Histogram(
+    "adgen_provider_payload_bytes",
+    "외부 API 요청/응답 payload 크기",
+    ["provider", "operation", "direction"],
+    buckets=(1e3, 1e4, 1e5, 5e5, 1e6, 2e6, 5e6, 1e7, 2e7),
+)
+
+PROVIDER_RETRIES = Counter(
+    "adgen_provider_call_retries_total",
+    "외부 API 호출 재시도 횟수",
+    ["provider", "operation"],
+)
+
+BACKGROUND_REMOVAL_DURATION = Histogram(
+    "adgen_background_removal_duration_seconds",
+    "배경 제거 추론 1회(batch) 소요 시간 (세션 대기 제외)",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20),
+)
+
+BACKGROUND_REMOVAL_BATCH_SIZE = Histogram(
+    "adgen_background_removal_batch_size",
+    "배경 제거 micro-batch 1회당 이미지 수",
+    ["model"],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+
+IMAGE_POOL_PENDING = Gauge(
+    "adgen_image_pool_pending_tasks",
+    "이미지 처리 프로세스 풀 대기 + 실행 중 작업 수",
+)
+
+IMAGE_POOL_TASK_DURATION = Histogram(
+    "adgen_image_pool_task_duration_seconds",
+    "이미지 처리 프로세스 풀 작업 소요 시간 (대기 포함)",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20),
+)
+
+IMAGE_ENCODE_DURATION = Histogram(
+    "adgen_image_encode_duration_seconds",
+    "단계별 이미지 인코딩 소요 시간",
+    ["stage", "policy"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+IMAGE_ENCODE_BYTES = Histogram(
+    "adgen_image_encode_bytes",
+    "단계별 인코딩 결과 크기",
+    ["stage", "policy"],
+    buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2e6, 5e6, 1e7, 2e7),
+)
+
+CACHE_LOOKUPS = Counter(
+    "adgen_result_cache_lookups_total",
+    "결과 캐시 조회 결과",
+    ["stage", "result"],
+)
+
+BLOB_CACHE_LOOKUPS = Counter(
+    "adgen_blob_cache_lookups_total",
+    "스토리지 읽기 캐시 조회 결과 (memory / disk 적중, shared = 진행 중인 조회 공유, miss)",
+    ["tier"],
+)
+
+IMAGE_DELIVERY_FALLBACKS = Counter(
+    "adgen_image_delivery_fallbacks_total",
+    "redirect 모드에서 proxy로 대체된 응답 (unsupported = 서명 미지원 스토리지, external = 외부 URL, sign_error = 서명 실패)",
+    ["reason"],
+)
+
+BLOB_CACHE_BYTES = Gauge(
+    "adgen_blob_cache_bytes",
+    "스토리지 읽기 캐시 사용량",
+    ["tier"],
+)
+
+
+# ===== 단계별 provider 호출 기록 =====
+
+_step_calls: ContextVar[Optional[list]] = ContextVar("step_provider_calls", default=None)
+_step_started: ContextVar[Optional[float]] = ContextVar("step_started", default=None)
+
+
+def begin_step_recording() -> list:
+    """단계 시작: 이후 provider_call 기록을 이 단계에 누적"""
+    calls = []
+    _step_calls.set(calls)
+    _step_started.set(time.perf_counter())
+    return calls
+
+
+def current_step_elapsed() -> float:
+    """현재 단계 시작 후 경과 시간 (초)"""
+    started = _step_started.get()
+    return time.perf_counter() - started if started is not None else 0.0
+
+
+def observe_step(step: str, status: str, seconds: float):
+    STEP_DURATION.labels(step=step, status=status).observe(seconds)
+
+
+def observe_image_encode(stage: str, policy: str, seconds: float, size: int):
+    IMAGE_ENCODE_DURATION.labels(stage=stage, policy=policy).observe(seconds)
+    IMAGE_ENCODE_BYTES.labels(stage=stage, policy=policy).observe(size)
+
+
+# ===== provider 호출 래퍼 =====
+
+# 재시도할 HTTP 상태 코드 (일시적 오류)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient_error(e: Exception) -> bool:
+    """네트워크 오류 / 타임아웃 / 429·5xx 응답"""
+    if isinstance(e, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in TRANSIENT_STATUS_CODES
+    # openai: status_code, google-genai: code, replicate: status
+    for attr in ("status_code", "code", "status"):
+        if getattr(e, attr, None) in TRANSIENT_STATUS_CODES:
+            return True
+    return False
+
+
+async def provider_call(
+    provider: str,
+    operation: str,
+    fn: Callable[[], Awaitable[T]],
+    request_bytes: int = 0,
+    response_bytes: Optional[Callable[[T], int]] = None,
+    max_retries: Optional[int] = None,
+) -> T:
+    """
+    외부 API 호출 + 지연 시간 / payload / 재시도 기록
+
+    Args:
+        provider: openai / gemini / replicate
+        operation: 호출 종류 (caption, ad_copy, generate_image, idm_vton ...)
+        fn: 호출 함수 (재시도 시 다시 호출됨)
+        request_bytes: 요청 payload 크기
+        response_bytes: 응답 → payload 크기 계산 함수
+        max_retries: 일시적 오류 재시도 횟수 (기본값: settings.PROVIDER_MAX_RETRIES)
+    """
+    if max_retries is None:
+        max_retries = settings.PROVIDER_MAX_RETRIES
+
+    # provider별 동시 호출 제한 (대기 시간은 호출 지연 시간에 포함하지 않음)
+    async with get_provider_semaphore(provider):
+        return await _call_with_retry(provider, operation, fn, request_bytes, response_bytes, max_retries)
+
+
+async def _call_with_retry(
+    provider: str,
+    operation: str,
+    fn: Callable[[], Awaitable[T]],
+    request_bytes: int,
+    response_bytes: Optional[Callable[[T], int]],
+    max_retries: int,
+) -> T:
+    started = time.perf_counter()
+    retries = 0
+    while True:
+        try:
+            result = await fn()
+            break
+        except Exception as e:
+            if retries < max_retries and is_transient_error(e):
+                retries += 1
+                PROVIDER_RETRIES.labels(provider=provider, operation=operation).inc()
+                delay = settings.PROVIDER_RETRY_BACKOFF * (2 ** (retries - 1))
+                logger.warning(f"[{provider}] {operation} 일시적 오류, {delay:.1f}s 후 재시도 ({retries}/{max_retries}): {e}")
+                await asyncio.sleep(delay)
+                continue
+            _record_call(provider, operation, "error", time.perf_counter() - started, request_bytes, 0, retries)
+            raise
+
+    size = 0
+    if response_bytes is not None:
+        try:
+            size = response_bytes(result)
+        except Exception:
+            size = 0
+    _record_call(provider, operation, "success", time.perf_counter() - started, request_bytes, size, retries)
+    return result
+
+
+def _record_call(
+    provider: str,
+    operation: str,
+    outcome: str,
+    seconds: float,
+    request_bytes: int,
+    response_bytes: int,
+    retries: int,
+):
+    PROVIDER_CALL_DURATION.labels(provider=provider, operation=operation, outcome=outcome).observe(seconds)
+    if request_bytes:
+        PROVIDER_PAYLOAD_BYTES.labels(provider=provider, operation=operation, direction="request").observe(request_bytes)
+    if response_bytes:
+        PROVIDER_PAYLOAD_BYTES.labels(provider=provider, operation=operation, direction="response").observe(response_bytes)
+
+    calls = _step_calls.get()
+    if calls is not None:
+        calls.append({
+            "provider": provider,
+            "operation": operation,
+            "outcome": outcome,
+            "duration_ms": round(seconds * 1000, 1),
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "retries": retries,
+        })
@@ -1,128 +1,491 @@
 """
-GCS Storage Helper Functions
-업데이트: download_from_gcs, upload_to_gcs, upload_to_gcs_async 추가
+AdGen 스토리지 레이어
+GCS / 로컬 파일시스템 / 메모리 백엔드를 같은 인터페이스로 사용
+
+- get / put / stream / delete / list (async, 동시 실행 수 STORAGE_CONCURRENCY 제한)
+- *_sync: 스레드에서 실행 중인 기존 코드용, 같은 크기의 스레드 semaphore로 제한
+- GCS: 클라이언트·인증 세션을 프로세스 전체에서 재사용 (연결 풀 STORAGE_MAX_CONNECTIONS)
+- local / memory: 테스트·벤치마크용 (STORAGE_BACKEND 설정)
+- get_cached / get_url(cached=True): 읽기 캐시 경유 (app/core/blob_cache.py, BLOB_CACHE_ENABLED)
+- signed_url: 짧은 만료의 서명 URL (GCS만, 클라이언트가 스토리지에서 직접 다운로드)
+
+요청마다 storage.Client를 만들지 않고 get_storage()로 가져와 사용
 """
+import asyncio
+import logging
+import mimetypes
+import threading
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
 
-from google.cloud import storage
-from google.oauth2 import service_account
 from config import settings
-import logging
-from typing import Optional
+from app.core.blob_cache import BlobCache
 
 logger = logging.getLogger(__name__)
 
-_storage_client = None
-
-def get_storage_client():
-    """GCS 클라이언트 가져오기 (싱글톤)"""
-    global _storage_client
-    
-    if _storage_client is None:
-        if settings.GOOGLE_APPLICATION_CREDENTIALS:
-            credentials = service_account.Credentials.from_service_account_file(
-                settings.GOOGLE_APPLICATION_CREDENTIALS
-            )
-            _storage_client = storage.Client(credentials=credentials)
-        else:
-            _storage_client = storage.Client()
-        
-        logger.info("GCS Storage 클라이언트 초기화 완료")
-    
-    return _storage_client
+GCS_PUBLIC_HOST = "https://storage.googleapis.com"
+DEFAULT_BUCKET = "adgen-uploads-2026"
 
+# stream() 기본 청크 크기
+STREAM_CHUNK_SIZE = 256 * 1024
 
-def download_from_gcs(gcs_path: str, bucket_name: Optional[str] = None) -> bytes:
-    """
-    GCS에서 파일 다운로드
-    
-    Args:
-        gcs_path: GCS 경로 (예: uploads/xxx.jpg)
-        bucket_name: 버킷명 (기본값: settings.GCS_BUCKET_NAME)
-    
-    Returns:
-        파일 바이트 데이터
-    """
-    try:
-        bucket_name = bucket_name or settings.GCS_BUCKET_NAME
-        client = get_storage_client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcs_path)
-        
-        logger.info(f"Downloading from GCS: gs://{bucket_name}/{gcs_path}")
-        
-        data = blob.download_as_bytes()
-        
-        logger.info(f"Downloaded {len(data)} bytes")
-        return data
-        
-    except Exception as e:
-        logger.error(f"Error downloading from GCS: {e}", exc_info=True)
-        raise
-
-
-def upload_to_gcs(
-    file_data: bytes,
-    destination_path: str,
-    content_type: str = "image/jpeg",
-    bucket_name: Optional[str] = None
-) -> str:
+
+class StorageBackend(ABC):
     """
-    GCS에 파일 업로드 (동기)
-    
-    Args:
-        file_data: 업로드할 파일 데이터
-        destination_path: GCS 경로 (예: ai_generated/xxx.jpg)
-        content_type: 파일 타입
-        bucket_name: 버킷명 (기본값: settings.GCS_BUCKET_NAME)
-    
-    Returns:
-        공개 URL (https://storage.googleapis.com/...)
+    스토리지 백엔드 공통 인터페이스
+    하위 클래스는 동기 메서드(_get 등)만 구현, async 메서드는 스레드에서 실행 + 동시 실행 수 제한
     """
-    try:
-        bucket_name = bucket_name or settings.GCS_BUCKET_NAME
-        client = get_storage_client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(destination_path)
-        
-        logger.info(f"Uploading to GCS: gs://{bucket_name}/{destination_path}")
-        
-        blob.upload_from_string(file_data, content_type=content_type)
-        
-        # 공개 URL 생성
-        public_url = f"https://storage.googleapis.com/{bucket_name}/{destination_path}"
-        
-        logger.info(f"Upload complete: {public_url}")
-        return public_url
-        
-    except Exception as e:
-        logger.error(f"Error uploading to GCS: {e}", exc_info=True)
-        raise
-
-
-async def upload_to_gcs_async(
-    file_data: bytes,
-    destination_path: str,
-    content_type: str = "image/jpeg",
-    bucket_name: Optional[str] = None
-) -> str:
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._sync_semaphore = threading.BoundedSemaphore(concurrency)  # *_sync 메서드용
+        self.cache: Optional[BlobCache] = None  # 읽기 캐시 (get_storage()에서 설정)
+
+    # ===== 백엔드 구현 (동기) =====
+
+    @abstractmethod
+    def _get(self, path: str) -> bytes:
+        """객체 내용 (없으면 FileNotFoundError)"""
+
+    def _get_versioned(self, path: str) -> Tuple[bytes, Optional[str]]:
+        """객체 내용 + 세대 (세대를 모르는 백엔드는 None)"""
+        return self._get(path), None
+
+    @abstractmethod
+    def _put(self, path: str, data: bytes, content_type: str):
+        pass
+
+    @abstractmethod
+    def _delete(self, path: str):
+        """객체 삭제 (없으면 무시)"""
+
+    @abstractmethod
+    def _list(self, prefix: str) -> List[str]:
+        pass
+
+    @abstractmethod
+    def _open_chunks(self, path: str, chunk_size: int):
+        """청크 iterator (스레드에서 next() 호출)"""
+
+    @abstractmethod
+    def public_url(self, path: str) -> str:
+        """객체 공개 URL (업로드 전에도 경로로부터 결정 가능)"""
+
+    @abstractmethod
+    def path_from_url(self, url: str) -> Optional[str]:
+        """이 스토리지의 공개 URL이면 객체 경로, 아니면 None"""
+
+    def _signed_url(self, path: str, expires_seconds: int, disposition: Optional[str],
+                    content_type: Optional[str]) -> Optional[str]:
+        """서명 URL (지원하지 않는 백엔드는 None)"""
+        return None
+
+    def close(self):
+        pass
+
+    # ===== async 인터페이스 =====
+
+    def _limit(self) -> asyncio.Semaphore:
+        """동시 실행 수 제한 (업로드가 몰려도 연결 풀 / 스레드 풀을 넘지 않도록)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def get(self, path: str) -> bytes:
+        async with self._limit():
+            return await asyncio.to_thread(self._get, path)
+
+    async def get_cached(self, path: str, generation: Optional[str] = None) -> bytes:
+        """읽기 캐시 경유 조회 (캐시가 꺼져 있으면 get과 같음)"""
+        if self.cache is None:
+            return await self.get(path)
+        return await self.cache.get(path, self._fetch_versioned, generation)
+
+    async def _fetch_versioned(self, path: str) -> Tuple[bytes, Optional[str]]:
+        async with self._limit():
+            return await asyncio.to_thread(self._get_versioned, path)
+
+    def _invalidate(self, path: str):
+        if self.cache is not None:
+            self.cache.invalidate(path)
+
+    async def _ainvalidate(self, path: str):
+        if self.cache is not None:
+            await self.cache.ainvalidate(path)
+
+    async def put(self, path: str, data: bytes, content_type: Optional[str] = None) -> str:
+        """업로드 후 공개 URL 반환"""
+        content_type = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        async with self._limit():
+            await asyncio.to_thread(self._put, path, data, content_type)
+        await self._ainvalidate(path)
+        return self.public_url(path)
+
+    async def delete(self, path: str):
+        async with self._limit():
+            await asyncio.to_thread(self._delete, path)
+        await self._ainvalidate(path)
+
+    async def list(self, prefix: str) -> List[str]:
+        async with self._limit():
+            return await asyncio.to_thread(self._list, prefix)
+
+    async def stream(self, path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        객체를 청크 단위로 읽기 (전체를 메모리에 올리지 않음)
+        동시 실행 수 제한은 청크를 읽는 동안만 적용 (느린 클라이언트가 소비하는 동안 슬롯을 잡지 않음)
+        """
+        async with self._limit():
+            chunks = await asyncio.to_thread(self._open_chunks, path, chunk_size)
+        try:
+            while True:
+                async with self._limit():
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                await asyncio.to_thread(close)
+
+    async def signed_url(self, path: str, expires_seconds: int, disposition: Optional[str] = None,
+                         content_type: Optional[str] = None) -> Optional[str]:
+        """
+        짧은 만료의 GET 서명 URL (지원하지 않는 백엔드는 None)
+
+        Args:
+            path: 객체 경로
+            expires_seconds: 만료 시간 (초)
+            disposition: 응답 Content-Disposition (attachment; filename=...)
+            content_type: 응답 Content-Type
+        """
+        async with self._limit():
+            return await asyncio.to_thread(self._signed_url, path, expires_seconds, disposition, content_type)
+
+    async def get_url(self, url: str, cached: bool = False) -> bytes:
+        """
+        URL 내용 조회: 이 스토리지의 URL이면 스토리지 API로, 아니면 공용 HTTP 클라이언트로 다운로드
+
+        Args:
+            url: 공개 URL
+            cached: 읽기 캐시 사용 (같은 객체를 반복해서 읽는 미리보기 / 다운로드)
+        """
+        path = self.path_from_url(url)
+        if path is not None:
+            return await (self.get_cached(path) if cached else self.get(path))
+
+        from app.core.clients import fetch_bytes
+        return await fetch_bytes(url)
+
+    # ===== 동기 인터페이스 (스레드에서 실행 중인 기존 코드용) =====
+
+    def get_sync(self, path: str) -> bytes:
+        with self._sync_semaphore:
+            return self._get(path)
+
+    def put_sync(self, path: str, data: bytes, content_type: Optional[str] = None) -> str:
+        content_type = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with self._sync_semaphore:
+            self._put(path, data, content_type)
+        self._invalidate(path)
+        return self.public_url(path)
+
+    def delete_sync(self, path: str):
+        with self._sync_semaphore:
+            self._delete(path)
+        self._invalidate(path)
+
+    def list_sync(self, prefix: str) -> List[str]:
+        with self._sync_semaphore:
+            return self._list(prefix)
+
+
+# ===== GCS =====
+
+class GCSStorage(StorageBackend):
+    """GCS 버킷 (storage.Client + 인증 세션 재사용)"""
+
+    def __init__(self, bucket_name: str, concurrency: int, max_connections: int,
+                 credentials_file: Optional[str] = None):
+        super().__init__(concurrency)
+        self.bucket_name = bucket_name
+        self.client, self.credentials = self._create_client(credentials_file, max_connections)
+        self.bucket = self.client.bucket(bucket_name)
+        logger.info(f"✅ GCS 스토리지 초기화 완료: {bucket_name} (연결 풀 {max_connections})")
+
+    @staticmethod
+    def _create_client(credentials_file: Optional[str], max_connections: int):
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from google.cloud import storage
+        from google.oauth2 import service_account
+        from requests.adapters import HTTPAdapter
+
+        # cloud-platform: 서명 URL 생성(IAM signBlob)에도 같은 토큰을 사용
+        # (Cloud Run 메타데이터 서버는 요청한 scope만 부여하므로 devstorage 범위로는 서명 실패)
+        scopes = ["https://www.googleapis.com/auth/cloud-platform"]
+        if credentials_file:
+            credentials = service_account.Credentials.from_service_account_file(credentials_file, scopes=scopes)
+            project = credentials.project_id
+        else:
+            credentials, project = google.auth.default(scopes=scopes)
+
+        # 기본 requests 연결 풀(10)은 동시 업로드가 많으면 부족 → 스토리지 동시 실행 수에 맞춤
+        session = AuthorizedSession(credentials)
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        return storage.Client(project=project, credentials=credentials, _http=session), credentials
+
+    def _get(self, path: str) -> bytes:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(path).download_as_bytes()
+        except NotFound:
+            raise FileNotFoundError(f"gs://{self.bucket_name}/{path}")
+
+    def _get_versioned(self, path: str) -> Tuple[bytes, Optional[str]]:
+        from google.api_core.exceptions import NotFound
+
+        blob = self.bucket.blob(path)
+        try:
+            data = blob.download_as_bytes()
+        except NotFound:
+            raise FileNotFoundError(f"gs://{self.bucket_name}/{path}")
+        return data, str(blob.generation) if blob.generation else None
+
+    def _put(self, path: str, data: bytes, content_type: str):
+        self.bucket.blob(path).upload_from_string(data, content_type=content_type)
+
+    def _delete(self, path: str):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.bucket.blob(path).delete()
+        except NotFound:
+            pass
+
+    def _list(self, prefix: str) -> List[str]:
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)]
+
+    def _signed_url(self, path: str, expires_seconds: int, disposition: Optional[str],
+                    content_type: Optional[str]) -> Optional[str]:
+        from google.auth.credentials import Signing
+        from google.auth.transport.requests import Request
+
+        # 서비스 계정 키 파일이 없으면 (Cloud Run 기본 자격 증명) IAM signBlob으로 서명
+        kwargs = {}
+        if not isinstance(self.credentials, Signing):
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+            kwargs = {
+                "service_account_email": self.credentials.service_account_email,
+                "access_token": self.credentials.token,
+            }
+
+        return self.bucket.blob(path).generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expires_seconds),
+            method="GET",
+            response_disposition=disposition,
+            response_type=content_type,
+            **kwargs,
+        )
+
+    def _open_chunks(self, path: str, chunk_size: int):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            reader = self.bucket.blob(path).open("rb", chunk_size=chunk_size)
+        except NotFound:
+            raise FileNotFoundError(f"gs://{self.bucket_name}/{path}")
+        return _ReaderChunks(reader, chunk_size)
+
+    def public_url(self, path: str) -> str:
+        return f"{GCS_PUBLIC_HOST}/{self.bucket_name}/{path}"
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{GCS_PUBLIC_HOST}/{self.bucket_name}/"
+        if url.startswith(prefix):
+            return unquote(url[len(prefix):].split("?", 1)[0])
+        return None
+
+    def close(self):
+        self.client.close()
+
+
+class _ReaderChunks:
+    """파일 객체 → 청크 iterator"""
+
+    def __init__(self, reader, chunk_size: int):
+        self.reader = reader
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        chunk = self.reader.read(self.chunk_size)
+        if not chunk:
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        self.reader.close()
+
+
+# ===== 로컬 파일시스템 =====
+
+class LocalStorage(StorageBackend):
     """
-    GCS에 파일 업로드 (비동기)
-    
-    async 함수에서 호출 시 blocking 방지를 위해 사용
-    
-    Args:
-        file_data: 업로드할 파일 데이터
-        destination_path: GCS 경로 (예: ai_generated/xxx.jpg)
-        content_type: 파일 타입
-        bucket_name: 버킷명 (기본값: settings.GCS_BUCKET_NAME)
-    
-    Returns:
-        공개 URL (https://storage.googleapis.com/...)
+    로컬 디렉토리 (개발·테스트·벤치마크용)
+    공개 URL은 STORAGE_PUBLIC_BASE_URL (없으면 file:// URI)
     """
-    import asyncio
-    
-    def _upload():
-        return upload_to_gcs(file_data, destination_path, content_type, bucket_name)
-    
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _upload)
\ No newline at end of file
+
+    def __init__(self, root: str, concurrency: int, base_url: Optional[str] = None):
+        super().__init__(concurrency)
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base_url = (base_url or self.root.as_uri()).rstrip("/")
+        logger.info(f"✅ 로컬 스토리지 초기화 완료: {self.root}")
+
+    def _file(self, path: str) -> Path:
+        file = (self.root / path).resolve()
+        if not file.is_relative_to(self.root):
+            raise ValueError(f"스토리지 밖의 경로: {path}")
+        return file
+
+    def _get(self, path: str) -> bytes:
+        return self._file(path).read_bytes()
+
+    def _get_versioned(self, path: str) -> Tuple[bytes, Optional[str]]:
+        file = self._file(path)
+        generation = str(file.stat().st_mtime_ns)
+        return file.read_bytes(), generation
+
+    def _put(self, path: str, data: bytes, content_type: str):
+        file = self._file(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = file.with_name(f".{file.name}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(file)
+
+    def _delete(self, path: str):
+        self._file(path).unlink(missing_ok=True)
+
+    def _list(self, prefix: str) -> List[str]:
+        return sorted(
+            name for name in (p.relative_to(self.root).as_posix() for p in self.root.rglob("*") if p.is_file())
+            if name.startswith(prefix)
+        )
+
+    def _open_chunks(self, path: str, chunk_size: int):
+        return _ReaderChunks(self._file(path).open("rb"), chunk_size)
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{quote(path)}"
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.base_url}/"
+        if url.startswith(prefix):
+            return unquote(url[len(prefix):].split("?", 1)[0])
+        return None
+
+
+# ===== 메모리 =====
+
+class MemoryStorage(StorageBackend):
+    """프로세스 메모리 dict (단위 테스트·벤치마크용, 네트워크/디스크 I/O 없음)"""
+
+    BASE_URL = "memory://storage"
+
+    def __init__(self, concurrency: int):
+        super().__init__(concurrency)
+        self._objects: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, path: str) -> bytes:
+        with self._lock:
+            if path not in self._objects:
+                raise FileNotFoundError(path)
+            return self._objects[path][0]
+
+    def _put(self, path: str, data: bytes, content_type: str):
+        with self._lock:
+            self._objects[path] = (bytes(data), content_type)
+
+    def _delete(self, path: str):
+        with self._lock:
+            self._objects.pop(path, None)
+
+    def _list(self, prefix: str) -> List[str]:
+        with self._lock:
+            return sorted(name for name in self._objects if name.startswith(prefix))
+
+    def _open_chunks(self, path: str, chunk_size: int):
+        data = self._get(path)
+        return iter([data[i:i + chunk_size] for i in range(0, len(data), chunk_size)])
+
+    def public_url(self, path: str) -> str:
+        return f"{self.BASE_URL}/{quote(path)}"
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.BASE_URL}/"
+        return unquote(url[len(prefix):]) if url.startswith(prefix) else None
+
+
+# ===== 백엔드 레지스트리 =====
+
+STORAGE_BACKENDS = {
+    "gcs": lambda: GCSStorage(
+        bucket_name=settings.GCS_BUCKET_NAME or DEFAULT_BUCKET,
+        concurrency=settings.STORAGE_CONCURRENCY,
+        max_connections=settings.STORAGE_MAX_CONNECTIONS,
+        credentials_file=settings.GOOGLE_APPLICATION_CREDENTIALS,
+    ),
+    "local": lambda: LocalStorage(
+        root=settings.STORAGE_LOCAL_ROOT,
+        concurrency=settings.STORAGE_CONCURRENCY,
+        base_url=settings.STORAGE_PUBLIC_BASE_URL,
+    ),
+    "memory": lambda: MemoryStorage(concurrency=settings.STORAGE_CONCURRENCY),
+}
+
+_storage: Optional[StorageBackend] = None  # 싱글톤
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """설정된 스토리지 백엔드 (싱글톤)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = settings.STORAGE_BACKEND
+                if backend not in STORAGE_BACKENDS:
+                    raise ValueError(f"Unknown STORAGE_BACKEND: {backend} (choose from {list(STORAGE_BACKENDS)})")
+                _storage = STORAGE_BACKENDS[backend]()
+                if settings.BLOB_CACHE_ENABLED:
+                    _storage.cache = BlobCache(
+                        root=settings.BLOB_CACHE_DIR,
+                        memory_bytes=settings.BLOB_CACHE_MEMORY_MB * 1024 * 1024,
+                        disk_bytes=settings.BLOB_CACHE_DISK_MB * 1024 * 1024,
+                    )
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]):
+    """스토리지 교체 (테스트·벤치마크용, None이면 설정 기반으로 다시 생성)"""
+    global _storage
+    if _storage is not None and _storage is not storage:
+        _storage.close()
+    _storage = storage
+
+
+def close_storage():
+    """앱 종료 시 스토리지 연결 정리"""
+    set_storage(None)
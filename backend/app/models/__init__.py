@@ -16,6 +16,8 @@ from .caption_system import (
     CaptionCorrection,
     AdCopyHistory
 )
+from .pipeline_job import PipelineJob
+from .result_cache import ResultCacheEntry
 
 __all__ = [
     # schemas.py
@@ -31,5 +33,11 @@ __all__ = [
     # caption_system.py
     "AdCaption",
     "CaptionCorrection",
-    "AdCopyHistory"
+    "AdCopyHistory",
+    
+    # pipeline_job.py
+    "PipelineJob",
+    
+    # result_cache.py
+    "ResultCacheEntry"
 ]
\ No newline at end of file
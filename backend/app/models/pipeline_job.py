@@ -0,0 +1,46 @@
+"""
+파이프라인 job 큐 모델
+여러 인스턴스가 공유하는 job 상태 저장소 (SQL 큐 백엔드)
+"""
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class PipelineJob(Base):
+    """
+    파이프라인 실행 job
+
+    queue_status:
+    - queued: 대기 중 (워커가 claim 가능)
+    - running: 워커가 실행 중 (lease_expires_at 까지 소유)
+    - done: 종료 (성공/실패는 state.status 참고)
+    """
+    __tablename__ = 'pipeline_jobs'
+
+    job_id = Column(String(36), primary_key=True)
+    user_id = Column(String(36), nullable=False, index=True)
+    content_id = Column(String(36), nullable=False)
+    batch_id = Column(String(36), nullable=True, index=True)   # 배치 요청으로 생성된 job
+
+    # 큐 상태
+    queue_status = Column(String(20), nullable=False, default="queued")
+    worker_id = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # 파이프라인 상태 (PipelineState 전체)
+    state = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_pipeline_jobs_queue', 'queue_status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<PipelineJob(job_id={self.job_id}, queue_status={self.queue_status})>"
@@ -0,0 +1,25 @@
+"""
+파이프라인 결과 캐시 인덱스 모델
+동일 입력 → 동일 결과인 단계(배경 제거 / VTON / 배경 생성) 결과의 GCS 위치 색인
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class ResultCacheEntry(Base):
+    """결과 캐시 항목 (cache_key = 입력 내용 해시)"""
+    __tablename__ = 'result_cache_entries'
+
+    cache_key = Column(String(64), primary_key=True)
+    stage = Column(String(50), nullable=False)
+    blob_path = Column(String(500), nullable=False)     # GCS 경로
+    size_bytes = Column(BigInteger, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<ResultCacheEntry(cache_key={self.cache_key}, stage={self.stage})>"
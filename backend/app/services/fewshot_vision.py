@@ -5,7 +5,7 @@ Few-shot Learning을 활용한 Vision AI 분석기
 """
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from datetime import datetime, timedelta
 
 # Models import (실제 경로에 맞게 수정 필요)
@@ -203,17 +203,19 @@ class EnhancedVisionAnalyzer:
     
     async def analyze(
         self, 
-        image_path: str, 
+        image: Union[str, bytes], 
         category: str = None,
-        use_fewshot: bool = True
+        use_fewshot: bool = True,
+        mime_type: Optional[str] = None
     ) -> Dict:
         """
         이미지 분석 (Few-shot learning 적용)
         
         Args:
-            image_path: 이미지 파일 경로
+            image: 이미지 파일 경로 또는 인코딩된 이미지 bytes
             category: 제품 카테고리 (힌트)
             use_fewshot: Few-shot learning 사용 여부
+            mime_type: bytes의 MIME 타입
             
         Returns:
             Vision AI 분석 결과
@@ -232,8 +234,9 @@ class EnhancedVisionAnalyzer:
         
         # Vision AI 분석 실행
         result = await self.base_analyzer.analyze(
-            image_path,
-            custom_prompt=custom_prompt  # ⭐ custom_prompt 전달
+            image,
+            custom_prompt=custom_prompt,  # ⭐ custom_prompt 전달
+            mime_type=mime_type
         )
         
         return result
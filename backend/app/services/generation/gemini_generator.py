@@ -3,14 +3,17 @@ Gemini API 기반 패션 광고 이미지 생성 서비스
 GPU 서버 없이 Google Gemini API로 이미지 생성
 google-genai 최신 SDK + gemini-2.5-flash-image 모델 사용
 """
-from google import genai
 from google.genai import types
 from PIL import Image
 import io
+import asyncio
 import logging
 from typing import Optional
 
 from config import settings
+from app.core.clients import get_genai_client
+from app.core.image_encoding import encode_image
+from app.core.metrics import provider_call
 
 logger = logging.getLogger(__name__)
 
@@ -23,11 +26,102 @@ class GeminiImageGenerator:
         if not settings.GOOGLE_MODEL_API_KEY:
             raise ValueError("GOOGLE_MODEL_API_KEY not found in settings")
         
-        # 최신 SDK 클라이언트 생성
-        self.client = genai.Client(api_key=settings.GOOGLE_MODEL_API_KEY)
+        # 공용 SDK 클라이언트 (프로세스 전체 재사용)
+        self.client = get_genai_client(settings.GOOGLE_MODEL_API_KEY)
         self.model = "gemini-2.5-flash-image"  # GA 모델
         logger.info(f"✅ Gemini Image Generator initialized (model: {self.model})")
     
+    def _build_prompt(self, style: str, user_prompt: Optional[str] = None) -> str:
+        """스타일별 프롬프트 + 사용자 추가 요청"""
+        # 스타일별 프롬프트
+        style_prompts = {
+            'resort': (
+                "Transform this into a professional RESORT MAGAZINE advertisement. "
+                "Create a bright, clean, tropical vacation setting with: "
+                "white sand beach or poolside, palm trees, natural daylight, azure water background. "
+                "Style: Editorial magazine photography, bright and airy, luxury resort wear catalog. "
+                "Lighting: Natural sunlight, bright but soft shadows. "
+                "Mood: Relaxed, vacation vibes, sophisticated leisure. "
+                "Keep the clothing as main focus with professional model pose."
+            ),
+            
+            'retro': (
+                "Transform this into a Y2K FESTIVAL RETRO advertisement. "
+                "Create a vibrant retro setting with: "
+                "bright pop art colors (red, yellow, cyan), festival atmosphere, playful energy. "
+                "Style: NOT dark vintage - instead use bright 2000s aesthetic, fun and energetic. "
+                "Add retro patterns or geometric shapes as decorative elements. "
+                "Think: NEPA festival poster, bright retro festival vibes, NOT sepia-toned. "
+                "Lighting: Bright and colorful, pop art style lighting. "
+                "Mood: Fun, energetic, festival party atmosphere."
+            ),
+            
+            'romantic': (
+                "Transform this into an ELEGANT BEIGE-GOLD ROMANTIC advertisement. "
+                "Create a sophisticated romantic setting with: "
+                "beige/cream/champagne color palette, soft golden lighting, elegant interior or garden. "
+                "Add elements: delicate flowers (roses, peonies), elegant furniture, soft curtains. "
+                "Style: Luxury brand photography, NOT bright pink - use beige and gold tones. "
+                "Think: NewJeans Beautiful Holiday, sophisticated magazine cover, elegant and pure. "
+                "Lighting: Soft golden hour glow, dreamy but not overly bright. "
+                "Mood: Elegant, sophisticated, pure beauty, luxury romance."
+            )
+        }
+        
+        base_prompt = style_prompts.get(style.lower(), style_prompts['resort'])
+        
+        # 사용자 프롬프트 추가
+        if user_prompt:
+            return f"{base_prompt}\n\nAdditional requirements: {user_prompt}"
+        return base_prompt
+    
+    def _build_request(self, product_image: Image.Image, style: str, user_prompt: Optional[str]) -> dict:
+        """generate_content 요청 인자 구성 (프롬프트 + 인코딩된 제품 이미지, gemini_input 정책)"""
+        final_prompt = self._build_prompt(style, user_prompt)
+        
+        logger.info(f"🎨 Generating fashion ad with Gemini")
+        logger.info(f"   Model: {self.model}")
+        logger.info(f"   Style: {style}")
+        logger.info(f"   Prompt length: {len(final_prompt)} chars")
+        
+        # 이미지를 bytes로 변환 (불투명 입력은 JPEG, 투명 영역이 있으면 PNG)
+        encoded = encode_image(product_image, "gemini_input")
+        
+        # 입력: 텍스트 프롬프트 + 제품 이미지
+        # 출력: 변환된 광고 이미지
+        return dict(
+            model=self.model,
+            contents=[
+                final_prompt,
+                types.Part.from_bytes(
+                    data=encoded.data,
+                    mime_type=encoded.mime_type
+                )
+            ],
+            config=types.GenerateContentConfig(
+                response_modalities=['IMAGE'],  # 이미지만 출력
+                image_config=types.ImageConfig(
+                    aspect_ratio='1:1',  # 정사각형
+                )
+            )
+        )
+    
+    def _extract_image(self, response) -> Image.Image:
+        """응답에서 생성된 이미지 추출"""
+        if response.candidates and len(response.candidates) > 0:
+            for part in response.candidates[0].content.parts:
+                # 이미지 데이터 찾기
+                if hasattr(part, 'inline_data') and part.inline_data:
+                    image_data = part.inline_data.data
+                    result_image = Image.open(io.BytesIO(image_data))
+                    
+                    logger.info(f"✅ Gemini generation succeeded")
+                    logger.info(f"   Result size: {result_image.size}")
+                    
+                    return result_image
+        
+        raise Exception("No image generated in response")
+    
     def generate_fashion_ad(
         self,
         product_image: Image.Image,
@@ -35,7 +129,7 @@ class GeminiImageGenerator:
         user_prompt: Optional[str] = None
     ) -> Image.Image:
         """
-        패션 광고 이미지 생성
+        패션 광고 이미지 생성 (동기)
         
         Args:
             product_image: 제품 이미지
@@ -46,94 +140,37 @@ class GeminiImageGenerator:
             생성된 광고 이미지
         """
         try:
-            # 스타일별 프롬프트
-            style_prompts = {
-                'resort': (
-                    "Transform this into a professional RESORT MAGAZINE advertisement. "
-                    "Create a bright, clean, tropical vacation setting with: "
-                    "white sand beach or poolside, palm trees, natural daylight, azure water background. "
-                    "Style: Editorial magazine photography, bright and airy, luxury resort wear catalog. "
-                    "Lighting: Natural sunlight, bright but soft shadows. "
-                    "Mood: Relaxed, vacation vibes, sophisticated leisure. "
-                    "Keep the clothing as main focus with professional model pose."
-                ),
-                
-                'retro': (
-                    "Transform this into a Y2K FESTIVAL RETRO advertisement. "
-                    "Create a vibrant retro setting with: "
-                    "bright pop art colors (red, yellow, cyan), festival atmosphere, playful energy. "
-                    "Style: NOT dark vintage - instead use bright 2000s aesthetic, fun and energetic. "
-                    "Add retro patterns or geometric shapes as decorative elements. "
-                    "Think: NEPA festival poster, bright retro festival vibes, NOT sepia-toned. "
-                    "Lighting: Bright and colorful, pop art style lighting. "
-                    "Mood: Fun, energetic, festival party atmosphere."
-                ),
-                
-                'romantic': (
-                    "Transform this into an ELEGANT BEIGE-GOLD ROMANTIC advertisement. "
-                    "Create a sophisticated romantic setting with: "
-                    "beige/cream/champagne color palette, soft golden lighting, elegant interior or garden. "
-                    "Add elements: delicate flowers (roses, peonies), elegant furniture, soft curtains. "
-                    "Style: Luxury brand photography, NOT bright pink - use beige and gold tones. "
-                    "Think: NewJeans Beautiful Holiday, sophisticated magazine cover, elegant and pure. "
-                    "Lighting: Soft golden hour glow, dreamy but not overly bright. "
-                    "Mood: Elegant, sophisticated, pure beauty, luxury romance."
-                )
-            }
-            
-            base_prompt = style_prompts.get(style.lower(), style_prompts['resort'])
+            request = self._build_request(product_image, style, user_prompt)
+            response = self.client.models.generate_content(**request)
+            return self._extract_image(response)
             
-            # 사용자 프롬프트 추가
-            if user_prompt:
-                final_prompt = f"{base_prompt}\n\nAdditional requirements: {user_prompt}"
-            else:
-                final_prompt = base_prompt
-            
-            logger.info(f"🎨 Generating fashion ad with Gemini")
-            logger.info(f"   Model: {self.model}")
-            logger.info(f"   Style: {style}")
-            logger.info(f"   Prompt length: {len(final_prompt)} chars")
-            
-            # 이미지를 bytes로 변환
-            img_byte_arr = io.BytesIO()
-            product_image.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-            image_bytes = img_byte_arr.getvalue()
-            
-            # Gemini 2.5 Flash Image로 이미지 생성
-            # 입력: 텍스트 프롬프트 + 제품 이미지
-            # 출력: 변환된 광고 이미지
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[
-                    final_prompt,
-                    types.Part.from_bytes(
-                        data=image_bytes,
-                        mime_type='image/png'
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    response_modalities=['IMAGE'],  # 이미지만 출력
-                    image_config=types.ImageConfig(
-                        aspect_ratio='1:1',  # 정사각형
-                    )
-                )
+        except Exception as e:
+            logger.error(f"❌ Gemini generation failed: {e}")
+            raise Exception(f"Gemini 이미지 생성 실패: {str(e)}")
+    
+    async def agenerate_fashion_ad(
+        self,
+        product_image: Image.Image,
+        style: str,
+        user_prompt: Optional[str] = None
+    ) -> Image.Image:
+        """
+        패션 광고 이미지 생성 (비동기, 이벤트 루프 비차단)
+        
+        PNG 인코딩/디코딩은 스레드에서, API 호출은 client.aio로 실행
+        """
+        try:
+            request = await asyncio.to_thread(self._build_request, product_image, style, user_prompt)
+            response = await provider_call(
+                "gemini",
+                "generate_image",
+                lambda: self.client.aio.models.generate_content(**request),
+                request_bytes=len(request["contents"][1].inline_data.data),
+                response_bytes=_response_image_bytes,
             )
-            
-            # 생성된 이미지 추출
-            if response.candidates and len(response.candidates) > 0:
-                for part in response.candidates[0].content.parts:
-                    # 이미지 데이터 찾기
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        image_data = part.inline_data.data
-                        result_image = Image.open(io.BytesIO(image_data))
-                        
-                        logger.info(f"✅ Gemini generation succeeded")
-                        logger.info(f"   Result size: {result_image.size}")
-                        
-                        return result_image
-            
-            raise Exception("No image generated in response")
+            image = await asyncio.to_thread(self._extract_image, response)
+            await asyncio.to_thread(image.load)
+            return image
             
         except Exception as e:
             logger.error(f"❌ Gemini generation failed: {e}")
@@ -143,11 +180,34 @@ class GeminiImageGenerator:
         """Gemini API 상태 확인"""
         try:
             # 간단한 텍스트 생성으로 테스트
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model='gemini-2.0-flash-exp',  # 텍스트 전용 모델로 테스트
                 contents='Hello'
             )
             return bool(response.text)
         except Exception as e:
             logger.error(f"Gemini health check failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+def _response_image_bytes(response) -> int:
+    """응답에 포함된 이미지 데이터 크기"""
+    total = 0
+    for candidate in response.candidates or []:
+        for part in candidate.content.parts or []:
+            if getattr(part, 'inline_data', None) and part.inline_data.data:
+                total += len(part.inline_data.data)
+    return total
+
+
+# 싱글톤 인스턴스
+_gemini_generator = None
+
+def get_gemini_generator() -> GeminiImageGenerator:
+    """Gemini 이미지 생성기 싱글톤 가져오기"""
+    global _gemini_generator
+    
+    if _gemini_generator is None:
+        _gemini_generator = GeminiImageGenerator()
+    
+    return _gemini_generator
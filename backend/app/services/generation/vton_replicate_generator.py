@@ -2,9 +2,9 @@
 Replicate IDM-VTON 기반 패션 광고 생성 서비스
 가상 피팅 (Virtual Try-On) + 스타일별 배경
 """
-import replicate
 from PIL import Image
 import io
+import asyncio
 import logging
 import requests
 from typing import Optional
@@ -12,10 +12,16 @@ import random
 import time
 
 from config import settings
-from app.core.storage import upload_to_gcs
+from app.core.storage import get_storage
+from app.core.clients import get_replicate_client, fetch_bytes
+from app.core.image_encoding import encode_image
+from app.core.metrics import provider_call
 
 logger = logging.getLogger(__name__)
 
+# Replicate IDM-VTON 모델 버전 (고정)
+VTON_MODEL_VERSION = "cuuupid/idm-vton:c871bb9b046607b680449ecbae55fd8c6d945e0a1948644bf2361b3d021d3ff4"
+
 
 class ReplicateVTONService:
     """Replicate IDM-VTON을 사용한 광고 생성"""
@@ -25,29 +31,25 @@ class ReplicateVTONService:
         if not settings.REPLICATE_API_TOKEN:
             raise ValueError("REPLICATE_API_TOKEN not found in settings")
         
-        # ⭐ Client 인스턴스 생성
-        self.client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+        # ⭐ 공용 Client 인스턴스 (프로세스 전체 재사용)
+        self.client = get_replicate_client()
         self.api_token = settings.REPLICATE_API_TOKEN
         
         logger.info(f"🔑 Replicate Client initialized")
         logger.info(f"   Token: {self.api_token[:10] if self.api_token else 'None'}...")
         
-        # GCS 버킷 이름
-        bucket_name = settings.GCS_BUCKET_NAME or "adgen-ai-storage"
-        
-        # ⭐ GCS에서 실제 존재하는 모델 이미지 목록 로드
-        logger.info("📁 Loading K-Fashion models from GCS...")
-        self.K_FASHION_MODELS = self._load_models_from_gcs(bucket_name)
+        # ⭐ 스토리지에서 실제 존재하는 모델 이미지 목록 로드
+        logger.info("📁 Loading K-Fashion models from storage...")
+        self.K_FASHION_MODELS = self._load_models_from_storage()
         
         logger.info("✅ Replicate VTON Service initialized")
-        logger.info(f"   Bucket: {bucket_name}")
         logger.info(f"   Models loaded: {sum(len(v) for v in self.K_FASHION_MODELS.values())} images")
         if self.K_FASHION_MODELS.get('resort'):
             logger.info(f"   Sample resort URL: {self.K_FASHION_MODELS['resort'][0]}")
     
-    def _load_models_from_gcs(self, bucket_name: str) -> dict:
+    def _load_models_from_storage(self) -> dict:
         """
-        GCS에서 실제 존재하는 모델 이미지 목록 로드
+        스토리지에서 실제 존재하는 모델 이미지 목록 로드
         
         Returns:
             {
@@ -56,24 +58,21 @@ class ReplicateVTONService:
                 'romantic': [...]
             }
         """
-        from app.core.storage import get_storage_client
-        
-        client = get_storage_client()
-        bucket = client.bucket(bucket_name)
+        storage = get_storage()
         
         models = {}
         
         for style in ['resort', 'retro', 'romantic']:
             prefix = f"k-fashion-models/{style}/"
-            blobs = list(bucket.list_blobs(prefix=prefix))
+            names = storage.list_sync(prefix)
             
             # .jpg 파일만 필터링 (mask, json 제외)
             jpg_files = [
-                f"https://storage.googleapis.com/{bucket_name}/{blob.name}"
-                for blob in blobs
-                if blob.name.endswith('.jpg') 
-                and not blob.name.endswith('_mask.jpg')
-                and not blob.name.endswith('.json')
+                storage.public_url(name)
+                for name in names
+                if name.endswith('.jpg') 
+                and not name.endswith('_mask.jpg')
+                and not name.endswith('.json')
             ]
             
             models[style] = jpg_files
@@ -89,10 +88,15 @@ class ReplicateVTONService:
         garment_image: Image.Image,
         style: str = "resort",
         model_index: Optional[int] = None,
-        user_prompt: Optional[str] = None
+        user_prompt: Optional[str] = None,
+        garment_url: Optional[str] = None
     ) -> Image.Image:
-        """패션 광고 이미지 생성 (VTON) """
-        temp_garment_url = None
+        """
+        패션 광고 이미지 생성 (VTON)
+
+        garment_url: 이미 GCS에 업로드된 의류 이미지 URL (있으면 임시 업로드 생략)
+        """
+        temp_garment_url = garment_url
         
         try:
             logger.info(f"🎨 [VTON] Starting generation")
@@ -100,21 +104,19 @@ class ReplicateVTONService:
             logger.info(f"   [VTON] Model index: {model_index}")
             logger.info(f"   [VTON] Garment size: {garment_image.size}")
             
-            # 1. 의류 이미지를 GCS에 임시 업로드
-            timestamp = int(time.time())
-            temp_filename = f"temp/garment_{timestamp}.png"
-            
-            garment_bytes = io.BytesIO()
-            garment_image.save(garment_bytes, format='PNG')
-            garment_bytes.seek(0)
-            
-            logger.info(f"[VTON] Step 1: Uploading garment to GCS: {temp_filename}")
-            temp_garment_url = upload_to_gcs(
-                file_data=garment_bytes.getvalue(),
-                destination_path=temp_filename,
-                content_type='image/png'
-            )
-            logger.info(f"[VTON] Step 1: ✅ Garment uploaded: {temp_garment_url}")
+            # 1. 의류 이미지를 GCS에 임시 업로드 (URL이 없는 경우만)
+            if temp_garment_url:
+                logger.info(f"[VTON] Step 1: ✅ Using uploaded garment: {temp_garment_url}")
+            else:
+                timestamp = int(time.time())
+                encoded = encode_image(garment_image, "vton_garment")
+                temp_filename = f"temp/garment_{timestamp}.{encoded.extension}"
+                
+                logger.info(f"[VTON] Step 1: Uploading garment to GCS: {temp_filename}")
+                temp_garment_url = get_storage().put_sync(
+                    temp_filename, encoded.data, content_type=encoded.mime_type
+                )
+                logger.info(f"[VTON] Step 1: ✅ Garment uploaded: {temp_garment_url}")
             
             if not temp_garment_url:
                 raise ValueError("❌ Garment upload failed: temp_garment_url is None")
@@ -131,26 +133,14 @@ class ReplicateVTONService:
             logger.info("[VTON] Step 3: Calling Replicate API...")
             
             output = self.client.run(
-                "cuuupid/idm-vton:c871bb9b046607b680449ecbae55fd8c6d945e0a1948644bf2361b3d021d3ff4",
-                input={
-                    "garm_img": temp_garment_url,
-                    "human_img": model_image_url,
-                    "garment_des": f"A {style} style garment",
-                    "category": "upper_body",
-                    "steps": 30,
-                    "seed": 42
-                }
+                VTON_MODEL_VERSION,
+                input=self._build_input(temp_garment_url, model_image_url, style)
             )
             
             logger.info(f"[VTON] Step 3: ✅ API response received")
             
             # 4. 결과 이미지 다운로드
-            if isinstance(output, str):
-                result_url = output
-            elif isinstance(output, list) and len(output) > 0:
-                result_url = output[0]
-            else:
-                raise Exception(f"Unexpected output format: {type(output)}")
+            result_url = self._output_url(output)
             
             logger.info(f"[VTON] Step 4: Downloading result from: {result_url}")
             
@@ -172,6 +162,95 @@ class ReplicateVTONService:
             if temp_garment_url:
                 logger.info(f"[VTON] Temp file created: {temp_garment_url}")
     
+    async def agenerate_fashion_ad(
+        self,
+        garment_image: Image.Image,
+        style: str = "resort",
+        model_index: Optional[int] = None,
+        user_prompt: Optional[str] = None,
+        garment_url: Optional[str] = None,
+        model_image_url: Optional[str] = None
+    ) -> Image.Image:
+        """
+        패션 광고 이미지 생성 (VTON, 비동기)
+
+        Replicate 호출은 async_run, 결과 다운로드는 공용 HTTP 클라이언트 사용
+        garment_url: 이미 GCS에 업로드된 의류 이미지 URL (있으면 임시 업로드 생략)
+        model_image_url: select_model_image로 미리 선택한 모델 이미지 (없으면 여기서 선택)
+        """
+        try:
+            logger.info(f"🎨 [VTON] Starting generation (async)")
+            logger.info(f"   [VTON] Style: {style}, Model index: {model_index}, Garment size: {garment_image.size}")
+            
+            # 1. 의류 이미지 URL 확보
+            if not garment_url:
+                encoded = await asyncio.to_thread(encode_image, garment_image, "vton_garment")
+                garment_url = await get_storage().put(
+                    f"temp/garment_{int(time.time())}.{encoded.extension}",
+                    encoded.data,
+                    content_type=encoded.mime_type,
+                )
+            logger.info(f"[VTON] Step 1: ✅ Garment: {garment_url}")
+            
+            # 2. K-Fashion 모델 선택
+            model_image_url = model_image_url or self._get_model_image(style, model_index)
+            logger.info(f"[VTON] Step 2: ✅ Selected model: {model_image_url}")
+            
+            # 3. Replicate IDM-VTON API 호출
+            output = await provider_call(
+                "replicate",
+                "idm_vton",
+                lambda: self.client.async_run(
+                    VTON_MODEL_VERSION,
+                    input=self._build_input(garment_url, model_image_url, style)
+                ),
+            )
+            logger.info(f"[VTON] Step 3: ✅ API response received")
+            
+            # 4. 결과 이미지 다운로드
+            result_url = self._output_url(output)
+            data = await provider_call(
+                "replicate",
+                "download_result",
+                lambda: fetch_bytes(result_url, timeout=60),
+                response_bytes=len,
+            )
+            result_image = Image.open(io.BytesIO(data))
+            await asyncio.to_thread(result_image.load)
+            
+            logger.info(f"✅ [VTON] Generation completed successfully: {result_image.size}")
+            return result_image
+            
+        except Exception as e:
+            logger.error(f"❌ [VTON] Generation failed", exc_info=True)
+            raise Exception(f"Replicate 가상 피팅 실패: {str(e)}")
+    
+    def _build_input(self, garment_url: str, model_image_url: str, style: str) -> dict:
+        """IDM-VTON 입력 파라미터 (seed 고정 → 동일 입력 동일 결과)"""
+        return {
+            "garm_img": garment_url,
+            "human_img": model_image_url,
+            "garment_des": f"A {style} style garment",
+            "category": "upper_body",
+            "steps": 30,
+            "seed": 42
+        }
+    
+    def _output_url(self, output) -> str:
+        """Replicate 출력에서 결과 이미지 URL 추출"""
+        if isinstance(output, str):
+            return output
+        if isinstance(output, list) and len(output) > 0:
+            return str(output[0])
+        raise Exception(f"Unexpected output format: {type(output)}")
+    
+    def select_model_image(self, style: str, model_index: Optional[int] = None) -> str:
+        """
+        VTON에 사용할 모델 이미지 URL 선택 (model_index 없으면 랜덤)
+        결과 캐시 키 계산 시 실제 사용될 모델 이미지를 미리 확정하기 위해 사용
+        """
+        return self._get_model_image(style, model_index)
+    
     def _get_model_image(self, style: str, model_index: Optional[int] = None) -> str:
         """스타일에 맞는 K-Fashion 모델 이미지 가져오기"""
         logger.info(f"   [_get_model_image] Input: style={style}, model_index={model_index}")
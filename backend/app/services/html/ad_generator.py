@@ -5,12 +5,26 @@ GPT-5를 사용하여 인스타그램 광고 카피를 생성하고 HTML 템플
 import os
 import json
 from typing import Dict, Optional
-from openai import OpenAI
 from datetime import datetime
 
 from app.templates.ad_templates import AD_TEMPLATES
+from app.core.clients import get_openai_client, get_openai_sync_client
+from app.core.metrics import provider_call
 from config import settings  # ⭐ 추가!
 
+# 광고 카피 생성 시스템 프롬프트
+AD_COPY_SYSTEM_PROMPT = """당신은 인스타그램 광고 전문 카피라이터입니다.
+
+⚠️ CRITICAL - 인코딩 규칙:
+1. 반드시 UTF-8 인코딩으로 한글 작성
+2. 모든 텍스트는 순수 한글 문자만 사용
+3. 이스케이프 시퀀스나 특수 인코딩 사용 금지
+4. JSON 응답에서 한글이 깨지지 않도록 주의
+
+예시: "베이지의 따뜻함" (O), "string" (X)
+
+반드시 JSON 형식으로만 응답합니다."""
+
 def select_template(style_tags: list) -> str:
     """스타일 태그 기반 템플릿 선택"""
     # 스타일 태그를 소문자로 변환
@@ -38,10 +52,9 @@ class AdGenerator:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not found in settings")
         
-        self.client = OpenAI(
-            api_key=settings.OPENAI_API_KEY,  # ⭐ os.getenv 대신 settings 사용
-            timeout=30.0
-        )
+        # 공용 클라이언트 (프로세스 전체 재사용, keep-alive)
+        self.client = get_openai_sync_client()
+        self.async_client = get_openai_client()
         self.model = "gpt-5-chat-latest"  # ✅ GPT-5 최신 모델!
     
     def _build_prompt(
@@ -297,17 +310,7 @@ class AdGenerator:
                 messages=[
                     {
                         "role": "system",
-                        "content": """당신은 인스타그램 광고 전문 카피라이터입니다.
-
-⚠️ CRITICAL - 인코딩 규칙:
-1. 반드시 UTF-8 인코딩으로 한글 작성
-2. 모든 텍스트는 순수 한글 문자만 사용
-3. 이스케이프 시퀀스나 특수 인코딩 사용 금지
-4. JSON 응답에서 한글이 깨지지 않도록 주의
-
-예시: "베이지의 따뜻함" (O), "string" (X)
-
-반드시 JSON 형식으로만 응답합니다."""
+                        "content": AD_COPY_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -436,6 +439,50 @@ class AdGenerator:
             'template_used': template_name
         }
     
+    def _render_template(
+        self,
+        template_name: str,
+        image_url: str,
+        ad_copy: Dict,
+        ad_inputs: Optional[Dict] = None
+    ) -> Dict:
+        """사용자 광고 정보 반영 + 템플릿 변수 치환"""
+        if ad_inputs:
+            print(f"📝 사용자 광고 정보:")
+            if ad_inputs.get('discount'):
+                print(f"   - 할인율: {ad_inputs['discount']}")
+                ad_copy['discount'] = ad_inputs['discount']
+            if ad_inputs.get('brand'):
+                print(f"   - 브랜드: {ad_inputs['brand']}")
+                ad_copy['brand'] = ad_inputs['brand']
+            if ad_inputs.get('period'):
+                print(f"   - 기간: {ad_inputs['period']}")
+                ad_copy['period'] = ad_inputs['period']
+
+        # 템플릿 HTML 가져오기
+        template_html = AD_TEMPLATES[template_name]['html']
+        
+        # 변수 치환
+        replacements = {
+            "{{IMAGE_URL}}": image_url,
+            "{{HEADLINE}}": ad_copy.get('headline', '특가 이벤트'),
+            "{{SUBTEXT}}": ad_copy.get('subtext', ''),
+            "{{DISCOUNT}}": ad_copy.get('discount', '50% OFF'),
+            "{{PERIOD}}": ad_copy.get('period', '한정 기간'),
+            "{{BRAND}}": ad_copy.get('brand', 'SALE'),
+            "{{EVENT_NAME}}": ad_copy.get('event_name', '특별 이벤트')
+        }
+        
+        html = template_html
+        for placeholder, value in replacements.items():
+            html = html.replace(placeholder, value)
+        
+        return {
+            'html': html,
+            'ad_copy': ad_copy,
+            'template_used': template_name
+        }
+    
     def generate_html_with_template(
         self,
         vision_result: Dict,
@@ -478,41 +525,109 @@ class AdGenerator:
             ad_inputs
         )
         
-        if ad_inputs:
-            print(f"📝 사용자 광고 정보:")
-            if ad_inputs.get('discount'):
-                print(f"   - 할인율: {ad_inputs['discount']}")
-                ad_copy['discount'] = ad_inputs['discount']
-            if ad_inputs.get('brand'):
-                print(f"   - 브랜드: {ad_inputs['brand']}")
-                ad_copy['brand'] = ad_inputs['brand']
-            if ad_inputs.get('period'):
-                print(f"   - 기간: {ad_inputs['period']}")
-                ad_copy['period'] = ad_inputs['period']
-
-        # 3. 템플릿 HTML 가져오기
-        template_html = AD_TEMPLATES[template_name]['html']
-        
-        # 4. 변수 치환
-        replacements = {
-            "{{IMAGE_URL}}": image_url,
-            "{{HEADLINE}}": ad_copy.get('headline', '특가 이벤트'),
-            "{{SUBTEXT}}": ad_copy.get('subtext', ''),
-            "{{DISCOUNT}}": ad_copy.get('discount', '50% OFF'),
-            "{{PERIOD}}": ad_copy.get('period', '한정 기간'),
-            "{{BRAND}}": ad_copy.get('brand', 'SALE'),
-            "{{EVENT_NAME}}": ad_copy.get('event_name', '특별 이벤트')
-        }
+        # 3. 템플릿 렌더링
+        return self._render_template(template_name, image_url, ad_copy, ad_inputs)
+    
+    async def agenerate_html_with_template(
+        self,
+        vision_result: Dict,
+        image_url: str,
+        template_name: str,
+        caption: Optional[str] = None,
+        user_request: Optional[str] = None,
+        ad_inputs: Optional[Dict] = None
+    ) -> Dict:
+        """generate_html_with_template 비동기 버전 (AsyncOpenAI 사용, 이벤트 루프 비차단)"""
+        if template_name not in AD_TEMPLATES:
+            raise ValueError(f"Invalid template: {template_name}")
         
-        html = template_html
-        for placeholder, value in replacements.items():
-            html = html.replace(placeholder, value)
+        ad_copy = await self.agenerate_ad_copy_for_template(
+            vision_result,
+            template_name,
+            caption,
+            user_request,
+            ad_inputs
+        )
+        return self._render_template(template_name, image_url, ad_copy, ad_inputs)
+    
+    def _template_copy_request(
+        self,
+        vision_result: Dict,
+        template_name: str,
+        caption: Optional[str],
+        user_request: Optional[str],
+        ad_inputs: Optional[Dict]
+    ) -> Dict:
+        """템플릿 고정 광고 카피 GPT 요청 인자"""
+        prompt = self._build_prompt(vision_result, template_name, caption, user_request, ad_inputs)
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": AD_COPY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=500,
+            timeout=30.0,
+            response_format={"type": "json_object"}
+        )
+    
+    def _parse_template_copy(
+        self,
+        content,
+        template_name: str,
+        caption: Optional[str],
+        ad_inputs: Optional[Dict]
+    ) -> Dict:
+        """GPT 응답 파싱 + 한글 인코딩 검증 + 필수 문구/기간 반영"""
+        # UTF-8 인코딩 명시적 처리
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        
+        ad_copy = json.loads(content)
+        
+        # 한글 인코딩 검증
+        headline = ad_copy.get('headline', '')
+        if headline:
+            korean_chars = sum(1 for c in headline if ord(c) >= 0xAC00 and ord(c) <= 0xD7A3)
+            if korean_chars == 0:
+                print(f"⚠️ [{template_name}] 한글 인코딩 문제 감지: {headline}")
+                try:
+                    headline_bytes = headline.encode('latin-1')
+                    headline = headline_bytes.decode('utf-8')
+                    ad_copy['headline'] = headline
+                    print(f"✅ [{template_name}] 한글 인코딩 복구: {headline}")
+                except:
+                    print(f"❌ [{template_name}] 한글 인코딩 복구 실패")
+            else:
+                print(f"✅ [{template_name}] 한글 인코딩 정상: {headline}")
+        
+        # 캡션이 제공된 경우 강제로 사용
+        if caption:
+            ad_copy['caption'] = caption
+
+        if ad_inputs and ad_inputs.get('must_include'):
+            must_include = ad_inputs['must_include']
+            current_headline = ad_copy.get('headline', '')
+            
+            # headline에 필수 문구가 없으면 추가
+            if must_include not in current_headline:
+                ad_copy['headline'] = f"{current_headline} - {must_include}"
+                print(f"✅ 필수 문구 추가: {ad_copy['headline']}")
+        
+        if ad_inputs and ad_inputs.get('period'):
+            period = ad_inputs['period']
+            current_headline = ad_copy.get('headline', '')
+            
+            # 기간이 없으면 추가
+            if period not in current_headline:
+                ad_copy['headline'] = f"{current_headline} ({period})"
+                print(f"✅ 기간 추가: {ad_copy['headline']}")
+
+        # 템플릿 이름 추가
+        ad_copy['template_used'] = template_name
         
-        return {
-            'html': html,
-            'ad_copy': ad_copy,
-            'template_used': template_name
-        }
+        return ad_copy
     
     def generate_ad_copy_for_template(
         self,
@@ -535,92 +650,58 @@ class AdGenerator:
             광고 카피 dict
         """
         
-        # 프롬프트 생성 (템플릿 고정)
-        prompt = self._build_prompt(vision_result, template_name, caption, user_request, ad_inputs)
-        
-        # GPT 호출
+        # GPT 호출 (프롬프트: 템플릿 고정)
         try:
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """당신은 인스타그램 광고 전문 카피라이터입니다.
-
-⚠️ CRITICAL - 인코딩 규칙:
-1. 반드시 UTF-8 인코딩으로 한글 작성
-2. 모든 텍스트는 순수 한글 문자만 사용
-3. 이스케이프 시퀀스나 특수 인코딩 사용 금지
-4. JSON 응답에서 한글이 깨지지 않도록 주의
-
-예시: "베이지의 따뜻함" (O), "string" (X)
-
-반드시 JSON 형식으로만 응답합니다."""
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500,
-                timeout=30.0,
-                response_format={"type": "json_object"}
+                **self._template_copy_request(vision_result, template_name, caption, user_request, ad_inputs)
+            )
+            return self._parse_template_copy(
+                response.choices[0].message.content, template_name, caption, ad_inputs
             )
             
-            # 응답 파싱
-            content = response.choices[0].message.content
-            
-            # UTF-8 인코딩 명시적 처리
-            if isinstance(content, bytes):
-                content = content.decode('utf-8')
-            
-            ad_copy = json.loads(content)
-            
-            # 한글 인코딩 검증
-            headline = ad_copy.get('headline', '')
-            if headline:
-                korean_chars = sum(1 for c in headline if ord(c) >= 0xAC00 and ord(c) <= 0xD7A3)
-                if korean_chars == 0:
-                    print(f"⚠️ [{template_name}] 한글 인코딩 문제 감지: {headline}")
-                    try:
-                        headline_bytes = headline.encode('latin-1')
-                        headline = headline_bytes.decode('utf-8')
-                        ad_copy['headline'] = headline
-                        print(f"✅ [{template_name}] 한글 인코딩 복구: {headline}")
-                    except:
-                        print(f"❌ [{template_name}] 한글 인코딩 복구 실패")
-                else:
-                    print(f"✅ [{template_name}] 한글 인코딩 정상: {headline}")
-            
-            # 캡션이 제공된 경우 강제로 사용
-            if caption:
-                ad_copy['caption'] = caption
-
-            if ad_inputs and ad_inputs.get('must_include'):
-                must_include = ad_inputs['must_include']
-                current_headline = ad_copy.get('headline', '')
-                
-                # headline에 필수 문구가 없으면 추가
-                if must_include not in current_headline:
-                    ad_copy['headline'] = f"{current_headline} - {must_include}"
-                    print(f"✅ 필수 문구 추가: {ad_copy['headline']}")
-            
-            if ad_inputs and ad_inputs.get('period'):
-                period = ad_inputs['period']
-                current_headline = ad_copy.get('headline', '')
-                
-                # 기간이 없으면 추가
-                if period not in current_headline:
-                    ad_copy['headline'] = f"{current_headline} ({period})"
-                    print(f"✅ 기간 추가: {ad_copy['headline']}")
-
-            # 템플릿 이름 추가
-            ad_copy['template_used'] = template_name
-            
-            return ad_copy
+        except Exception as e:
+            print(f"❌ [{template_name}] GPT API Error: {e}")
+            return self._get_fallback_copy(vision_result, template_name, caption)
+    
+    async def agenerate_ad_copy_for_template(
+        self,
+        vision_result: Dict,
+        template_name: str,
+        caption: Optional[str] = None,
+        user_request: Optional[str] = None,
+        ad_inputs: Optional[Dict] = None
+    ) -> Dict:
+        """generate_ad_copy_for_template 비동기 버전"""
+        try:
+            request = self._template_copy_request(vision_result, template_name, caption, user_request, ad_inputs)
+            response = await provider_call(
+                "openai",
+                "ad_copy",
+                lambda: self.async_client.chat.completions.create(**request),
+                request_bytes=sum(len(m["content"].encode('utf-8')) for m in request["messages"]),
+                response_bytes=lambda r: len((r.choices[0].message.content or "").encode('utf-8')),
+            )
+            return self._parse_template_copy(
+                response.choices[0].message.content, template_name, caption, ad_inputs
+            )
             
         except Exception as e:
             print(f"❌ [{template_name}] GPT API Error: {e}")
             return self._get_fallback_copy(vision_result, template_name, caption)
 
+
+# 싱글톤 인스턴스
+_ad_generator = None
+
+def get_ad_generator() -> AdGenerator:
+    """광고 생성기 싱글톤 가져오기"""
+    global _ad_generator
+    
+    if _ad_generator is None:
+        _ad_generator = AdGenerator()
+    
+    return _ad_generator
+
 # 테스트용
 if __name__ == "__main__":
     # 테스트
@@ -1,22 +1,309 @@
 """
 Background Removal Service using rembg
 Fallback implementation that doesn't require Hugging Face authentication
+
+ONNX sessions are created once per process and reused by every job
+(see RembgSessionPool). Model and thread settings come from config.py
+(REMBG_* settings).
+
+Requests from concurrent jobs are collected for a short window and run as
+one batched ONNX inference (see RembgMicroBatcher).
 """
-from typing import List
-from PIL import Image
+import time
+import queue
+import asyncio
 import logging
-from rembg import remove
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+from rembg.bg import fix_image_orientation, naive_cutout
+from rembg.sessions import sessions_class
+
+from config import settings
+from app.core.metrics import BACKGROUND_REMOVAL_DURATION, BACKGROUND_REMOVAL_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
 
+# Supported models (rembg session names)
+# - u2net: default, best quality
+# - u2netp: small/fast variant
+# - isnet-general-use: sharper edges, slower
+# - u2net_custom: custom ONNX file at REMBG_MODEL_PATH (e.g. int8-quantized u2net)
+SUPPORTED_MODELS = ("u2net", "u2netp", "isnet-general-use", "u2net_custom")
+
+# Model input normalization (mean, std, input size) - same values as each rembg session's predict()
+_U2NET_INPUT = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320))
+MODEL_INPUTS = {
+    "u2net": _U2NET_INPUT,
+    "u2netp": _U2NET_INPUT,
+    "u2net_custom": _U2NET_INPUT,
+    "isnet-general-use": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+
+def _create_session(model: str, model_path: Optional[str], intra_op_threads: int):
+    """Create a rembg session with explicit onnxruntime thread settings"""
+    import onnxruntime as ort
+
+    if model not in SUPPORTED_MODELS:
+        raise ValueError(f"Unsupported rembg model: {model} (choose from {SUPPORTED_MODELS})")
+
+    session_class = next(sc for sc in sessions_class if sc.name() == model)
+
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads > 0:
+        sess_opts.intra_op_num_threads = intra_op_threads
+        sess_opts.inter_op_num_threads = 1
+
+    kwargs = {}
+    if model == "u2net_custom":
+        if not model_path:
+            raise ValueError("REMBG_MODEL_PATH is required for the u2net_custom model")
+        kwargs["model_path"] = model_path
+
+    return session_class(model, sess_opts, None, **kwargs)
+
+
+class RembgSessionPool:
+    """
+    Process-wide pool of warm rembg sessions
+
+    Each session holds a loaded ONNX model. Callers borrow a session for one
+    inference, so at most `size` inferences run at once, each using
+    `intra_op_threads` CPU threads.
+    """
+
+    def __init__(self, model: str, model_path: Optional[str], size: int, intra_op_threads: int):
+        self.model = model
+        self.model_path = model_path
+        self.size = max(size, 1)
+        self.intra_op_threads = intra_op_threads
+        self._sessions: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # Decided once from the model's input shape (see _supports_batching)
+        self._batching_supported: Optional[bool] = None
+
+    @property
+    def model_name(self) -> str:
+        """Model identifier (also used in result cache keys)"""
+        if self.model == "u2net_custom":
+            return f"rembg (u2net_custom:{Path(self.model_path or '').name})"
+        return f"rembg ({self.model})"
+
+    def _acquire(self):
+        # Create sessions lazily up to `size`, then wait for a free one
+        with self._lock:
+            if self._sessions.empty() and self._created < self.size:
+                self._created += 1
+                try:
+                    started = time.perf_counter()
+                    session = _create_session(self.model, self.model_path, self.intra_op_threads)
+                except Exception:
+                    self._created -= 1
+                    raise
+                logger.info(
+                    f"rembg session created: {self.model_name} "
+                    f"({self._created}/{self.size}, {time.perf_counter() - started:.1f}s)"
+                )
+                return session
+        return self._sessions.get()
+
+    def _release(self, session):
+        self._sessions.put(session)
+
+    def _supports_batching(self, session) -> bool:
+        """
+        Whether the model takes a dynamic batch dimension
+
+        Models exported with a fixed batch size (an int first dimension) run
+        one image per ONNX call. Inference errors never change this decision.
+        """
+        if self._batching_supported is None:
+            batch_dim = session.inner_session.get_inputs()[0].shape[0]
+            self._batching_supported = not isinstance(batch_dim, int)
+            if not self._batching_supported:
+                logger.info(f"rembg model {self.model_name} has a fixed batch size ({batch_dim}), running per image")
+        return self._batching_supported
+
+    def _predict_masks(self, session, images: List[Image.Image]) -> List[Image.Image]:
+        """
+        One ONNX run for the whole batch
+
+        Every image is resized to the model's fixed input size, so the inputs
+        stack without spatial padding. Output post-processing matches rembg's
+        predict() (per-image min-max scaling, mask resized back to the image).
+        """
+        mean, std, size = MODEL_INPUTS[self.model]
+        input_name = session.inner_session.get_inputs()[0].name
+        inputs = [session.normalize(image, mean, std, size)[input_name] for image in images]
+
+        if len(inputs) > 1 and self._supports_batching(session):
+            preds = session.inner_session.run(None, {input_name: np.concatenate(inputs)})[0][:, 0]
+        else:
+            preds = [session.inner_session.run(None, {input_name: x})[0][0, 0] for x in inputs]
+
+        masks = []
+        for image, pred in zip(images, preds):
+            ma, mi = np.max(pred), np.min(pred)
+            pred = (pred - mi) / (ma - mi)
+            mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+            masks.append(mask.resize(image.size, Image.Resampling.LANCZOS))
+        return masks
+
+    def remove_batch(self, images: List[Image.Image]) -> List[Image.Image]:
+        """Run background removal for several images with one pooled session (blocking)"""
+        images = [fix_image_orientation(image) for image in images]
+        session = self._acquire()
+        started = time.perf_counter()
+        try:
+            masks = self._predict_masks(session, images)
+        finally:
+            BACKGROUND_REMOVAL_DURATION.labels(model=self.model).observe(time.perf_counter() - started)
+            BACKGROUND_REMOVAL_BATCH_SIZE.labels(model=self.model).observe(len(images))
+            self._release(session)
+        return [naive_cutout(image, mask) for image, mask in zip(images, masks)]
+
+    def remove(self, image: Image.Image) -> Image.Image:
+        """Run background removal with a pooled session (blocking)"""
+        return self.remove_batch([image])[0]
+
+    def warmup(self):
+        """Load every session and run one inference so the first job doesn't pay for it"""
+        sessions = [self._acquire() for _ in range(self.size)]
+        try:
+            dummy = Image.new("RGB", (64, 64), (255, 255, 255))
+            for session in sessions:
+                self._predict_masks(session, [dummy])
+        finally:
+            for session in sessions:
+                self._release(session)
+        logger.info(f"rembg warmup complete: {self.model_name} x{self.size}")
+
+
+class RembgMicroBatcher:
+    """
+    Dynamic micro-batching for concurrent background removal requests
+
+    Requests arriving within `window` seconds (or until `max_batch` requests are
+    queued) are run as one batched inference in a worker thread. Each caller
+    gets its own result through a future. Batches run concurrently up to the
+    session pool size.
+    """
+
+    def __init__(self, pool: RembgSessionPool, max_batch: int, window: float):
+        self.pool = pool
+        self.max_batch = max(max_batch, 1)
+        self.window = window
+        self._pending: list[tuple[Image.Image, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def remove(self, image: Image.Image) -> Image.Image:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Drop requests whose callers have gone away
+        pending = [(image, future) for image, future in self._pending if not future.done()]
+        batch, self._pending = pending[:self.max_batch], pending[self.max_batch:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[Image.Image, asyncio.Future]]):
+        try:
+            results = await asyncio.to_thread(self.pool.remove_batch, [image for image, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+                return
+            # One bad image shouldn't fail its batch-mates: retry each image on its own
+            logger.warning(f"rembg batch of {len(batch)} failed, retrying per image: {e}")
+            await asyncio.gather(*(self._run_single(image, future) for image, future in batch))
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+
+    async def _run_single(self, image: Image.Image, future: asyncio.Future):
+        if future.done():
+            return
+        try:
+            result = await asyncio.to_thread(self.pool.remove, image)
+        except Exception as e:
+            self._resolve(future, error=e)
+        else:
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Optional[Image.Image] = None,
+                 error: Optional[Exception] = None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+# 싱글톤
+_session_pool: Optional[RembgSessionPool] = None
+_session_pool_lock = threading.Lock()
+
+def get_session_pool() -> RembgSessionPool:
+    global _session_pool
+    if _session_pool is None:
+        with _session_pool_lock:
+            if _session_pool is None:
+                _session_pool = RembgSessionPool(
+                    model=settings.REMBG_MODEL,
+                    model_path=settings.REMBG_MODEL_PATH,
+                    size=settings.REMBG_SESSION_POOL_SIZE,
+                    intra_op_threads=settings.REMBG_INTRA_OP_THREADS,
+                )
+    return _session_pool
+
+
+def warmup_background_removal():
+    """Called at app startup (blocking, run in a thread)"""
+    get_session_pool().warmup()
+
+
 class BackgroundRemovalService:
     """Service for AI-powered background removal using rembg"""
     
     def __init__(self):
         """Initialize the background removal service"""
-        logger.info("Initializing rembg background removal service")
-        self.model_name = "rembg (u2net)"
+        self.pool = get_session_pool()
+        self.batcher = RembgMicroBatcher(
+            self.pool,
+            max_batch=settings.REMBG_MAX_BATCH_SIZE,
+            window=settings.REMBG_BATCH_WINDOW,
+        )
+        self.model_name = self.pool.model_name
+        logger.info(f"Initializing rembg background removal service: {self.model_name}")
     
     async def remove_background(self, image: Image.Image) -> Image.Image:
         """
@@ -35,8 +322,8 @@ class BackgroundRemovalService:
             
             original_size = image.size
             
-            # Run rembg
-            result = remove(image)
+            # Run rembg with a warm pooled session (batched with concurrent requests, off the event loop)
+            result = await self.batcher.remove(image)
             
             logger.info(f"Background removed successfully for image size: {original_size}")
             return result
@@ -55,15 +342,30 @@ class BackgroundRemovalService:
         Returns:
             List of images with backgrounds removed
         """
+        # Submitted together → collected into the same micro-batch(es)
+        outputs = await asyncio.gather(
+            *(self.remove_background(image) for image in images),
+            return_exceptions=True,
+        )
+
         results = []
-        for idx, image in enumerate(images):
-            try:
-                result = await self.remove_background(image)
-                results.append(result)
-                logger.info(f"Processed image {idx + 1}/{len(images)}")
-            except Exception as e:
-                logger.error(f"Error processing image {idx + 1}: {e}")
+        for idx, (image, result) in enumerate(zip(images, outputs)):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing image {idx + 1}: {result}")
                 # Return original image on error
                 results.append(image)
+            else:
+                results.append(result)
+                logger.info(f"Processed image {idx + 1}/{len(images)}")
         
-        return results
\ No newline at end of file
+        return results
+
+
+# 싱글톤
+_service: Optional[BackgroundRemovalService] = None
+
+def get_background_removal_service() -> BackgroundRemovalService:
+    global _service
+    if _service is None:
+        _service = BackgroundRemovalService()
+    return _service
@@ -7,8 +7,19 @@ import numpy as np
 from PIL import Image
 import logging
 
+from . import content_crop
+from .color_lut import apply_grade, apply_temperature
+from .tiling import tile_map, gaussian_halo
+
 logger = logging.getLogger(__name__)
 
+# Pure color part of each auto_enhance style, compiled into a 3D LUT (see color_lut.py)
+ENHANCE_GRADES = {
+    "balanced": (("saturation", (1.1,)),),
+    "vivid": (("saturation", (1.3,)), ("brightness_contrast", (5, 10))),
+    "soft": (("saturation", (1.05,)), ("brightness_contrast", (10, 5))),
+}
+
 
 class ColorCorrection:
     """Color correction and enhancement for images"""
@@ -28,15 +39,17 @@ class ColorCorrection:
         Returns:
             White balanced image
         """
-        result = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        avg_a = np.average(result[:, :, 1])
-        avg_b = np.average(result[:, :, 2])
+        lab = tile_map(lambda tile: cv2.cvtColor(tile, cv2.COLOR_BGR2LAB), image)
+        avg_a = np.average(lab[:, :, 1])
+        avg_b = np.average(lab[:, :, 2])
         
-        result[:, :, 1] = result[:, :, 1] - ((avg_a - 128) * (result[:, :, 0] / 255.0) * 1.1)
-        result[:, :, 2] = result[:, :, 2] - ((avg_b - 128) * (result[:, :, 0] / 255.0) * 1.1)
+        def balance(result):
+            result[:, :, 1] = result[:, :, 1] - ((avg_a - 128) * (result[:, :, 0] / 255.0) * 1.1)
+            result[:, :, 2] = result[:, :, 2] - ((avg_b - 128) * (result[:, :, 0] / 255.0) * 1.1)
+            return cv2.cvtColor(result, cv2.COLOR_LAB2BGR)
         
-        result = cv2.cvtColor(result, cv2.COLOR_LAB2BGR)
-        return result
+        # Averages come from the whole image, the correction itself is per pixel
+        return tile_map(balance, lab)
     
     def adjust_brightness_contrast(self, image: np.ndarray, brightness: int = 0, 
                                    contrast: int = 0) -> np.ndarray:
@@ -83,22 +96,15 @@ class ColorCorrection:
             Enhanced image
         """
         # Convert to LAB color space
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        lab = tile_map(lambda tile: cv2.cvtColor(tile, cv2.COLOR_BGR2LAB), image)
         
-        # Split channels
-        l, a, b = cv2.split(lab)
-        
-        # Apply CLAHE to L channel
+        # Apply CLAHE to L channel (whole image: its tile histograms span the full frame)
         clahe = cv2.createCLAHE(clipLimit=self.clip_limit, 
                                 tileGridSize=self.tile_grid_size)
-        l = clahe.apply(l)
-        
-        # Merge channels
-        lab = cv2.merge([l, a, b])
+        lab[:, :, 0] = clahe.apply(np.ascontiguousarray(lab[:, :, 0]))
         
         # Convert back to BGR
-        result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-        return result
+        return tile_map(lambda tile: cv2.cvtColor(tile, cv2.COLOR_LAB2BGR), lab)
     
     def enhance_saturation(self, image: np.ndarray, saturation_scale: float = 1.2) -> np.ndarray:
         """
@@ -111,17 +117,19 @@ class ColorCorrection:
         Returns:
             Enhanced image
         """
-        # Convert to HSV
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV).astype(np.float32)
-        
-        # Scale saturation
-        hsv[:, :, 1] = hsv[:, :, 1] * saturation_scale
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
+        def saturate(tile):
+            # Convert to HSV
+            hsv = cv2.cvtColor(tile, cv2.COLOR_BGR2HSV).astype(np.float32)
+            
+            # Scale saturation
+            hsv[:, :, 1] = hsv[:, :, 1] * saturation_scale
+            hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
+            
+            # Convert back to BGR
+            hsv = hsv.astype(np.uint8)
+            return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
         
-        # Convert back to BGR
-        hsv = hsv.astype(np.uint8)
-        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        return result
+        return tile_map(saturate, image)
     
     def adjust_color_temperature(self, image: np.ndarray, temperature: int = 0) -> np.ndarray:
         """
@@ -138,21 +146,25 @@ class ColorCorrection:
         if temperature == 0:
             return image
         
-        result = image.copy().astype(np.float32)
-        
-        if temperature > 0:
-            # Warm (increase red/yellow, decrease blue)
-            result[:, :, 2] = np.clip(result[:, :, 2] * (1 + temperature / 200), 0, 255)  # Red
-            result[:, :, 1] = np.clip(result[:, :, 1] * (1 + temperature / 400), 0, 255)  # Green
-            result[:, :, 0] = np.clip(result[:, :, 0] * (1 - temperature / 200), 0, 255)  # Blue
-        else:
-            # Cool (increase blue, decrease red/yellow)
-            temperature = abs(temperature)
-            result[:, :, 0] = np.clip(result[:, :, 0] * (1 + temperature / 200), 0, 255)  # Blue
-            result[:, :, 2] = np.clip(result[:, :, 2] * (1 - temperature / 200), 0, 255)  # Red
+        result = image.astype(np.float32)
+        self.apply_color_temperature(result, temperature)
         
         return result.astype(np.uint8)
     
+    def apply_color_temperature(self, buffer: np.ndarray, temperature: int) -> np.ndarray:
+        """
+        In-place color temperature adjustment on a float32 BGR buffer
+        
+        Args:
+            buffer: float32 BGR image (0-255), modified in place
+            temperature: Temperature adjustment (-100 to 100)
+            
+        Returns:
+            The same buffer
+        """
+        apply_temperature(buffer, temperature)
+        return buffer
+    
     def sharpen(self, image: np.ndarray, strength: float = 1.0) -> np.ndarray:
         """
         Apply unsharp masking for sharpening
@@ -164,25 +176,74 @@ class ColorCorrection:
         Returns:
             Sharpened image
         """
-        # Create Gaussian blur
-        blurred = cv2.GaussianBlur(image, (0, 0), 3)
+        def unsharp(tile):
+            # Create Gaussian blur
+            blurred = cv2.GaussianBlur(tile, (0, 0), 3)
+            
+            # Unsharp mask
+            return cv2.addWeighted(tile, 1.0 + strength, blurred, -strength, 0)
         
-        # Unsharp mask
-        sharpened = cv2.addWeighted(image, 1.0 + strength, blurred, -strength, 0)
+        return tile_map(unsharp, image, halo=gaussian_halo(3))
+    
+    def enhance_array(self, image: np.ndarray, style: str = "balanced") -> np.ndarray:
+        """
+        Automatic color enhancement on a BGR array (no PIL conversion)
         
-        return sharpened
+        Saturation and brightness/contrast run as one LUT pass (ENHANCE_GRADES);
+        white balance, CLAHE and sharpening stay separate stages.
+        
+        Args:
+            image: BGR image (uint8)
+            style: Enhancement style ("balanced", "vivid", "soft")
+            
+        Returns:
+            Enhanced BGR image
+        """
+        if style == "balanced":
+            # Balanced: subtle enhancements
+            image = self.auto_white_balance(image)
+            image = self.clahe_enhancement(image)
+            image = apply_grade(image, ENHANCE_GRADES["balanced"])
+            image = self.sharpen(image, 0.5)
+            
+        elif style == "vivid":
+            # Vivid: strong colors and contrast
+            image = self.auto_white_balance(image)
+            image = self.clahe_enhancement(image)
+            image = apply_grade(image, ENHANCE_GRADES["vivid"])
+            image = self.sharpen(image, 1.0)
+            
+        elif style == "soft":
+            # Soft: gentle enhancements
+            image = self.auto_white_balance(image)
+            image = apply_grade(image, ENHANCE_GRADES["soft"])
+            
+        else:
+            logger.warning(f"Unknown style '{style}', using balanced")
+            image = self.auto_white_balance(image)
+            image = self.clahe_enhancement(image)
+        
+        return image
     
-    def auto_enhance(self, image: Image.Image, style: str = "balanced") -> Image.Image:
+    def auto_enhance(self, image: Image.Image, style: str = "balanced",
+                     crop_to_content: bool = False) -> Image.Image:
         """
         Automatic color enhancement pipeline
         
         Args:
             image: PIL Image (RGB or RGBA)
             style: Enhancement style ("balanced", "vivid", "soft")
+            crop_to_content: Enhance only the alpha bounding box (plus a margin);
+                             white balance and CLAHE statistics then ignore the
+                             transparent border
             
         Returns:
             Enhanced PIL Image
         """
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(image)
+        
         # Convert PIL to OpenCV format
         has_alpha = image.mode == 'RGBA'
         if has_alpha:
@@ -193,32 +254,7 @@ class ColorCorrection:
         
         cv_image = cv2.cvtColor(np.array(rgb_image), cv2.COLOR_RGB2BGR)
         
-        # Apply enhancements based on style
-        if style == "balanced":
-            # Balanced: subtle enhancements
-            cv_image = self.auto_white_balance(cv_image)
-            cv_image = self.clahe_enhancement(cv_image)
-            cv_image = self.enhance_saturation(cv_image, 1.1)
-            cv_image = self.sharpen(cv_image, 0.5)
-            
-        elif style == "vivid":
-            # Vivid: strong colors and contrast
-            cv_image = self.auto_white_balance(cv_image)
-            cv_image = self.clahe_enhancement(cv_image)
-            cv_image = self.enhance_saturation(cv_image, 1.3)
-            cv_image = self.adjust_brightness_contrast(cv_image, brightness=5, contrast=10)
-            cv_image = self.sharpen(cv_image, 1.0)
-            
-        elif style == "soft":
-            # Soft: gentle enhancements
-            cv_image = self.auto_white_balance(cv_image)
-            cv_image = self.enhance_saturation(cv_image, 1.05)
-            cv_image = self.adjust_brightness_contrast(cv_image, brightness=10, contrast=5)
-            
-        else:
-            logger.warning(f"Unknown style '{style}', using balanced")
-            cv_image = self.auto_white_balance(cv_image)
-            cv_image = self.clahe_enhancement(cv_image)
+        cv_image = self.enhance_array(cv_image, style)
         
         # Convert back to PIL
         rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
@@ -229,4 +265,10 @@ class ColorCorrection:
             result.putalpha(Image.fromarray(alpha_channel))
         
         logger.info(f"Applied color correction with style: {style}")
-        return result
\ No newline at end of file
+        return crop.embed(result) if crop else result
+    
+    async def aauto_enhance(self, image: Image.Image, style: str = "balanced",
+                            crop_to_content: bool = False) -> Image.Image:
+        """Async version of auto_enhance (runs in the image process pool)"""
+        from .process_pool import run_image_operation
+        return await run_image_operation("auto_enhance", image, style=style, crop_to_content=crop_to_content)
\ No newline at end of file
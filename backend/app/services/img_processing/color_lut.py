@@ -0,0 +1,270 @@
+"""
+Color LUT Module
+Compiles chains of pure per-pixel color operations into cached 3D LUTs
+
+A chain is a tuple of (operation, args) steps, e.g.
+(("saturation", (1.3,)), ("brightness_contrast", (5, 10))). The chain is
+evaluated once on a lattice of BGR colors and the resulting table is
+applied to whole images with trilinear interpolation, in a single pass.
+
+Only operations whose output depends on the pixel's own color can be part
+of a chain. Image-dependent stages (white balance statistics, CLAHE, mean
+contrast) and spatial filters stay separate.
+
+Export the preset LUTs as .cube files:
+    python -m app.services.img_processing.color_lut <output_dir>
+"""
+import io
+import sys
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import cv2
+import numpy as np
+
+from .tiling import tile_map
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LUT_SIZE = 33
+
+# Pixels interpolated per chunk (bounds the temporary arrays)
+_CHUNK_PIXELS = 1 << 20
+
+# Sepia matrix applied to BGR buffers
+SEPIA_KERNEL = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]], dtype=np.float32)
+
+_LUMA_WEIGHTS = np.array([[0.114, 0.587, 0.299]], dtype=np.float32)
+
+
+# ===== Pure color operations (float32 BGR buffers, 0-255, in place) =====
+
+def luma(buffer: np.ndarray) -> np.ndarray:
+    """ITU-R 601 luma (h, w, 1) of a BGR buffer (same weights as PIL's convert('L'))"""
+    return cv2.transform(buffer, _LUMA_WEIGHTS)[:, :, None]
+
+
+def blend(buffer: np.ndarray, degenerate, factor: float):
+    """buffer = degenerate + factor * (buffer - degenerate), clipped (PIL ImageEnhance blend)"""
+    buffer -= degenerate
+    buffer *= factor
+    buffer += degenerate
+    np.clip(buffer, 0, 255, out=buffer)
+
+
+def _scale_channel(buffer: np.ndarray, channel: int, scale: float):
+    view = buffer[:, :, channel]
+    np.multiply(view, scale, out=view)
+    np.clip(view, 0, 255, out=view)
+
+
+def apply_temperature(buffer: np.ndarray, temperature: int):
+    """Color temperature: positive = warmer (red/yellow), negative = cooler (blue)"""
+    if temperature > 0:
+        _scale_channel(buffer, 2, 1 + temperature / 200)  # Red
+        _scale_channel(buffer, 1, 1 + temperature / 400)  # Green
+        _scale_channel(buffer, 0, 1 - temperature / 200)  # Blue
+    elif temperature < 0:
+        temperature = abs(temperature)
+        _scale_channel(buffer, 0, 1 + temperature / 200)  # Blue
+        _scale_channel(buffer, 2, 1 - temperature / 200)  # Red
+
+
+def apply_brightness_contrast(buffer: np.ndarray, brightness: int = 0, contrast: int = 0):
+    """Same curves as ColorCorrection.adjust_brightness_contrast"""
+    if brightness != 0:
+        if brightness > 0:
+            shadow, highlight = brightness, 255
+        else:
+            shadow, highlight = 0, 255 + brightness
+        buffer *= (highlight - shadow) / 255
+        buffer += shadow
+        np.clip(buffer, 0, 255, out=buffer)
+
+    if contrast != 0:
+        f = 131 * (contrast + 127) / (127 * (131 - contrast))
+        buffer *= f
+        buffer += 127 * (1 - f)
+        np.clip(buffer, 0, 255, out=buffer)
+
+
+def apply_saturation(buffer: np.ndarray, scale: float):
+    """HSV saturation scaling (same as ColorCorrection.enhance_saturation, without uint8 rounding)"""
+    hsv = cv2.cvtColor(buffer / 255, cv2.COLOR_BGR2HSV)
+    s = hsv[:, :, 1]
+    np.multiply(s, scale, out=s)
+    np.clip(s, 0, 1, out=s)
+    buffer[...] = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR) * 255
+
+
+def apply_sepia(buffer: np.ndarray, amount: float):
+    """Blend the sepia-toned image into the buffer"""
+    sepia = cv2.transform(buffer, SEPIA_KERNEL)
+    cv2.addWeighted(buffer, 1 - amount, sepia, amount, 0, dst=buffer)
+    np.clip(buffer, 0, 255, out=buffer)
+
+
+def apply_color(buffer: np.ndarray, factor: float):
+    """ImageEnhance.Color: blend with the grayscale image"""
+    blend(buffer, luma(buffer), factor)
+
+
+LUT_OPERATIONS: Dict[str, Callable] = {
+    "temperature": apply_temperature,
+    "brightness_contrast": apply_brightness_contrast,
+    "saturation": apply_saturation,
+    "sepia": apply_sepia,
+    "color": apply_color,
+}
+
+
+# ===== LUT =====
+
+class ColorLUT:
+    """3D color lookup table indexed [b, g, r] → BGR (0-255)"""
+
+    def __init__(self, table: np.ndarray, title: str = "AdGen LUT"):
+        self.table = table
+        self.size = table.shape[0]
+        self.title = title
+        # Blue slices side by side: _slices[g, b * size + r] = table[b, g, r]
+        self._slices = np.ascontiguousarray(
+            table.transpose(1, 0, 2, 3).reshape(self.size, self.size * self.size, 3)
+        )
+
+    @classmethod
+    def from_chain(cls, chain: Tuple[Tuple[str, tuple], ...], size: int = DEFAULT_LUT_SIZE) -> "ColorLUT":
+        """Evaluate a chain of LUT_OPERATIONS on a size³ lattice of BGR colors"""
+        for name, _ in chain:
+            if name not in LUT_OPERATIONS:
+                raise ValueError(f"Unknown LUT operation: {name} (choose from {list(LUT_OPERATIONS)})")
+
+        levels = np.linspace(0, 255, size, dtype=np.float32)
+        lattice = np.empty((size, size, size, 3), dtype=np.float32)
+        lattice[..., 0] = levels[:, None, None]
+        lattice[..., 1] = levels[None, :, None]
+        lattice[..., 2] = levels[None, None, :]
+
+        # Lattice as a (size², size) BGR image so the operations see a regular buffer
+        buffer = lattice.reshape(size * size, size, 3)
+        for name, args in chain:
+            LUT_OPERATIONS[name](buffer, *args)
+
+        table = buffer.reshape(size, size, size, 3)
+        table.flags.writeable = False
+        title = " + ".join(f"{name}{args}" for name, args in chain) or "identity"
+        return cls(table, title=title)
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        """
+        Apply the LUT with trilinear interpolation
+
+        Args:
+            image: BGR image, uint8 (returns a new uint8 array) or
+                   float32 0-255 (modified in place and returned)
+
+        Returns:
+            Graded BGR image
+        """
+        if image.dtype == np.uint8:
+            buffer = image.astype(np.float32)
+            self.apply(buffer)
+            buffer += 0.5
+            return buffer.astype(np.uint8)
+
+        return tile_map(self._apply_rows, image, out=image)
+
+    def _apply_rows(self, band: np.ndarray) -> np.ndarray:
+        height, width = band.shape[:2]
+        rows = max(1, _CHUNK_PIXELS // max(width, 1))
+        for start in range(0, height, rows):
+            chunk = band[start:start + rows]
+            chunk[...] = self._interpolate(chunk)
+        return band
+
+    def _interpolate(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        Trilinear lookup as two bilinear cv2.remap lookups (g, r) in the
+        neighbouring blue slices, blended linearly along blue
+        """
+        n = self.size
+        pos = chunk * ((n - 1) / 255)
+        np.clip(pos, 0, n - 1, out=pos)
+        b, r = pos[:, :, 0], pos[:, :, 2]
+        g = np.ascontiguousarray(pos[:, :, 1])
+
+        b0 = np.minimum(np.floor(b), n - 2)
+        weight = (b - b0)[:, :, None]
+        map_x = b0 * n + r
+
+        low = cv2.remap(self._slices, map_x, g, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        map_x += n
+        high = cv2.remap(self._slices, map_x, g, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+        high -= low
+        high *= weight
+        low += high
+        return low
+
+    def to_cube(self) -> str:
+        """Serialize as an Adobe/Resolve .cube file (RGB, 0-1, red fastest)"""
+        out = io.StringIO()
+        out.write(f'TITLE "{self.title}"\n')
+        out.write(f"LUT_3D_SIZE {self.size}\n")
+        out.write("DOMAIN_MIN 0.0 0.0 0.0\n")
+        out.write("DOMAIN_MAX 1.0 1.0 1.0\n")
+        # table[b, g, r] in C order already iterates red fastest, then green, then blue
+        rgb = self.table[..., ::-1].reshape(-1, 3) / 255
+        np.savetxt(out, np.clip(rgb, 0, 1), fmt="%.6f")
+        return out.getvalue()
+
+    def write_cube(self, path) -> Path:
+        path = Path(path)
+        path.write_text(self.to_cube())
+        return path
+
+
+@lru_cache(maxsize=32)
+def compile_lut(chain: Tuple[Tuple[str, tuple], ...], size: int = DEFAULT_LUT_SIZE) -> ColorLUT:
+    """Cached ColorLUT per (chain, size) - chains must be hashable tuples"""
+    lut = ColorLUT.from_chain(chain, size)
+    logger.debug(f"Compiled color LUT ({size}³): {lut.title}")
+    return lut
+
+
+def apply_grade(image: np.ndarray, chain: Tuple[Tuple[str, tuple], ...]) -> np.ndarray:
+    """
+    Apply a chain to a BGR image (same dtype contract as ColorLUT.apply)
+
+    Chains of several operations run as one cached LUT pass; a single
+    operation is cheaper to run directly than to look up.
+    """
+    if len(chain) != 1:
+        return compile_lut(chain).apply(image)
+
+    if image.dtype == np.uint8:
+        buffer = image.astype(np.float32)
+        apply_grade(buffer, chain)
+        buffer += 0.5
+        return buffer.astype(np.uint8)
+
+    name, args = chain[0]
+
+    def run(band):
+        LUT_OPERATIONS[name](band, *args)
+        return band
+
+    return tile_map(run, image, out=image)
+
+
+if __name__ == "__main__":
+    from .style_processor import StyleProcessor
+
+    output_dir = Path(sys.argv[1] if len(sys.argv) > 1 else ".")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for path in StyleProcessor().export_luts(output_dir):
+        print(path)
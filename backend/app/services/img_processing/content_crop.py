@@ -0,0 +1,108 @@
+"""
+Content Crop Module
+Crop RGBA cutouts to their visible content before processing
+
+After background removal the product often covers a small part of the
+canvas. Cropping to the alpha bounding box (plus a margin) lets filters,
+PNG encoding and uploads skip the transparent border. The crop box is kept
+as a ContentCrop so results can be re-embedded into the original canvas, or
+the offsets passed along as metadata.
+"""
+from typing import Optional, Tuple
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Default margin around the content (pixels)
+CROP_MARGIN = 32
+
+# Skip cropping when it would remove less than this fraction of the canvas
+MIN_CROP_SAVING = 0.1
+
+
+class ContentCrop:
+    """Crop box of a cutout inside its original canvas"""
+
+    def __init__(self, box: Tuple[int, int, int, int], canvas_size: Tuple[int, int]):
+        self.box = box                  # (left, top, right, bottom) in canvas pixels
+        self.canvas_size = canvas_size  # (width, height)
+
+    @property
+    def offset(self) -> Tuple[int, int]:
+        return self.box[0], self.box[1]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.box[2] - self.box[0], self.box[3] - self.box[1]
+
+    def embed(self, image: Image.Image, background=(0, 0, 0, 0)) -> Image.Image:
+        """
+        Place a processed crop back into a canvas of the original size
+
+        Args:
+            image: Processed crop (same size as the crop box)
+            background: Fill color outside the crop
+
+        Returns:
+            Image with the original canvas size
+        """
+        canvas = Image.new(image.mode, self.canvas_size, background)
+        canvas.paste(image, self.offset)
+        return canvas
+
+    def to_metadata(self) -> dict:
+        return {"box": list(self.box), "canvas_size": list(self.canvas_size)}
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> "ContentCrop":
+        return cls(tuple(metadata["box"]), tuple(metadata["canvas_size"]))
+
+
+def content_box(image: Image.Image, margin: int = CROP_MARGIN) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Alpha bounding box expanded by a margin and clamped to the canvas
+
+    Returns:
+        (left, top, right, bottom), or None without an alpha channel or visible pixels
+    """
+    if image.mode != 'RGBA':
+        return None
+
+    bbox = image.getchannel('A').getbbox()
+    if bbox is None:
+        return None
+
+    width, height = image.size
+    left, top, right, bottom = bbox
+    return (
+        max(left - margin, 0),
+        max(top - margin, 0),
+        min(right + margin, width),
+        min(bottom + margin, height),
+    )
+
+
+def crop_to_content(image: Image.Image, margin: int = CROP_MARGIN) -> Tuple[Image.Image, Optional[ContentCrop]]:
+    """
+    Crop an RGBA cutout to its content
+
+    Args:
+        image: RGBA image (background already removed)
+        margin: Pixels kept around the alpha bounding box
+
+    Returns:
+        (cropped image, ContentCrop), or (image, None) when cropping would not help
+    """
+    box = content_box(image, margin)
+    if box is None:
+        return image, None
+
+    width, height = image.size
+    crop_area = (box[2] - box[0]) * (box[3] - box[1])
+    if crop_area > (1 - MIN_CROP_SAVING) * width * height:
+        return image, None
+
+    logger.debug(f"Cropped to content: {image.size} → {box}")
+    return image.crop(box), ContentCrop(box, image.size)
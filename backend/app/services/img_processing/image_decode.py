@@ -0,0 +1,140 @@
+"""
+Image Decode Module
+Reduced-resolution decoding for thumbnails, previews and analysis inputs
+
+Most consumers of an uploaded photo only need a small version of it. JPEG
+can be decoded directly at 1/2, 1/4 or 1/8 scale (DCT scaling via
+Image.draft), and other formats are shrunk with Image.reduce before the
+final resampling, so a 4000px photo never has to be decoded at full size
+to produce a 300px thumbnail.
+
+ImageSource wraps the encoded bytes: the header is parsed once, reduced
+views are decoded on demand, and a full decode (when a caller really needs
+it) is kept and reused instead of decoding the bytes again.
+"""
+import io
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (300, 300)
+
+# Decode at (at least) this multiple of the target size before the final
+# resampling, so DCT scaling / reduce() never costs visible quality
+REDUCING_GAP = 2.0
+
+# Formats sent to vision models as-is when they are already small enough
+VISION_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def fit_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size with the same aspect ratio that fits in max_size (never upscales)"""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def make_thumbnail(image: Image.Image, max_size: Tuple[int, int] = THUMBNAIL_SIZE,
+                   reducing_gap: float = REDUCING_GAP) -> Image.Image:
+    """
+    Downscaled copy of an already decoded image
+
+    Unlike image.copy() + thumbnail(), the full resolution pixels are not copied first.
+    """
+    size = fit_size(image.size, max_size)
+    if size == image.size:
+        return image.copy()
+    return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=reducing_gap)
+
+
+class ImageSource:
+    """Encoded image bytes with lazily decoded full / reduced views"""
+
+    def __init__(self, data: bytes):
+        """
+        Args:
+            data: Encoded image (any format Pillow can open)
+
+        Raises:
+            PIL.UnidentifiedImageError: If the bytes are not an image
+        """
+        self.data = data
+        header = Image.open(io.BytesIO(data))  # Parses the header only, no pixel decode
+        self.format = header.format
+        self.mode = header.mode
+        self.size = header.size
+        self.has_alpha = header.mode in ("RGBA", "LA", "PA") or "transparency" in header.info
+        self._full: Optional[Image.Image] = None
+
+    def full(self) -> Image.Image:
+        """Full resolution image (decoded once, then reused)"""
+        if self._full is None:
+            image = Image.open(io.BytesIO(self.data))
+            image.load()
+            self._full = image
+        return self._full
+
+    def reduced(self, max_size: Tuple[int, int], reducing_gap: float = REDUCING_GAP) -> Image.Image:
+        """
+        Decode an image that fits in max_size
+
+        Args:
+            max_size: (width, height) bound, aspect ratio is preserved
+            reducing_gap: Minimum decode size as a multiple of the target size
+                          (lower = faster, 1.0 is enough for analysis inputs)
+
+        Returns:
+            Decoded image no larger than max_size
+        """
+        size = fit_size(self.size, max_size)
+        if self._full is None and size != self.size:
+            # JPEG: pick the smallest DCT scale that still covers reducing_gap x the target
+            image = Image.open(io.BytesIO(self.data))
+            image.draft(None, (int(size[0] * reducing_gap), int(size[1] * reducing_gap)))
+            if image.size != self.size:
+                logger.debug(f"Reduced decode: {self.size} → {image.size} → {size}")
+                return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=reducing_gap)
+
+        # No DCT scaling (other formats): decode once, then integer reduce() + resampling
+        return make_thumbnail(self.full(), size, reducing_gap)
+
+    def encode_reduced(self, max_size: Tuple[int, int], format: Optional[str] = None,
+                       reducing_gap: float = REDUCING_GAP, **save_options) -> bytes:
+        """
+        Decode at reduced size and re-encode
+
+        Args:
+            max_size: (width, height) bound
+            format: Output format (defaults to the source format, JPEG if unknown)
+            reducing_gap: See reduced()
+            **save_options: Passed to Image.save (e.g. quality)
+
+        Returns:
+            Encoded bytes
+        """
+        image = self.reduced(max_size, reducing_gap)
+        format = format or self.format or "JPEG"
+        if format == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=format, **save_options)
+        return buffer.getvalue()
+
+    def vision_input(self, max_side: int) -> Tuple[bytes, str]:
+        """
+        Bytes for a vision model: the original when it is small enough and in a
+        common format, otherwise a reduced decode (PNG with transparency, else JPEG)
+
+        Returns:
+            (encoded bytes, MIME type)
+        """
+        if max(self.size) <= max_side and self.format in VISION_FORMATS:
+            return self.data, VISION_FORMATS[self.format]
+
+        bound = (max_side, max_side)
+        if self.has_alpha:
+            return self.encode_reduced(bound, "PNG", reducing_gap=1.0), "image/png"
+        return self.encode_reduced(bound, "JPEG", reducing_gap=1.0, quality=90), "image/jpeg"
@@ -0,0 +1,172 @@
+"""
+Image Process Pool
+Runs CPU-bound image operations (OpenCV / PIL filters) in worker processes
+so they never block the event loop.
+
+Pixel buffers are passed through shared memory instead of pickling PIL
+images: the parent copies the input pixels into a SharedMemory block, the
+worker writes its result into a new block, and the parent copies it back out
+and unlinks both blocks.
+"""
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+from app.core.metrics import IMAGE_POOL_PENDING, IMAGE_POOL_TASK_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Modes that map directly onto a uint8 ndarray
+_ARRAY_MODES = ("RGB", "RGBA", "L")
+
+
+# ===== Shared memory buffers =====
+
+def _image_to_shared(image: Image.Image) -> tuple[shared_memory.SharedMemory, tuple]:
+    """Copy image pixels into a new shared memory block → (block, descriptor)"""
+    if image.mode not in _ARRAY_MODES:
+        image = image.convert("RGBA")
+    array = np.asarray(image)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=np.uint8, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, image.mode)
+
+
+def _image_from_shared(descriptor: tuple) -> tuple[shared_memory.SharedMemory, Image.Image]:
+    """Attach to a shared memory block → (block, image copy)"""
+    name, shape, mode = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    return shm, Image.fromarray(array.copy(), mode=mode)
+
+
+# ===== Operations (run inside worker processes) =====
+
+_processors: dict = {}
+
+def _processor(name: str):
+    """Per-worker processor instances (created once per process)"""
+    if name not in _processors:
+        if name == "style":
+            from app.services.img_processing.style_processor import StyleProcessor
+            _processors[name] = StyleProcessor()
+        elif name == "color":
+            from app.services.img_processing.color_correction import ColorCorrection
+            _processors[name] = ColorCorrection()
+        elif name == "wrinkle":
+            from app.services.img_processing.wrinkle_removal import WrinkleRemoval
+            _processors[name] = WrinkleRemoval()
+    return _processors[name]
+
+
+IMAGE_OPERATIONS = {
+    "style": lambda image, **kwargs: _processor("style").process_with_style(image, **kwargs),
+    "auto_enhance": lambda image, **kwargs: _processor("color").auto_enhance(image, **kwargs),
+    "remove_wrinkles": lambda image, **kwargs: _processor("wrinkle").remove_wrinkles(image, **kwargs),
+}
+
+
+def _run_in_worker(operation: str, descriptor: tuple, kwargs: dict) -> tuple:
+    """Worker entry point: shared memory in → operation → shared memory out"""
+    shm, image = _image_from_shared(descriptor)
+    shm.close()
+
+    result = IMAGE_OPERATIONS[operation](image, **kwargs)
+
+    out, out_descriptor = _image_to_shared(result)
+    out.close()     # parent unlinks after reading
+    return out_descriptor
+
+
+def _discard_output(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        out = shared_memory.SharedMemory(name=future.result()[0])
+        out.close()
+        out.unlink()
+    except FileNotFoundError:
+        pass
+
+
+# ===== Pool =====
+
+class ImageProcessPool:
+    """Fixed-size process pool for image operations"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # forkserver: workers don't inherit the parent's threads / event loop state
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+        self._pending = 0
+        logger.info(f"✅ Image process pool started ({workers} workers)")
+
+    async def run(self, operation: str, image: Image.Image, **kwargs) -> Image.Image:
+        if operation not in IMAGE_OPERATIONS:
+            raise ValueError(f"Unknown image operation: {operation}")
+
+        shm, descriptor = _image_to_shared(image)
+        self._pending += 1
+        IMAGE_POOL_PENDING.set(self._pending)
+        started = time.perf_counter()
+        future = self._executor.submit(_run_in_worker, operation, descriptor, kwargs)
+        try:
+            out_descriptor = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The worker may still finish: release its output block when it does
+            future.add_done_callback(_discard_output)
+            raise
+        finally:
+            self._pending -= 1
+            IMAGE_POOL_PENDING.set(self._pending)
+            IMAGE_POOL_TASK_DURATION.labels(operation=operation).observe(time.perf_counter() - started)
+            shm.close()
+            shm.unlink()
+
+        out, result = _image_from_shared(out_descriptor)
+        out.close()
+        out.unlink()
+        return result
+
+    def shutdown(self):
+        """Stop accepting work, cancel queued tasks and wait for running ones"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("Image process pool stopped")
+
+
+# 싱글톤
+_image_pool: Optional[ImageProcessPool] = None
+
+def get_image_pool() -> Optional[ImageProcessPool]:
+    """None when IMAGE_PROCESS_WORKERS is 0 (operations run in a thread instead)"""
+    global _image_pool
+    if _image_pool is None and settings.IMAGE_PROCESS_WORKERS > 0:
+        _image_pool = ImageProcessPool(settings.IMAGE_PROCESS_WORKERS)
+    return _image_pool
+
+
+async def run_image_operation(operation: str, image: Image.Image, **kwargs) -> Image.Image:
+    """Run a registered image operation off the event loop"""
+    pool = get_image_pool()
+    if pool is None:
+        return await asyncio.to_thread(IMAGE_OPERATIONS[operation], image, **kwargs)
+    return await pool.run(operation, image, **kwargs)
+
+
+async def shutdown_image_pool():
+    """Called at app shutdown"""
+    global _image_pool
+    if _image_pool is not None:
+        await asyncio.to_thread(_image_pool.shutdown)
+        _image_pool = None
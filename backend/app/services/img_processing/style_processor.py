@@ -1,18 +1,178 @@
 """
 Style Processor Module
 Style-specific image preprocessing for different Instagram aesthetics
+
+Presets run on a single buffer: the image is converted PIL → BGR once, the
+OpenCV stages (color correction, smoothing) run on the uint8 array, the
+remaining adjustments (ImageEnhance equivalents, temperature, sepia,
+vignette, shadow) run in place on one float32 buffer, and the result is
+converted back to PIL once. Runs of pure color operations are applied as
+one cached 3D LUT pass (STYLE_GRADES).
 """
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
-from typing import Tuple
+from PIL import Image
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
 import logging
 
-from .color_correction import ColorCorrection 
+from .color_correction import ColorCorrection, ENHANCE_GRADES
 from .wrinkle_removal import WrinkleRemoval  
+from .color_lut import DEFAULT_LUT_SIZE, apply_grade, compile_lut, blend, luma
+from . import content_crop
+from .content_crop import ContentCrop, CROP_MARGIN
 
 logger = logging.getLogger(__name__)
 
+# PIL ImageFilter.SMOOTH kernel (degenerate image of ImageEnhance.Sharpness)
+_SMOOTH_KERNEL = np.array([[1, 1, 1],
+                           [1, 5, 1],
+                           [1, 1, 1]], dtype=np.float32) / 13
+
+# Pure color stages of each preset, compiled into 3D LUTs (see color_lut.py)
+STYLE_GRADES = {
+    "mood": (("temperature", (30,)), ("sepia", (0.3,)), ("color", (0.9,))),
+    "street-color": (("color", (1.4,)),),
+    "street-temperature": (("temperature", (-10,)),),
+}
+
+
+# Drop shadow of the minimal preset
+_MINIMAL_SHADOW = {"offset": (8, 8), "blur_radius": 15, "shadow_color": (0, 0, 0, 60)}
+
+
+def _shadow_margin(offset: Tuple[int, int], blur_radius: float) -> int:
+    """Crop margin that keeps the whole shadow falloff inside the crop"""
+    return CROP_MARGIN + max(abs(offset[0]), abs(offset[1])) + int(3 * blur_radius) + 1
+
+
+# ===== Buffer conversion =====
+
+def _split_image(image: Image.Image) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """PIL image → (BGR uint8 array, alpha channel or None)"""
+    if image.mode == 'RGBA':
+        array = np.asarray(image)
+        return cv2.cvtColor(array, cv2.COLOR_RGBA2BGR), array[:, :, 3].copy()
+    return cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR), None
+
+
+def _merge_image(bgr: np.ndarray, alpha: Optional[np.ndarray]) -> Image.Image:
+    """(BGR array, alpha channel or None) → PIL image"""
+    if bgr.dtype != np.uint8:
+        bgr = bgr.astype(np.uint8)
+    if alpha is None:
+        return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+    rgba = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGBA)
+    rgba[:, :, 3] = alpha
+    return Image.fromarray(rgba, mode='RGBA')
+
+
+# ===== In-place float32 operations =====
+
+def _enhance_contrast(buffer: np.ndarray, factor: float):
+    """ImageEnhance.Contrast: blend with the mean gray level"""
+    mean = int(float(luma(buffer).mean()) + 0.5)
+    blend(buffer, float(mean), factor)
+
+
+def _enhance_sharpness(buffer: np.ndarray, factor: float):
+    """ImageEnhance.Sharpness: blend with the SMOOTH-filtered image (borders untouched)"""
+    smooth = cv2.filter2D(buffer, -1, _SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+    smooth[[0, -1]] = buffer[[0, -1]]
+    smooth[:, [0, -1]] = buffer[:, [0, -1]]
+    blend(buffer, smooth, factor)
+
+
+@lru_cache(maxsize=64)
+def _vignette_axis(length: int, center: int) -> np.ndarray:
+    """Squared distance of each row / column from the canvas center (read-only, a few KB)"""
+    axis = (np.arange(length, dtype=np.float32) - center) ** 2
+    axis.flags.writeable = False
+    return axis
+
+
+def _vignette_mask(width: int, height: int, strength: float,
+                   box: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    Radial vignette mask (h, w, 1) in [0, 1] for `box` of a (width, height) canvas
+
+    Only the per-axis distance profiles are cached; the mask itself is built
+    per call for the requested region, so full-resolution masks are never kept.
+    Same quantization as the former per-pixel loop: 255 * (1 - strength * dist / max_dist)
+    truncated to uint8.
+    """
+    left, top, right, bottom = box or (0, 0, width, height)
+    center_x, center_y = width // 2, height // 2
+    max_dist = np.sqrt(center_x**2 + center_y**2) or 1.0
+
+    xs = _vignette_axis(width, center_x)[left:right]
+    ys = _vignette_axis(height, center_y)[top:bottom]
+    dist = np.sqrt(ys[:, None] + xs[None, :])
+
+    mask = np.clip(255 * (1 - strength * (dist / max_dist)), 0, 255).astype(np.uint8)
+    return (mask.astype(np.float32) / 255)[:, :, None]
+
+
+def _apply_vignette(buffer: np.ndarray, strength: float, crop: Optional[ContentCrop] = None):
+    """Vignette centered on the full canvas (a crop uses its region of the canvas mask)"""
+    if crop is None:
+        height, width = buffer.shape[:2]
+        buffer *= _vignette_mask(width, height, strength)
+        return
+    buffer *= _vignette_mask(*crop.canvas_size, strength, crop.box)
+
+
+def _shift(array: np.ndarray, dx: int, dy: int, fill: float = 0) -> np.ndarray:
+    """Translate by (dx, dy) pixels, filling uncovered pixels with `fill`"""
+    result = np.full_like(array, fill)
+    height, width = array.shape[:2]
+    if abs(dx) >= width or abs(dy) >= height:
+        return result
+    result[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        array[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)]
+    return result
+
+
+def _box_blur(array: np.ndarray, sigma: float, passes: int = 3) -> np.ndarray:
+    """Gaussian blur approximated by repeated box blurs (like PIL's GaussianBlur), O(1) per pixel"""
+    if sigma <= 0:
+        return array
+    size = int(np.sqrt(12 * sigma * sigma / passes + 1))
+    size += 1 - size % 2
+    for _ in range(passes):
+        array = cv2.blur(array, (size, size), borderType=cv2.BORDER_REPLICATE)
+    return array
+
+
+def _composite_shadow(buffer: np.ndarray, alpha: np.ndarray, offset: Tuple[int, int],
+                      blur_radius: float, shadow_color: Tuple[int, int, int, int],
+                      cropped: bool = False) -> np.ndarray:
+    """
+    Drop shadow on a float32 BGR buffer + alpha channel (same result as the former PIL version)
+
+    The buffer is replaced in place by the composited color; the composited
+    alpha channel is returned. For a content crop (cropped=True) the area
+    outside the buffer is empty canvas, i.e. full shadow.
+    """
+    coverage = alpha.astype(np.float32) / 255
+
+    # Shadow layer: shadow color with the object's silhouette cut out, offset and blurred.
+    # Every channel of that layer is the shadow color times the same field, so only the field is blurred.
+    inverse = 1 - coverage
+    field = _box_blur(_shift(inverse, offset[0], offset[1], fill=1.0 if cropped else 0.0), blur_radius)
+
+    # alpha_composite(shadow, image)
+    r, g, b, a = shadow_color
+    shadow_alpha = field * (a / 255) * inverse
+    out_alpha = coverage + shadow_alpha
+    buffer *= coverage[:, :, None]
+    buffer += (field * shadow_alpha)[:, :, None] * np.array([b, g, r], dtype=np.float32)
+    np.divide(buffer, out_alpha[:, :, None], out=buffer, where=out_alpha[:, :, None] > 0)
+    np.clip(buffer, 0, 255, out=buffer)
+
+    return np.clip(out_alpha * 255 + 0.5, 0, 255).astype(np.uint8)
+
 
 class StyleProcessor:
     """Process images with different style presets"""
@@ -23,7 +183,8 @@ class StyleProcessor:
         self.wrinkle_remover = WrinkleRemoval()
     
     def add_drop_shadow(self, image: Image.Image, offset: Tuple[int, int] = (10, 10),
-                       blur_radius: int = 20, shadow_color: Tuple[int, int, int, int] = (0, 0, 0, 100)) -> Image.Image:
+                       blur_radius: int = 20, shadow_color: Tuple[int, int, int, int] = (0, 0, 0, 100),
+                       crop_to_content: bool = False) -> Image.Image:
         """
         Add professional drop shadow to image
         
@@ -32,35 +193,26 @@ class StyleProcessor:
             offset: Shadow offset (x, y)
             blur_radius: Shadow blur
             shadow_color: Shadow color (RGBA)
+            crop_to_content: Composite only around the visible content
             
         Returns:
             Image with shadow
         """
-        # Create shadow layer
-        shadow = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow)
+        # Shadow needs an alpha channel with at least one visible pixel
+        if image.mode != 'RGBA' or image.getbbox() is None:
+            return image
         
-        # Get image bounds (non-transparent pixels)
-        bbox = image.getbbox()
-        if bbox:
-            # Draw shadow
-            shadow.paste(Image.new('RGBA', image.size, shadow_color), (0, 0))
-            shadow.paste((0, 0, 0, 0), (0, 0), image)
-            
-            # Offset and blur shadow
-            shadow = shadow.transform(
-                image.size,
-                Image.AFFINE,
-                (1, 0, -offset[0], 0, 1, -offset[1]),
-                Image.BILINEAR
-            )
-            shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
-            
-            # Composite shadow with image
-            result = Image.alpha_composite(shadow, image)
-            return result
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(image, _shadow_margin(offset, blur_radius))
         
-        return image
+        bgr, alpha = _split_image(image)
+        buffer = bgr.astype(np.float32)
+        alpha = _composite_shadow(buffer, alpha, offset, blur_radius, shadow_color, cropped=crop is not None)
+        result = _merge_image(buffer, alpha)
+        
+        # Far from the content the shadow layer is the plain shadow color
+        return crop.embed(result, shadow_color) if crop else result
     
     def add_vignette(self, image: Image.Image, strength: float = 0.3) -> Image.Image:
         """
@@ -73,40 +225,13 @@ class StyleProcessor:
         Returns:
             Image with vignette
         """
-        # Convert to RGB for processing
-        has_alpha = image.mode == 'RGBA'
-        if has_alpha:
-            alpha = image.split()[3]
-            rgb_image = image.convert('RGB')
-        else:
-            rgb_image = image
-        
-        # Create radial gradient mask
-        width, height = rgb_image.size
-        center_x, center_y = width // 2, height // 2
-        max_dist = np.sqrt(center_x**2 + center_y**2)
-        
-        # Create vignette mask
-        vignette = Image.new('L', (width, height), 255)
-        vignette_array = np.array(vignette).astype(np.float32)
-        
-        for y in range(height):
-            for x in range(width):
-                dist = np.sqrt((x - center_x)**2 + (y - center_y)**2)
-                vignette_array[y, x] = 255 * (1 - strength * (dist / max_dist))
-        
-        vignette = Image.fromarray(vignette_array.astype(np.uint8))
-        
-        # Apply vignette
-        result = Image.composite(rgb_image, Image.new('RGB', rgb_image.size, (0, 0, 0)), vignette)
-        
-        # Restore alpha
-        if has_alpha:
-            result.putalpha(alpha)
-        
-        return result
+        bgr, alpha = _split_image(image)
+        buffer = bgr.astype(np.float32)
+        _apply_vignette(buffer, strength)
+        return _merge_image(buffer, alpha)
     
-    def minimal_style(self, image: Image.Image) -> Image.Image:
+    def minimal_style(self, image: Image.Image, quality: float = 1.0,
+                      crop_to_content: bool = False) -> Image.Image:
         """
         Apply minimal style processing
         - Clean white background
@@ -116,46 +241,41 @@ class StyleProcessor:
         
         Args:
             image: RGBA image (background already removed)
+            quality: Smoothing proxy resolution (see WrinkleRemoval.bilateral_filter)
+            crop_to_content: Process only the visible content (see process_with_style)
             
         Returns:
             Processed image
         """
         logger.info("Applying minimal style")
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(
+                image, _shadow_margin(_MINIMAL_SHADOW["offset"], _MINIMAL_SHADOW["blur_radius"])
+            )
+        bgr, alpha = _split_image(image)
         
         # 1. Color correction - vivid for clarity
-        enhanced = self.color_corrector.auto_enhance(image, style="vivid")
+        bgr = self.color_corrector.enhance_array(bgr, style="vivid")
         
         # 2. Remove wrinkles - light to maintain detail
-        smoothed = self.wrinkle_remover.remove_wrinkles(enhanced, strength="light")
+        bgr = self.wrinkle_remover.smooth_array(bgr, strength="light", quality=quality)
         
         # 3. Increase contrast and sharpness
-        if smoothed.mode == 'RGBA':
-            alpha = smoothed.split()[3]
-            rgb = smoothed.convert('RGB')
-        else:
-            rgb = smoothed.convert('RGB')
-            alpha = None
-        
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(rgb)
-        rgb = enhancer.enhance(1.2)
-        
-        # Enhance sharpness
-        enhancer = ImageEnhance.Sharpness(rgb)
-        rgb = enhancer.enhance(1.5)
-        
-        # Restore alpha
-        if alpha:
-            rgb.putalpha(alpha)
+        buffer = bgr.astype(np.float32)
+        _enhance_contrast(buffer, 1.2)
+        _enhance_sharpness(buffer, 1.5)
         
         # 4. Add professional drop shadow
-        result = self.add_drop_shadow(rgb, offset=(8, 8), blur_radius=15, 
-                                      shadow_color=(0, 0, 0, 60))
+        if alpha is not None and alpha.any():
+            alpha = _composite_shadow(buffer, alpha, **_MINIMAL_SHADOW, cropped=crop is not None)
         
         logger.info("Minimal style applied successfully")
-        return result
+        result = _merge_image(buffer, alpha)
+        return crop.embed(result, _MINIMAL_SHADOW["shadow_color"]) if crop else result
     
-    def mood_style(self, image: Image.Image) -> Image.Image:
+    def mood_style(self, image: Image.Image, quality: float = 1.0,
+                   crop_to_content: bool = False) -> Image.Image:
         """
         Apply mood/emotional style processing
         - Warm color temperature
@@ -165,59 +285,37 @@ class StyleProcessor:
         
         Args:
             image: RGBA image
+            quality: Smoothing proxy resolution (see WrinkleRemoval.bilateral_filter)
+            crop_to_content: Process only the visible content (see process_with_style)
             
         Returns:
             Processed image
         """
         logger.info("Applying mood style")
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(image)
+        bgr, alpha = _split_image(image)
         
         # 1. Color correction - soft for gentle feel
-        enhanced = self.color_corrector.auto_enhance(image, style="soft")
+        bgr = self.color_corrector.enhance_array(bgr, style="soft")
         
         # 2. Remove wrinkles - medium smoothing
-        smoothed = self.wrinkle_remover.remove_wrinkles(enhanced, strength="medium")
-        
-        # 3. Apply warm color temperature
-        if smoothed.mode == 'RGBA':
-            alpha = smoothed.split()[3]
-            rgb = smoothed.convert('RGB')
-        else:
-            rgb = smoothed.convert('RGB')
-            alpha = None
-        
-        # Convert to OpenCV for temperature adjustment
-        cv_image = cv2.cvtColor(np.array(rgb), cv2.COLOR_RGB2BGR)
-        cv_image = self.color_corrector.adjust_color_temperature(cv_image, temperature=30)
-        
-        # 4. Sepia tone (vintage effect) - subtle
-        cv_image = cv_image.astype(np.float32)
-        sepia_kernel = np.array([[0.272, 0.534, 0.131],
-                                [0.349, 0.686, 0.168],
-                                [0.393, 0.769, 0.189]])
-        sepia = cv2.transform(cv_image, sepia_kernel)
+        bgr = self.wrinkle_remover.smooth_array(bgr, strength="medium", quality=quality)
         
-        # Blend sepia with original (30% sepia)
-        cv_image = cv2.addWeighted(cv_image, 0.7, sepia, 0.3, 0)
-        cv_image = np.clip(cv_image, 0, 255).astype(np.uint8)
+        # 3. Warm temperature, subtle sepia (30%) and slightly reduced saturation - one LUT pass
+        buffer = bgr.astype(np.float32)
+        apply_grade(buffer, STYLE_GRADES["mood"])
         
-        # Convert back to PIL
-        rgb = Image.fromarray(cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB))
-        
-        # Restore alpha
-        if alpha:
-            rgb.putalpha(alpha)
-        
-        # 5. Add subtle vignette
-        result = self.add_vignette(rgb, strength=0.2)
-        
-        # 6. Slightly reduce saturation for soft look
-        enhancer = ImageEnhance.Color(result)
-        result = enhancer.enhance(0.9)
+        # 4. Add subtle vignette (a per-pixel scale, so it commutes with the grade above)
+        _apply_vignette(buffer, strength=0.2, crop=crop)
         
         logger.info("Mood style applied successfully")
-        return result
+        result = _merge_image(buffer, alpha)
+        return crop.embed(result) if crop else result
     
-    def street_style(self, image: Image.Image) -> Image.Image:
+    def street_style(self, image: Image.Image, quality: float = 1.0,
+                     crop_to_content: bool = False) -> Image.Image:
         """
         Apply street/urban style processing
         - Vibrant colors
@@ -227,71 +325,92 @@ class StyleProcessor:
         
         Args:
             image: RGBA image
+            quality: Smoothing proxy resolution (see WrinkleRemoval.bilateral_filter)
+            crop_to_content: Process only the visible content (see process_with_style)
             
         Returns:
             Processed image
         """
         logger.info("Applying street style")
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(image)
+        bgr, alpha = _split_image(image)
         
         # 1. Color correction - vivid for vibrant look
-        enhanced = self.color_corrector.auto_enhance(image, style="vivid")
+        bgr = self.color_corrector.enhance_array(bgr, style="vivid")
         
         # 2. Remove wrinkles - light to keep texture
-        smoothed = self.wrinkle_remover.remove_wrinkles(enhanced, strength="light")
-        
-        # 3. Boost saturation and contrast
-        if smoothed.mode == 'RGBA':
-            alpha = smoothed.split()[3]
-            rgb = smoothed.convert('RGB')
-        else:
-            rgb = smoothed.convert('RGB')
-            alpha = None
-        
-        # Increase saturation significantly
-        enhancer = ImageEnhance.Color(rgb)
-        rgb = enhancer.enhance(1.4)
-        
-        # Increase contrast
-        enhancer = ImageEnhance.Contrast(rgb)
-        rgb = enhancer.enhance(1.3)
+        bgr = self.wrinkle_remover.smooth_array(bgr, strength="light", quality=quality)
         
-        # Enhance sharpness for edge definition
-        enhancer = ImageEnhance.Sharpness(rgb)
-        rgb = enhancer.enhance(2.0)
+        # 3. Boost saturation and contrast, sharpen edges
+        buffer = bgr.astype(np.float32)
+        apply_grade(buffer, STYLE_GRADES["street-color"])
+        _enhance_contrast(buffer, 1.3)
+        _enhance_sharpness(buffer, 2.0)
         
         # 4. Cool temperature adjustment (urban feel)
-        cv_image = cv2.cvtColor(np.array(rgb), cv2.COLOR_RGB2BGR)
-        cv_image = self.color_corrector.adjust_color_temperature(cv_image, temperature=-10)
-        
-        # Convert back to PIL
-        rgb = Image.fromarray(cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB))
-        
-        # Restore alpha
-        if alpha:
-            rgb.putalpha(alpha)
+        apply_grade(buffer, STYLE_GRADES["street-temperature"])
         
         logger.info("Street style applied successfully")
-        return rgb
+        result = _merge_image(buffer, alpha)
+        return crop.embed(result) if crop else result
     
-    def process_with_style(self, image: Image.Image, style: str = "minimal") -> Image.Image:
+    def export_luts(self, directory, size: int = DEFAULT_LUT_SIZE) -> List[Path]:
+        """
+        Write the pure color stages of every preset as .cube files
+        
+        Args:
+            directory: Output directory
+            size: LUT lattice size
+            
+        Returns:
+            Written file paths
+        """
+        grades = {f"enhance-{name}": chain for name, chain in ENHANCE_GRADES.items()}
+        grades.update(STYLE_GRADES)
+        
+        directory = Path(directory)
+        paths = []
+        for name, chain in grades.items():
+            paths.append(compile_lut(chain, size).write_cube(directory / f"{name}.cube"))
+        return paths
+    
+    def process_with_style(self, image: Image.Image, style: str = "minimal",
+                           quality: float = 1.0, crop_to_content: bool = False) -> Image.Image:
         """
         Process image with specified style
         
         Args:
             image: Input image (RGBA)
             style: Style name ("minimal", "mood", "street")
-            
+            quality: Smoothing proxy resolution (1.0 = full resolution, lower = faster)
+            crop_to_content: Process only the alpha bounding box (plus a margin) and
+                             re-embed the result into the original canvas;
+                             white balance, CLAHE and the contrast mean are then
+                             computed over the crop and ignore the transparent
+                             border, so colors can differ from a full-canvas run
+                             (the vignette and shadow still follow the full canvas)
+
         Returns:
             Styled image
         """
         style = style.lower()
         
         if style == "minimal":
-            return self.minimal_style(image)
+            return self.minimal_style(image, quality, crop_to_content)
         elif style == "mood":
-            return self.mood_style(image)
+            return self.mood_style(image, quality, crop_to_content)
         elif style == "street":
-            return self.street_style(image)
+            return self.street_style(image, quality, crop_to_content)
         else:
             logger.warning(f"Unknown style '{style}', using minimal")
-            return self.minimal_style(image)
\ No newline at end of file
+            return self.minimal_style(image, quality, crop_to_content)
+    
+    async def aprocess_with_style(self, image: Image.Image, style: str = "minimal",
+                                  quality: float = 1.0, crop_to_content: bool = False) -> Image.Image:
+        """Async version of process_with_style (runs in the image process pool)"""
+        from .process_pool import run_image_operation
+        return await run_image_operation(
+            "style", image, style=style, quality=quality, crop_to_content=crop_to_content
+        )
\ No newline at end of file
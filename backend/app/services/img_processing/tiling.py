@@ -0,0 +1,128 @@
+"""
+Tiled Image Executor
+Runs OpenCV operations on large images as overlapping horizontal bands in a
+thread pool (cv2 releases the GIL while filtering).
+
+Each band is extended by a halo of rows equal to the operation's support
+radius, the operation runs on the extended band, and only the band's own
+rows are kept. Inside the image the halo supplies the real neighbouring
+pixels, and bands touching the image border see the real border, so the
+stitched result matches the untiled one.
+
+Only operations whose output pixel depends on a bounded neighbourhood can be
+tiled (pointwise conversions, bilateral / box / Gaussian filters). Operations
+that use whole-image statistics (CLAHE tile histograms, white balance
+averages, min-max normalization) compute those statistics once on the full
+image and tile the rest.
+"""
+import os
+import math
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bands are never thinner than this (keeps the halo overhead small)
+_MIN_BAND_ROWS = 64
+
+
+def bilateral_halo(d: int, sigma_space: float) -> int:
+    """Support radius of cv2.bilateralFilter"""
+    return d // 2 if d > 0 else int(round(sigma_space * 1.5))
+
+
+def box_halo(ksize: int, passes: int = 1) -> int:
+    """Support radius of `passes` chained cv2.boxFilter calls"""
+    return passes * (ksize // 2 + 1)
+
+
+def gaussian_halo(sigma: float) -> int:
+    """Support radius of cv2.GaussianBlur with ksize=(0, 0) (8-bit: 3 sigma, float: 4 sigma)"""
+    return int(round(sigma * 4)) + 1
+
+
+class TileExecutor:
+    """Thread pool that maps an operation over overlapping bands of an image"""
+
+    def __init__(self, workers: int, min_pixels: int):
+        self.workers = max(workers, 1)
+        self.min_pixels = min_pixels
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="img-tile")
+
+    def map(self, fn: Callable[[np.ndarray], np.ndarray], image: np.ndarray,
+            halo: int = 0, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Run a shape-preserving operation band by band
+
+        Args:
+            fn: Operation (band → band of the same height). With a halo the
+                bands overlap, so fn must not modify its input in place
+            image: Input image (H x W or H x W x C)
+            halo: Support radius of the operation in pixels
+            out: Output array (may be `image` itself when halo is 0)
+
+        Returns:
+            Stitched result (same as fn(image) for a bounded-support fn)
+        """
+        height, width = image.shape[:2]
+        if self.workers == 1 or height * width < self.min_pixels:
+            result = fn(image)
+            if out is None:
+                return result
+            out[...] = result
+            return out
+
+        if out is not None and halo > 0 and np.shares_memory(out, image):
+            raise ValueError("Tiled output can only alias the input for pointwise operations (halo=0)")
+
+        rows = max(math.ceil(height / (self.workers * 2)), _MIN_BAND_ROWS, 4 * halo)
+        bands = [(start, min(start + rows, height)) for start in range(0, height, rows)]
+
+        def run(band):
+            start, stop = band
+            top = max(start - halo, 0)
+            bottom = min(stop + halo, height)
+            result = fn(image[top:bottom])
+            return result[start - top:start - top + (stop - start)]
+
+        results = list(self._executor.map(run, bands))
+
+        if out is None:
+            out = np.empty((height,) + results[0].shape[1:], dtype=results[0].dtype)
+        for (start, stop), result in zip(bands, results):
+            out[start:stop] = result
+        return out
+
+
+# 싱글톤 (프로세스별: 이미지 프로세스 풀 워커마다 하나씩)
+_tile_executor: Optional[TileExecutor] = None
+_tile_executor_lock = threading.Lock()
+
+def get_tile_executor() -> TileExecutor:
+    global _tile_executor
+    if _tile_executor is None:
+        with _tile_executor_lock:
+            if _tile_executor is None:
+                workers = settings.IMAGE_TILE_WORKERS
+                if workers <= 0:
+                    # Share the cores with the other image worker processes
+                    workers = max(1, (os.cpu_count() or 1) // max(settings.IMAGE_PROCESS_WORKERS, 1))
+                if workers > 1:
+                    # Parallelism comes from the bands; nested cv2 threads would oversubscribe the cores
+                    cv2.setNumThreads(1)
+                _tile_executor = TileExecutor(workers, settings.IMAGE_TILE_MIN_PIXELS)
+                logger.info(f"Image tile executor: {workers} threads")
+    return _tile_executor
+
+
+def tile_map(fn: Callable[[np.ndarray], np.ndarray], image: np.ndarray,
+             halo: int = 0, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Run an operation over overlapping bands with the process-wide executor"""
+    return get_tile_executor().map(fn, image, halo=halo, out=out)
@@ -5,10 +5,20 @@ Smoothing and detail preservation for clothing images
 import cv2
 import numpy as np
 from PIL import Image
+from typing import Optional, Tuple
 import logging
 
+from . import content_crop
+from .tiling import tile_map, bilateral_halo, box_halo
+
 logger = logging.getLogger(__name__)
 
+# Proxy mode (quality < 1.0): smallest proxy side, and the guided filter
+# settings used to transfer the proxy result back to full resolution
+PROXY_MIN_SIDE = 256
+PROXY_RADIUS = 4
+PROXY_EPS = 1e-4
+
 
 class WrinkleRemoval:
     """Wrinkle removal and fabric smoothing"""
@@ -18,7 +28,8 @@ class WrinkleRemoval:
         pass
     
     def bilateral_filter(self, image: np.ndarray, d: int = 9, 
-                        sigma_color: int = 75, sigma_space: int = 75) -> np.ndarray:
+                        sigma_color: int = 75, sigma_space: int = 75,
+                        quality: float = 1.0) -> np.ndarray:
         """
         Apply bilateral filter for edge-preserving smoothing
         
@@ -27,51 +38,132 @@ class WrinkleRemoval:
             d: Diameter of pixel neighborhood
             sigma_color: Filter sigma in color space
             sigma_space: Filter sigma in coordinate space
+            quality: Proxy resolution (1.0 = full resolution, 0.5 = filter at half
+                     size and transfer back with guided upsampling)
             
         Returns:
             Filtered image
         """
-        return cv2.bilateralFilter(image, d, sigma_color, sigma_space)
+        scale = self._proxy_scale(image, quality)
+        if scale >= 1.0:
+            return tile_map(
+                lambda tile: cv2.bilateralFilter(tile, d, sigma_color, sigma_space),
+                image, halo=bilateral_halo(d, sigma_space),
+            )
+        
+        # Spatial parameters shrink with the proxy, color sigma stays the same
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        smoothed = cv2.bilateralFilter(small, max(3, round(d * scale)), sigma_color, sigma_space * scale)
+        return self.guided_upsample(image, small, smoothed)
     
-    def guided_filter(self, image: np.ndarray, radius: int = 8, eps: float = 0.01) -> np.ndarray:
+    def _proxy_scale(self, image: np.ndarray, quality: float) -> float:
+        """Proxy scale for a quality setting (never below PROXY_MIN_SIDE pixels)"""
+        if quality >= 1.0:
+            return 1.0
+        min_side = min(image.shape[:2])
+        return min(1.0, max(quality, PROXY_MIN_SIDE / max(min_side, 1)))
+    
+    def _guided_coefficients(self, guide: np.ndarray, src: np.ndarray,
+                             radius: int, eps: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-channel guided filter coefficients (mean_a, mean_b): output = mean_a * guide + mean_b"""
+        ksize = (radius, radius)
+        mean_I = cv2.boxFilter(guide, cv2.CV_32F, ksize)
+        mean_p = cv2.boxFilter(src, cv2.CV_32F, ksize)
+        mean_II = cv2.boxFilter(guide * guide, cv2.CV_32F, ksize)
+        mean_Ip = cv2.boxFilter(guide * src, cv2.CV_32F, ksize)
+        
+        var_I = mean_II - mean_I * mean_I
+        cov_Ip = mean_Ip - mean_I * mean_p
+        
+        a = cov_Ip / (var_I + eps)
+        b = mean_p - a * mean_I
+        
+        mean_a = cv2.boxFilter(a, cv2.CV_32F, ksize)
+        mean_b = cv2.boxFilter(b, cv2.CV_32F, ksize)
+        return mean_a, mean_b
+    
+    def guided_filter(self, image: np.ndarray, radius: int = 8, eps: float = 0.01,
+                      src: Optional[np.ndarray] = None, subsample: int = 1) -> np.ndarray:
         """
         Apply guided filter for detail-preserving smoothing
         
         Args:
-            image: Input image (BGR)
+            image: Input image (BGR), also the guidance image
             radius: Radius of guided filter
             eps: Regularization parameter
+            src: Image to filter (defaults to the image itself)
+            subsample: Compute the coefficients at 1/subsample resolution (fast guided filter)
             
         Returns:
             Filtered image
         """
-        # Convert to float
-        img = image.astype(np.float32) / 255.0
+        if subsample > 1:
+            height, width = image.shape[:2]
+            size = (max(1, width // subsample), max(1, height // subsample))
+            small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            small_src = small if src is None else cv2.resize(src, size, interpolation=cv2.INTER_AREA)
+            return self.guided_upsample(image, small, small_src, max(1, radius // subsample), eps)
         
-        # Use image itself as guidance
-        mean_I = cv2.boxFilter(img, cv2.CV_32F, (radius, radius))
-        mean_II = cv2.boxFilter(img * img, cv2.CV_32F, (radius, radius))
+        channels = image.shape[2] if image.ndim == 3 else 1
         
-        var_I = mean_II - mean_I * mean_I
+        def guided(tile):
+            # Convert to float
+            img = tile[..., :channels].astype(np.float32) / 255.0
+            
+            # Use image itself as guidance
+            p = img if src is None else tile[..., channels:].astype(np.float32) / 255.0
+            mean_a, mean_b = self._guided_coefficients(img, p, radius, eps)
+            
+            result = mean_a * img + mean_b
+            return np.clip(result * 255, 0, 255).astype(np.uint8)
         
-        a = var_I / (var_I + eps)
-        b = mean_I - a * mean_I
+        # Guide and source are banded together so each tile sees both
+        stacked = image if src is None else np.dstack([image, src])
+        return tile_map(guided, stacked, halo=box_halo(radius, passes=2))
+    
+    def guided_upsample(self, image: np.ndarray, low_guide: np.ndarray, low_result: np.ndarray,
+                        radius: int = PROXY_RADIUS, eps: float = PROXY_EPS) -> np.ndarray:
+        """
+        Transfer a filter result computed at low resolution back to full resolution
         
-        mean_a = cv2.boxFilter(a, cv2.CV_32F, (radius, radius))
-        mean_b = cv2.boxFilter(b, cv2.CV_32F, (radius, radius))
+        Guided filter coefficients are fitted between the low resolution input
+        (low_guide) and its filtered version (low_result), upsampled, and applied
+        to the full resolution image. Edges kept by the filter stay sharp, areas
+        it smoothed come out smooth.
         
-        result = mean_a * img + mean_b
-        result = np.clip(result * 255, 0, 255).astype(np.uint8)
+        Args:
+            image: Full resolution image (BGR)
+            low_guide: Downscaled image the filter was run on
+            low_result: Filter output at low resolution
+            radius: Guided filter radius (low resolution pixels)
+            eps: Regularization parameter
+            
+        Returns:
+            Filtered image at full resolution
+        """
+        guide = low_guide.astype(np.float32) / 255.0
+        src = low_result.astype(np.float32) / 255.0
+        mean_a, mean_b = self._guided_coefficients(guide, src, radius, eps)
         
-        return result
+        height, width = image.shape[:2]
+        mean_a = cv2.resize(mean_a, (width, height), interpolation=cv2.INTER_LINEAR)
+        mean_b = cv2.resize(mean_b * 255, (width, height), interpolation=cv2.INTER_LINEAR)
+        
+        # Full resolution part in OpenCV (no numpy temporaries): round(clip(a * I + b))
+        result = cv2.multiply(image, mean_a, dtype=cv2.CV_32F)
+        cv2.add(result, mean_b, dst=result)
+        cv2.max(result, 0, dst=result)
+        return cv2.convertScaleAbs(result)
     
-    def adaptive_smoothing(self, image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
+    def adaptive_smoothing(self, image: np.ndarray, kernel_size: int = 5,
+                           quality: float = 1.0) -> np.ndarray:
         """
         Apply adaptive smoothing based on local variance
         
         Args:
             image: Input image
             kernel_size: Size of smoothing kernel
+            quality: Proxy resolution for the bilateral pass (see bilateral_filter)
             
         Returns:
             Smoothed image
@@ -88,7 +180,7 @@ class WrinkleRemoval:
         variance = cv2.normalize(variance, None, 0, 1, cv2.NORM_MINMAX, cv2.CV_32F)
         
         # Create smoothed version
-        smoothed = cv2.bilateralFilter(image, 9, 75, 75)
+        smoothed = self.bilateral_filter(image, 9, 75, 75, quality=quality)
         
         # Blend based on variance (smooth more in low variance areas)
         variance_3ch = cv2.cvtColor((variance * 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
@@ -99,13 +191,15 @@ class WrinkleRemoval:
         
         return result.astype(np.uint8)
     
-    def detail_preserving_smooth(self, image: np.ndarray, strength: float = 0.5) -> np.ndarray:
+    def detail_preserving_smooth(self, image: np.ndarray, strength: float = 0.5,
+                                 quality: float = 1.0) -> np.ndarray:
         """
         Apply detail-preserving smoothing
         
         Args:
             image: Input image
             strength: Smoothing strength (0.0 to 1.0)
+            quality: Proxy resolution for the bilateral pass (see bilateral_filter)
             
         Returns:
             Smoothed image
@@ -118,24 +212,58 @@ class WrinkleRemoval:
         sigma_space = int(75 * strength)
         d = 9 if strength > 0.5 else 7
         
-        smoothed = cv2.bilateralFilter(image, d, sigma_color, sigma_space)
+        smoothed = self.bilateral_filter(image, d, sigma_color, sigma_space, quality=quality)
         
         # Blend with original based on strength
         result = cv2.addWeighted(image, 1 - strength, smoothed, strength, 0)
         
         return result
     
-    def remove_wrinkles(self, image: Image.Image, strength: str = "medium") -> Image.Image:
+    def smooth_array(self, image: np.ndarray, strength: str = "medium",
+                     quality: float = 1.0) -> np.ndarray:
+        """
+        Wrinkle smoothing on a BGR array (no PIL conversion)
+        
+        Args:
+            image: BGR image (uint8)
+            strength: Smoothing strength ("light", "medium", "strong")
+            quality: Proxy resolution for the bilateral passes (see bilateral_filter)
+            
+        Returns:
+            Smoothed BGR image
+        """
+        if strength == "light":
+            image = self.detail_preserving_smooth(image, strength=0.3, quality=quality)
+        elif strength == "medium":
+            image = self.bilateral_filter(image, d=9, sigma_color=50, sigma_space=50, quality=quality)
+        elif strength == "strong":
+            image = self.bilateral_filter(image, d=11, sigma_color=75, sigma_space=75, quality=quality)
+            # Apply second pass for very strong smoothing
+            image = self.detail_preserving_smooth(image, strength=0.4, quality=quality)
+        else:
+            logger.warning(f"Unknown strength '{strength}', using medium")
+            image = self.bilateral_filter(image, d=9, sigma_color=50, sigma_space=50, quality=quality)
+        
+        return image
+    
+    def remove_wrinkles(self, image: Image.Image, strength: str = "medium",
+                        quality: float = 1.0, crop_to_content: bool = False) -> Image.Image:
         """
         Main wrinkle removal pipeline
         
         Args:
             image: PIL Image (RGB or RGBA)
             strength: Smoothing strength ("light", "medium", "strong")
+            quality: Proxy resolution (1.0 = full resolution, lower = faster)
+            crop_to_content: Smooth only the alpha bounding box (plus a margin)
             
         Returns:
             Smoothed PIL Image
         """
+        crop = None
+        if crop_to_content:
+            image, crop = content_crop.crop_to_content(image)
+        
         # Convert PIL to OpenCV format
         has_alpha = image.mode == 'RGBA'
         if has_alpha:
@@ -146,18 +274,7 @@ class WrinkleRemoval:
         
         cv_image = cv2.cvtColor(np.array(rgb_image), cv2.COLOR_RGB2BGR)
         
-        # Apply smoothing based on strength
-        if strength == "light":
-            cv_image = self.detail_preserving_smooth(cv_image, strength=0.3)
-        elif strength == "medium":
-            cv_image = self.bilateral_filter(cv_image, d=9, sigma_color=50, sigma_space=50)
-        elif strength == "strong":
-            cv_image = self.bilateral_filter(cv_image, d=11, sigma_color=75, sigma_space=75)
-            # Apply second pass for very strong smoothing
-            cv_image = self.detail_preserving_smooth(cv_image, strength=0.4)
-        else:
-            logger.warning(f"Unknown strength '{strength}', using medium")
-            cv_image = self.bilateral_filter(cv_image, d=9, sigma_color=50, sigma_space=50)
+        cv_image = self.smooth_array(cv_image, strength, quality)
         
         # Convert back to PIL
         rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
@@ -168,4 +285,12 @@ class WrinkleRemoval:
             result.putalpha(Image.fromarray(alpha_channel))
         
         logger.info(f"Applied wrinkle removal with strength: {strength}")
-        return result
\ No newline at end of file
+        return crop.embed(result) if crop else result
+    
+    async def aremove_wrinkles(self, image: Image.Image, strength: str = "medium",
+                               quality: float = 1.0, crop_to_content: bool = False) -> Image.Image:
+        """Async version of remove_wrinkles (runs in the image process pool)"""
+        from .process_pool import run_image_operation
+        return await run_image_operation(
+            "remove_wrinkles", image, strength=strength, quality=quality, crop_to_content=crop_to_content
+        )
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+AdGen Pipeline Artifact Store
+파이프라인 job 단위 중간 결과물 저장소
+
+노드 간 이미지를 GCS 재다운로드 없이 직접 전달:
+- 메모리 계층: 디코딩된 PIL 이미지 / 원본 bytes 보관
+- 디스크 계층: 메모리 한도 초과 시 오래된 항목을 임시 디렉토리로 spill
+- GCS 업로드는 백그라운드 실행 (내구성 + WebSocket result_url 용도)
+"""
+import io
+import asyncio
+import logging
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+from PIL import Image
+
+from config import settings
+from app.core.storage import get_storage
+from app.core.image_encoding import EncodingPolicy, encode_image
+
+logger = logging.getLogger(__name__)
+
+Artifact = Union[Image.Image, bytes]
+
+
+def _artifact_size(value: Artifact) -> int:
+    """메모리 사용량 추정 (bytes)"""
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return len(value)
+
+
+def _encode_artifact(value: Artifact, key: str, stage: Optional[str] = None,
+                     policy: Optional[EncodingPolicy] = None) -> bytes:
+    """artifact → bytes (이미지는 stage 인코딩 정책으로 인코딩, 기본 PNG / 스레드에서 호출 가능)"""
+    if isinstance(value, Image.Image):
+        if stage is None and policy is None:
+            buf = io.BytesIO()
+            value.save(buf, format="PNG")
+            return buf.getvalue()
+        return encode_image(value, stage or key, policy).data
+    return value
+
+
+class JobArtifactStore:
+    """job 하나의 중간 결과물 저장소 (memory → disk 2계층)"""
+
+    def __init__(self, job_id: str, memory_limit_bytes: int, spill_root: Optional[str] = None):
+        self.job_id = job_id
+        self.memory_limit_bytes = memory_limit_bytes
+        self._spill_root = spill_root
+        self._spill_dir: Optional[Path] = None
+
+        self._memory: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._memory_bytes = 0
+        self._spilling: dict[str, Artifact] = {}   # 디스크 기록 중 (기록이 끝날 때까지 메모리에서 조회)
+        self._spill_count = 0
+        self._disk: dict[str, tuple] = {}     # key → (path, kind, mode, size)
+        self._uploads: dict[str, asyncio.Task] = {}
+        self._upload_urls: dict[str, str] = {}
+        self._upload_owners: dict[str, tuple] = {}   # key → 결과를 만든 단계 (업로드 실패 시 되돌릴 대상)
+
+    # ===== 저장 / 조회 =====
+
+    def put(self, key: str, value: Artifact):
+        """이미지 또는 bytes 저장 (기존 값 대체)"""
+        self.discard(key)
+        self._memory[key] = value
+        self._memory_bytes += _artifact_size(value)
+        self._spill_if_needed()
+
+    def get(self, key: str) -> Optional[Artifact]:
+        """메모리 → 디스크 순으로 조회 (없으면 None)"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if key in self._spilling:
+            return self._spilling[key]
+        if key in self._disk:
+            return self._load_spilled(key)
+        return None
+
+    def get_image(self, key: str) -> Optional[Image.Image]:
+        value = self.get(key)
+        if isinstance(value, bytes):
+            return Image.open(io.BytesIO(value))
+        return value
+
+    def get_bytes(self, key: str, stage: Optional[str] = None,
+                  policy: Optional[EncodingPolicy] = None) -> Optional[bytes]:
+        """bytes로 조회 (이미지는 stage 인코딩 정책으로 인코딩, 기본 PNG)"""
+        value = self.get(key)
+        if value is None:
+            return None
+        return _encode_artifact(value, key, stage, policy)
+
+    def discard(self, key: str):
+        if key in self._memory:
+            self._memory_bytes -= _artifact_size(self._memory.pop(key))
+        self._spilling.pop(key, None)  # 진행 중인 기록은 완료 시 파일 삭제
+        if key in self._disk:
+            path = self._disk.pop(key)[0]
+            path.unlink(missing_ok=True)
+
+    async def load_image(self, key: str, fallback_url: Optional[str] = None) -> Image.Image:
+        """
+        저장소에서 이미지 로드, 없으면 URL에서 다운로드 후 저장
+        (다른 인스턴스에서 재개된 job 등 메모리에 없는 경우 대비)
+        """
+        image = self.get_image(key)
+        if image is not None:
+            return image
+        if not fallback_url:
+            raise KeyError(f"artifact '{key}' 가 없습니다 (job_id={self.job_id})")
+
+        # 다른 job에서 공유받은 artifact: 업로드가 끝나야 URL에서 읽을 수 있음
+        await self.wait_uploaded(key)
+
+        logger.info(f"[Artifacts] {key} 캐시 없음 → 다운로드: {fallback_url}")
+        data = await get_storage().get_url(fallback_url)
+        image = Image.open(io.BytesIO(data))
+        await asyncio.to_thread(image.load)
+        self.put(key, image)
+        return image
+
+    # ===== 디스크 spill =====
+
+    def _spill_if_needed(self):
+        # 가장 최근 항목은 다음 노드가 바로 사용하므로 메모리에 유지
+        while self._memory_bytes > self.memory_limit_bytes and len(self._memory) > 1:
+            key, value = self._memory.popitem(last=False)
+            self._memory_bytes -= _artifact_size(value)
+            self._spill(key, value)
+
+    def _spill(self, key: str, value: Artifact):
+        """
+        디스크 기록은 스레드에서 (이벤트 루프를 막지 않도록)
+        기록이 끝날 때까지는 _spilling에서 조회, 끝나면 _disk로 이동
+        """
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix=f"adgen_{self.job_id}_", dir=self._spill_root))
+        # 멀티 스타일 키("resort/fitted")는 평평한 파일명으로 (원래 키는 _disk에 유지)
+        # 같은 키가 기록 중에 다시 spill될 수 있으므로 순번을 붙여 파일을 구분
+        self._spill_count += 1
+        path = self._spill_dir / f"{self._spill_count}_{key.replace('/', '__')}"
+        if isinstance(value, Image.Image):
+            entry = (path, "image", value.mode, value.size)
+        else:
+            entry = (path, "bytes", None, None)
+
+        self._spilling[key] = value
+        task = asyncio.create_task(asyncio.to_thread(self._write_spill, path, value))
+        task.add_done_callback(lambda t: self._spilled(key, value, entry, t))
+
+    @staticmethod
+    def _write_spill(path: Path, value: Artifact):
+        # 이미지는 raw 픽셀 그대로 기록 (재인코딩 비용 없음)
+        path.write_bytes(value.tobytes() if isinstance(value, Image.Image) else value)
+
+    def _spilled(self, key: str, value: Artifact, entry: tuple, task: asyncio.Task):
+        path = entry[0]
+        if self._spilling.get(key) is not value:
+            # 기록 중에 교체 / 삭제 / 저장소 종료됨
+            if not task.cancelled() and task.exception() is None:
+                path.unlink(missing_ok=True)
+            return
+        if task.cancelled() or task.exception() is not None:
+            # 기록 실패: 메모리로 되돌림 (한도를 넘더라도 job은 계속)
+            error = "cancelled" if task.cancelled() else task.exception()
+            logger.warning(f"[Artifacts] {key} disk spill 실패, 메모리 유지: {error}")
+            del self._spilling[key]
+            self._memory[key] = value
+            self._memory.move_to_end(key, last=False)
+            self._memory_bytes += _artifact_size(value)
+            return
+        del self._spilling[key]
+        self._disk[key] = entry
+        logger.info(f"[Artifacts] {key} → disk spill ({path})")
+
+    def _load_spilled(self, key: str) -> Artifact:
+        path, kind, mode, size = self._disk[key]
+        data = path.read_bytes()
+        if kind == "image":
+            return Image.frombytes(mode, size, data)
+        return data
+
+    # ===== 백그라운드 업로드 =====
+
+    def upload_in_background(
+        self,
+        key: str,
+        destination_path: str,
+        content_type: str = "image/png",
+        on_uploaded: Optional[Callable[[str], Awaitable[None]]] = None,
+        stage: Optional[str] = None,
+        policy: Optional[EncodingPolicy] = None,
+        owner: Optional[tuple] = None,
+    ) -> str:
+        """
+        저장된 artifact를 GCS에 백그라운드 업로드
+
+        Args:
+            stage / policy: 이미지 인코딩 정책 (image_encoding 참고, 없으면 PNG)
+            owner: 결과를 만든 단계 (failed_uploads()로 반환)
+
+        Returns:
+            업로드 완료 후 사용될 공개 URL (경로로부터 즉시 결정됨)
+        """
+        storage = get_storage()
+        url = storage.public_url(destination_path)
+
+        async def _upload():
+            # 조회는 이벤트 루프에서 (저장소는 lock이 없음), 인코딩만 스레드에서
+            value = self.get(key)
+            if value is None:
+                raise KeyError(f"artifact '{key}' 가 없습니다 (job_id={self.job_id})")
+            data = await asyncio.to_thread(_encode_artifact, value, key, stage, policy)
+            await storage.put(destination_path, data, content_type=content_type)
+            if on_uploaded:
+                await on_uploaded(url)
+            return url
+
+        self._uploads[key] = asyncio.create_task(_upload())
+        self._upload_urls[key] = url
+        self._upload_owners[key] = owner
+        return url
+
+    # ===== 다른 job과 공유 (배치: 같은 콘텐츠의 스타일별 job) =====
+
+    def export_upload(self, key: str) -> tuple:
+        """
+        공유용 업로드 정보 내보내기 (디코딩된 값은 포함하지 않음)
+
+        Returns:
+            (업로드 task 또는 None, 업로드 URL 또는 None)
+        """
+        return self._uploads.get(key), self._upload_urls.get(key)
+
+    def adopt_upload(
+        self,
+        key: str,
+        upload: Optional[asyncio.Task],
+        url: Optional[str],
+        on_uploaded: Optional[Callable[[str], Awaitable[None]]] = None,
+        owner: Optional[tuple] = None,
+    ):
+        """
+        다른 job이 업로드 중인 artifact 사용 (재업로드 없이 원래 업로드 완료만 대기)
+        wait_uploaded / flush / load_image 는 원래 job의 업로드 task를 기다림
+        """
+        if upload is None:
+            return
+
+        async def _follow():
+            # 이 job이 취소되어도 원래 job의 업로드는 계속 진행
+            await asyncio.shield(upload)
+            if on_uploaded:
+                await on_uploaded(url)
+            return url
+
+        self._uploads[key] = asyncio.create_task(_follow())
+        self._upload_urls[key] = url
+        self._upload_owners[key] = owner
+
+    async def wait_uploaded(self, key: str) -> Optional[str]:
+        """특정 artifact 업로드 완료 대기 (외부 서비스가 URL로 접근하기 전)"""
+        task = self._uploads.get(key)
+        if task is None:
+            return None
+        return await task
+
+    async def flush(self):
+        """모든 백그라운드 업로드 완료 대기 (실패 시 예외 전파)"""
+        if self._uploads:
+            await asyncio.gather(*self._uploads.values())
+
+    def failed_uploads(self) -> list[tuple]:
+        """
+        실패한 업로드 목록 (flush 이후 호출)
+
+        Returns:
+            [(owner, 예외)] - owner는 upload_in_background / adopt_upload에 전달한 값
+        """
+        failed = []
+        for key, task in self._uploads.items():
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                failed.append((self._upload_owners.get(key), task.exception()))
+        return failed
+
+    def close(self):
+        """진행 중인 업로드 취소 및 spill 디렉토리 정리"""
+        for task in self._uploads.values():
+            if not task.done():
+                task.cancel()
+        self._memory.clear()
+        self._memory_bytes = 0
+        self._spilling.clear()
+        self._disk.clear()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+
+# ===== job별 저장소 레지스트리 =====
+_stores: dict[str, JobArtifactStore] = {}
+
+
+def get_artifact_store(job_id: str) -> JobArtifactStore:
+    """job의 artifact 저장소 (없으면 생성)"""
+    store = _stores.get(job_id)
+    if store is None:
+        store = JobArtifactStore(
+            job_id,
+            memory_limit_bytes=settings.ARTIFACT_MEMORY_LIMIT_MB * 1024 * 1024,
+            spill_root=settings.ARTIFACT_SPILL_DIR,
+        )
+        _stores[job_id] = store
+    return store
+
+
+def release_artifact_store(job_id: str):
+    """job 종료 시 저장소 해제"""
+    store = _stores.pop(job_id, None)
+    if store is not None:
+        store.close()
@@ -0,0 +1,129 @@
+"""
+AdGen Pipeline Batch
+여러 상품 × 여러 스타일 배치 실행 지원
+
+- 공유 단계: 스타일과 무관한 단계(select_image, remove_background)는
+  같은 배치의 같은 콘텐츠에 대해 인스턴스 내 1회만 실행하고 결과를 공유
+  (STEP_WRITES 값 + 업로드 URL만 공유, 디코딩된 이미지는 각 job이 URL에서 다시 로드)
+- 배치 진행 상황 집계 (status 조회 / WebSocket 스트림)
+"""
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from app.services.pipeline.state import PipelineState, STEP_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+# 배치 내 스타일별 job이 공유하는 단계 → 함께 넘겨줄 artifact 키
+SHARED_STEP_ARTIFACTS = {
+    "select_image": (),
+    "remove_background": ("removed_bg",),
+}
+
+
+class SharedStepRegistry:
+    """
+    (batch_id, content_id, 단계) 단위 single-flight
+    먼저 도착한 job(leader)이 실행하고, 나머지는 결과 future를 기다림
+    leader가 실패 / 취소되면 항목을 바로 제거 → 다음에 도착하는 job(재개 포함)이 새 leader
+    """
+
+    # 배치가 끝난 뒤 남은 항목 정리 기준 (초)
+    ENTRY_TTL_SECONDS = 3600
+
+    def __init__(self):
+        self._entries: dict[tuple, tuple[asyncio.Future, float]] = {}
+
+    def acquire(self, key: tuple) -> tuple[asyncio.Future, bool]:
+        """
+        Returns:
+            (결과 future, leader 여부)
+        """
+        self._prune()
+        entry = self._entries.get(key)
+        if entry is not None and not self._failed(entry[0]):
+            return entry[0], False
+
+        future = asyncio.get_running_loop().create_future()
+        # 기다리는 job이 없어도 "exception never retrieved" 경고가 나지 않도록
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._entries[key] = (future, time.monotonic())
+        return future, True
+
+    def release(self, key: tuple, future: asyncio.Future):
+        """leader 실패 / 취소: 항목 제거 (실패 결과를 다시 쓰지 않도록)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is future:
+            del self._entries[key]
+
+    @staticmethod
+    def _failed(future: asyncio.Future) -> bool:
+        return future.done() and (future.cancelled() or future.exception() is not None)
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            key for key, (future, created) in self._entries.items()
+            if future.done() and now - created > self.ENTRY_TTL_SECONDS
+        ]
+        for key in expired:
+            del self._entries[key]
+
+
+# 싱글톤
+_shared_steps: Optional[SharedStepRegistry] = None
+
+def get_shared_step_registry() -> SharedStepRegistry:
+    global _shared_steps
+    if _shared_steps is None:
+        _shared_steps = SharedStepRegistry()
+    return _shared_steps
+
+
+# ===== 배치 진행 상황 집계 =====
+
+def summarize_batch(batch_id: str, states: list[PipelineState]) -> dict:
+    """배치 job 상태 목록 → 집계 (status 응답 / WebSocket 메시지)"""
+    counts = {"pending": 0, "running": 0, "success": 0, "failed": 0}
+    jobs = []
+    for state in states:
+        counts[state["status"]] = counts.get(state["status"], 0) + 1
+        jobs.append({
+            "job_id": state["job_id"],
+            "content_id": state["content_id"],
+            "style": state["style"],
+            "status": state["status"],
+            "current_step": state["current_step"],
+            "completed_steps": sum(
+                1 for name in STEP_NAMES.values()
+                if state["steps"][name]["status"] == "success"
+            ),
+            "error": state.get("error"),
+            "final_image_url": state.get("final_image_url"),
+            "updated_at": state.get("updated_at"),
+        })
+
+    total = len(states)
+    done = counts["success"] + counts["failed"]
+    if total and done == total:
+        status = "failed" if counts["success"] == 0 else "success"
+    elif counts["running"] or done:
+        status = "running"
+    else:
+        status = "pending"
+
+    return {
+        "type": "batch",
+        "batch_id": batch_id,
+        "status": status,
+        "total": total,
+        "counts": counts,
+        "progress": round(
+            sum(job["completed_steps"] for job in jobs) / (total * len(STEP_NAMES)), 3
+        ) if total else 0.0,
+        "jobs": jobs,
+        "updated_at": max((job["updated_at"] or "" for job in jobs), default=None),
+    }
@@ -1,11 +1,25 @@
 """
 AdGen Pipeline Graph
 LangGraph StateGraph 정의
+
+- 단일 스타일: 전체 단계를 하나의 그래프로 실행
+- 멀티 스타일: 스타일과 무관한 공통 단계를 1회 실행한 뒤 스타일별 분기 그래프를 병렬 실행
 """
+import asyncio
+import logging
+from datetime import datetime
 from typing import Literal
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 
-from app.services.pipeline.state import PipelineState
+from app.services.pipeline.state import (
+    PipelineState,
+    STEP_NAMES,
+    STEP_READS,
+    STEP_WRITES,
+    BRANCH_KEYS,
+    aggregate_branch_steps,
+    create_branch_state,
+)
 from app.services.pipeline.nodes import (
     node_select_image,
     node_remove_background,
@@ -16,6 +30,20 @@ from app.services.pipeline.nodes import (
     node_save_image,
 )
 
+logger = logging.getLogger(__name__)
+
+
+# ===== 단계 이름 → 노드 함수 =====
+NODE_FUNCTIONS = {
+    "select_image": node_select_image,
+    "remove_background": node_remove_background,
+    "virtual_fitting": node_virtual_fitting,
+    "generate_background": node_generate_background,
+    "generate_caption": node_generate_caption,
+    "generate_html": node_generate_html,
+    "save_image": node_save_image,
+}
+
 
 def should_continue(state: PipelineState) -> Literal["continue", "stop"]:
     """
@@ -27,72 +55,234 @@ def should_continue(state: PipelineState) -> Literal["continue", "stop"]:
     return "continue"
 
 
+def resolve_step_dependencies() -> dict[str, set[str]]:
+    """
+    STEP_READS / STEP_WRITES 선언으로부터 단계 간 의존 관계 계산
+
+    단계 B가 읽는 키를 단계 A가 기록하면 B는 A에 의존함.
+    이미 다른 의존 단계를 통해 간접적으로 보장되는 의존은 제거 (transitive reduction)
+
+    Returns:
+        {단계 이름: 직접 선행 단계 집합}
+    """
+    producers = {}
+    for step, keys in STEP_WRITES.items():
+        for key in keys:
+            if key in producers:
+                raise ValueError(f"'{key}' 키를 여러 단계가 기록합니다: {producers[key]}, {step}")
+            producers[key] = step
+
+    direct = {
+        step: {producers[key] for key in STEP_READS[step] if producers.get(key, step) != step}
+        for step in STEP_NAMES.values()
+    }
+
+    ancestors: dict[str, set[str]] = {}
+
+    def _ancestors(step: str, visiting: tuple = ()) -> set[str]:
+        if step in visiting:
+            raise ValueError(f"단계 의존 관계에 순환이 있습니다: {' → '.join(visiting + (step,))}")
+        if step not in ancestors:
+            found = set()
+            for dep in direct[step]:
+                found |= {dep} | _ancestors(dep, visiting + (step,))
+            ancestors[step] = found
+        return ancestors[step]
+
+    reduced = {}
+    for step, deps in direct.items():
+        indirect = set()
+        for dep in deps:
+            indirect |= _ancestors(dep)
+        reduced[step] = deps - indirect
+    return reduced
+
+
+def split_style_steps() -> tuple[list[str], list[str]]:
+    """
+    단계를 스타일 무관 공통 단계 / 스타일별 분기 단계로 분리
+    "style"을 읽거나 분기 단계에 의존하는 단계는 분기 단계
+
+    Returns:
+        (공통 단계 목록, 분기 단계 목록) - 각각 STEP_NAMES 순서
+    """
+    dependencies = resolve_step_dependencies()
+    order = list(STEP_NAMES.values())
+
+    styled = {step for step in order if "style" in STEP_READS[step]}
+    changed = True
+    while changed:
+        changed = False
+        for step in order:
+            if step not in styled and dependencies[step] & styled:
+                styled.add(step)
+                changed = True
+
+    return [s for s in order if s not in styled], [s for s in order if s in styled]
+
+
+def _make_router(successors: list[str]):
+    """should_continue 결과에 따라 후속 단계(병렬 가능) 또는 END로 분기"""
+    def _route(state: PipelineState):
+        if should_continue(state) == "stop" or not successors:
+            return END
+        return successors
+    return _route
+
+
+def _add_steps(graph: StateGraph, steps: list[str], exit_node: str = END):
+    """
+    steps 단계를 의존 관계대로 연결
+    steps 밖의 선행 단계는 이미 완료된 것으로 보고, 마지막 단계들이 끝나면 exit_node로 진행
+    """
+    resolved = resolve_step_dependencies()
+    dependencies = {step: resolved[step] & set(steps) for step in steps}
+    sinks = [s for s in steps if all(s not in dependencies[other] for other in steps)]
+
+    # ===== 노드 등록 =====
+    for step in steps:
+        graph.add_node(step, NODE_FUNCTIONS[step])
+
+    # ===== 진입점 (선행 단계가 없는 노드) =====
+    for step in steps:
+        if not dependencies[step]:
+            graph.add_edge(START, step)
+
+    # ===== 조건부 엣지 (실패 시 END) =====
+    for step in steps:
+        successors = [s for s in steps if dependencies[s] == {step}]
+        if step in sinks and exit_node != END and len(sinks) == 1:
+            successors = [exit_node]
+        graph.add_conditional_edges(step, _make_router(successors), successors + [END])
+
+    # ===== join 엣지 (모든 선행 단계 완료 대기) =====
+    for step in steps:
+        if len(dependencies[step]) > 1:
+            graph.add_edge(sorted(dependencies[step]), step)
+    if exit_node != END and len(sinks) > 1:
+        graph.add_edge(sorted(sinks), exit_node)
+
+
 def build_pipeline_graph() -> StateGraph:
     """
     AdGen 파이프라인 그래프 생성
 
-    흐름:
-    select_image → remove_background → virtual_fitting
-    → generate_background → generate_caption
-    → generate_html → save_image → END
+    각 단계가 선언한 입출력(STEP_READS / STEP_WRITES)으로 의존 관계를 계산하여 구성.
+    현재 선언 기준 흐름:
 
-    각 노드 사이: 실패 감지 조건부 엣지
+    select_image ─┬→ remove_background → virtual_fitting → generate_background ─┬→ generate_html → save_image → END
+                  └→ generate_caption ──────────────────────────────────────────┘
+
+    - 의존 단계가 하나인 노드: 조건부 엣지 (실패 시 END)
+    - 의존 단계가 여럿인 노드 (join): 모든 선행 단계 완료 후 실행,
+      다른 분기가 실패했다면 노드 진입 시 실행하지 않고 END로 종료
     """
     graph = StateGraph(PipelineState)
+    _add_steps(graph, list(STEP_NAMES.values()))
+    return graph.compile()
 
-    # ===== 노드 등록 =====
-    graph.add_node("select_image", node_select_image)
-    graph.add_node("remove_background", node_remove_background)
-    graph.add_node("virtual_fitting", node_virtual_fitting)
-    graph.add_node("generate_background", node_generate_background)
-    graph.add_node("generate_caption", node_generate_caption)
-    graph.add_node("generate_html", node_generate_html)
-    graph.add_node("save_image", node_save_image)
 
-    # ===== 진입점 =====
-    graph.set_entry_point("select_image")
+# ===== 멀티 스타일 =====
 
-    # ===== 조건부 엣지 (실패 시 END) =====
-    graph.add_conditional_edges(
-        "select_image",
-        should_continue,
-        {"continue": "remove_background", "stop": END},
-    )
-    graph.add_conditional_edges(
-        "remove_background",
-        should_continue,
-        {"continue": "virtual_fitting", "stop": END},
-    )
-    graph.add_conditional_edges(
-        "virtual_fitting",
-        should_continue,
-        {"continue": "generate_background", "stop": END},
-    )
-    graph.add_conditional_edges(
-        "generate_background",
-        should_continue,
-        {"continue": "generate_caption", "stop": END},
-    )
-    graph.add_conditional_edges(
-        "generate_caption",
-        should_continue,
-        {"continue": "generate_html", "stop": END},
-    )
-    graph.add_conditional_edges(
-        "generate_html",
-        should_continue,
-        {"continue": "save_image", "stop": END},
+def build_branch_graph() -> StateGraph:
+    """스타일별 분기 그래프 (virtual_fitting 이후 단계)"""
+    graph = StateGraph(PipelineState)
+    _add_steps(graph, split_style_steps()[1])
+    return graph.compile()
+
+
+def _branch_summary(state: PipelineState, branch_steps: list[str]) -> dict:
+    """분기 최종 상태 → branches[style]에 보관할 키"""
+    keys = BRANCH_KEYS + tuple(key for step in branch_steps for key in STEP_WRITES[step])
+    summary = {key: state.get(key) for key in keys}
+    summary["steps"] = {name: state["steps"][name] for name in branch_steps}
+    if summary["status"] != "failed":
+        summary["status"] = "success"
+    return summary
+
+
+async def node_style_branches(state: PipelineState) -> dict:
+    """
+    공통 단계 완료 후 스타일별 분기 그래프를 병렬 실행
+    이미 성공한 분기(재개 시)는 건너뜀
+    """
+    if state["status"] == "failed":
+        logger.info("[Branch] 스타일 분기 건너뜀 (공통 단계 실패)")
+        return {}
+
+    branch_steps = split_style_steps()[1]
+    previous = state.get("branches") or {}
+    styles = [
+        style for style in state["styles"]
+        if (previous.get(style) or {}).get("status") != "success"
+    ]
+    logger.info(f"[Branch] 스타일 분기 실행: {styles}")
+
+    graph = get_branch_graph()
+    results = await asyncio.gather(
+        *(graph.ainvoke(create_branch_state(state, style, branch_steps)) for style in styles),
+        return_exceptions=True,
     )
-    graph.add_edge("save_image", END)
 
+    branches = {}
+    update = {"updated_at": datetime.utcnow().isoformat()}
+    for style, result in zip(styles, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, BaseException):
+            logger.error(f"[Branch] {style} 분기 오류: {result}", exc_info=result)
+            branch_state = create_branch_state(state, style, branch_steps)
+            branch_state["status"] = "failed"
+            branch_state["error"] = str(result)
+            result = branch_state
+        branches[style] = _branch_summary(result, branch_steps)
+
+        if branches[style]["status"] == "failed" and update.get("status") != "failed":
+            update["status"] = "failed"
+            update["error"] = f"[{style}] {branches[style]['error']}"
+            update["error_step"] = branches[style]["error_step"]
+
+    merged = {**state, "branches": {**previous, **branches}}
+    update["branches"] = branches
+    update["steps"] = {name: step for name, step in aggregate_branch_steps(merged).items() if name in branch_steps}
+    update["current_step"] = max((b.get("current_step") or 0) for b in merged["branches"].values())
+    return update
+
+
+def build_multi_style_graph() -> StateGraph:
+    """
+    멀티 스타일 파이프라인 그래프
+
+    select_image → remove_background → style_branches ─┬→ [resort]   virtual_fitting → ... → save_image
+                                                       ├→ [retro]    virtual_fitting → ... → save_image
+                                                       └→ [romantic] virtual_fitting → ... → save_image
+    """
+    graph = StateGraph(PipelineState)
+    _add_steps(graph, split_style_steps()[0], exit_node="style_branches")
+    graph.add_node("style_branches", node_style_branches)
+    graph.add_edge("style_branches", END)
     return graph.compile()
 
 
 # 싱글톤
 _pipeline_graph = None
+_branch_graph = None
+_multi_style_graph = None
 
-def get_pipeline_graph():
-    global _pipeline_graph
+def get_pipeline_graph(multi_style: bool = False):
+    """multi_style: 스타일 여러 개를 하나의 job으로 실행"""
+    global _pipeline_graph, _multi_style_graph
+    if multi_style:
+        if _multi_style_graph is None:
+            _multi_style_graph = build_multi_style_graph()
+        return _multi_style_graph
     if _pipeline_graph is None:
         _pipeline_graph = build_pipeline_graph()
     return _pipeline_graph
+
+
+def get_branch_graph():
+    global _branch_graph
+    if _branch_graph is None:
+        _branch_graph = build_branch_graph()
+    return _branch_graph
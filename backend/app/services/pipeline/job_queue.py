@@ -0,0 +1,449 @@
+"""
+AdGen Pipeline Job Queue
+파이프라인 job 대기열 + 공유 상태 저장소
+
+- SQLJobQueue: pipeline_jobs 테이블 기반 (여러 Cloud Run 인스턴스가 공유)
+- InMemoryJobQueue: 단일 프로세스용 (로컬 개발 / 테스트)
+
+워커는 claim 시 lease를 획득하고 heartbeat로 연장함.
+인스턴스가 종료되어 lease가 만료되면 다른 워커가 다시 claim함 (최대 PIPELINE_MAX_ATTEMPTS회)
+save_state / finish 는 lease를 가진 워커만 반영됨 (소유권을 잃은 워커의 쓰기는 무시)
+"""
+import copy
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, and_
+
+from config import settings
+from app.services.pipeline.state import PipelineState
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _fail_state(state: PipelineState, error: str) -> PipelineState:
+    """재시도 한도 초과 등 큐 단에서 job을 실패 처리"""
+    state = dict(state)
+    state["status"] = "failed"
+    state["error"] = state.get("error") or error
+    state["updated_at"] = _utcnow().replace(tzinfo=None).isoformat()
+    return PipelineState(**state)
+
+
+# ===== 추상 클래스 =====
+
+class JobQueueBackend(ABC):
+    """파이프라인 job 큐 인터페이스"""
+
+    def __init__(self, max_attempts: int):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    async def enqueue(self, state: PipelineState):
+        """초기 상태로 job 등록 (queued)"""
+
+    async def enqueue_many(self, states: list[PipelineState]):
+        """여러 job 등록 (배치 요청)"""
+        for state in states:
+            await self.enqueue(state)
+
+    @abstractmethod
+    async def claim(self, worker_id: str, lease_seconds: int) -> Optional[PipelineState]:
+        """
+        실행할 job 하나를 가져와 lease 획득
+        대기 중인 job 또는 lease가 만료된 running job 대상 (없으면 None)
+        """
+
+    @abstractmethod
+    async def heartbeat(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        """lease 연장 (소유권을 잃었으면 False)"""
+
+    @abstractmethod
+    async def save_state(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        """
+        실행 중 상태 저장 (status 조회 / 다른 인스턴스 WebSocket 용)
+        worker_id가 lease를 가진 running job일 때만 반영 (아니면 False)
+        """
+
+    @abstractmethod
+    async def finish(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        """최종 상태 저장 후 job 종료 (done), lease를 잃었으면 반영하지 않고 False"""
+
+    @abstractmethod
+    async def requeue(self, job_id: str, worker_id: str):
+        """실행 중단된 job을 즉시 대기열로 반환 (인스턴스 종료 시)"""
+
+    @abstractmethod
+    async def resubmit(self, state: PipelineState) -> bool:
+        """
+        종료된(done) job을 재개 상태로 다시 대기열에 등록 (재시도 횟수 초기화)
+        이미 대기 / 실행 중이면 False (동시 재개 요청이 job을 두 번 등록하지 않도록)
+        """
+
+    @abstractmethod
+    async def get_state(self, job_id: str) -> Optional[PipelineState]:
+        """현재 상태 조회 (없으면 None)"""
+
+    @abstractmethod
+    async def get_batch_states(self, batch_id: str) -> list[PipelineState]:
+        """배치에 속한 모든 job 상태 (등록 순서)"""
+
+    @abstractmethod
+    async def pending_count(self) -> int:
+        """대기 중인 job 수"""
+
+
+# ===== SQL 테이블 백엔드 =====
+
+class SQLJobQueue(JobQueueBackend):
+    """
+    pipeline_jobs 테이블 기반 큐
+    claim은 조건부 UPDATE (queue_status/attempts가 조회 시점과 같을 때만)로 중복 실행 방지
+    """
+
+    # 한 번의 claim에서 검사할 후보 수 (다른 워커와 경합 시 다음 후보 시도)
+    CLAIM_CANDIDATES = 5
+
+    @staticmethod
+    def _claimable(now: datetime):
+        from app.models.pipeline_job import PipelineJob
+
+        return or_(
+            PipelineJob.queue_status == "queued",
+            and_(
+                PipelineJob.queue_status == "running",
+                PipelineJob.lease_expires_at < now,
+            ),
+        )
+
+    def _enqueue_sync(self, states: list[PipelineState]):
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            for state in states:
+                db.add(PipelineJob(
+                    job_id=state["job_id"],
+                    user_id=state["user_id"],
+                    content_id=state["content_id"],
+                    batch_id=state.get("batch_id"),
+                    queue_status="queued",
+                    attempts=0,
+                    state=state,
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim_sync(self, worker_id: str, lease_seconds: int) -> Optional[PipelineState]:
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            now = _utcnow()
+            candidates = db.query(PipelineJob.job_id, PipelineJob.attempts).filter(
+                self._claimable(now)
+            ).order_by(PipelineJob.created_at).limit(self.CLAIM_CANDIDATES).all()
+
+            for job_id, attempts in candidates:
+                target = db.query(PipelineJob).filter(
+                    PipelineJob.job_id == job_id,
+                    PipelineJob.attempts == attempts,
+                    self._claimable(now),
+                )
+
+                # 재시도 한도 초과 → 실패 처리
+                if attempts >= self.max_attempts:
+                    job = db.query(PipelineJob).filter(PipelineJob.job_id == job_id).first()
+                    updated = target.update({
+                        "queue_status": "done",
+                        "state": _fail_state(job.state, "최대 재시도 횟수를 초과했습니다."),
+                        "finished_at": now,
+                    }, synchronize_session=False)
+                    db.commit()
+                    if updated:
+                        logger.warning(f"[Queue] 재시도 한도 초과로 실패 처리: job_id={job_id}")
+                    continue
+
+                claimed = target.update({
+                    "queue_status": "running",
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "attempts": attempts + 1,
+                    "started_at": now,
+                }, synchronize_session=False)
+                db.commit()
+
+                if claimed == 1:
+                    job = db.query(PipelineJob).filter(PipelineJob.job_id == job_id).first()
+                    return PipelineState(**job.state)
+
+            return None
+        finally:
+            db.close()
+
+    def _heartbeat_sync(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            updated = db.query(PipelineJob).filter(
+                PipelineJob.job_id == job_id,
+                PipelineJob.worker_id == worker_id,
+                PipelineJob.queue_status == "running",
+            ).update({
+                "lease_expires_at": _utcnow() + timedelta(seconds=lease_seconds),
+            }, synchronize_session=False)
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+    def _update_sync(self, job_id: str, values: dict, worker_id: Optional[str] = None,
+                     queue_status: Optional[str] = None) -> int:
+        """조건부 UPDATE (worker_id / queue_status가 일치하는 행만), 반영된 행 수 반환"""
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            query = db.query(PipelineJob).filter(PipelineJob.job_id == job_id)
+            if worker_id is not None:
+                query = query.filter(PipelineJob.worker_id == worker_id)
+            if queue_status is not None:
+                query = query.filter(PipelineJob.queue_status == queue_status)
+            updated = query.update(values, synchronize_session=False)
+            db.commit()
+            return updated
+        finally:
+            db.close()
+
+    def _get_state_sync(self, job_id: str) -> Optional[PipelineState]:
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            job = db.query(PipelineJob).filter(PipelineJob.job_id == job_id).first()
+            return PipelineState(**job.state) if job else None
+        finally:
+            db.close()
+
+    def _get_batch_states_sync(self, batch_id: str) -> list[PipelineState]:
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            rows = db.query(PipelineJob.state).filter(
+                PipelineJob.batch_id == batch_id
+            ).order_by(PipelineJob.created_at, PipelineJob.job_id).all()
+            return [PipelineState(**row.state) for row in rows]
+        finally:
+            db.close()
+
+    def _pending_count_sync(self) -> int:
+        from app.db.base import SessionLocal
+        from app.models.pipeline_job import PipelineJob
+
+        db = SessionLocal()
+        try:
+            return db.query(PipelineJob).filter(PipelineJob.queue_status == "queued").count()
+        finally:
+            db.close()
+
+    # 세션이 동기식이므로 모든 DB 작업은 스레드에서 실행
+
+    async def enqueue(self, state: PipelineState):
+        await asyncio.to_thread(self._enqueue_sync, [state])
+
+    async def enqueue_many(self, states: list[PipelineState]):
+        # 한 트랜잭션으로 등록
+        await asyncio.to_thread(self._enqueue_sync, states)
+
+    async def claim(self, worker_id: str, lease_seconds: int) -> Optional[PipelineState]:
+        return await asyncio.to_thread(self._claim_sync, worker_id, lease_seconds)
+
+    async def heartbeat(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        return await asyncio.to_thread(self._heartbeat_sync, job_id, worker_id, lease_seconds)
+
+    async def save_state(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        updated = await asyncio.to_thread(
+            self._update_sync, job_id, {"state": state}, worker_id, "running"
+        )
+        return updated == 1
+
+    async def finish(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        updated = await asyncio.to_thread(self._update_sync, job_id, {
+            "queue_status": "done",
+            "state": state,
+            "lease_expires_at": None,
+            "finished_at": _utcnow(),
+        }, worker_id, "running")
+        return updated == 1
+
+    async def requeue(self, job_id: str, worker_id: str):
+        await asyncio.to_thread(self._update_sync, job_id, {
+            "queue_status": "queued",
+            "worker_id": None,
+            "lease_expires_at": None,
+        }, worker_id)
+
+    async def resubmit(self, state: PipelineState) -> bool:
+        updated = await asyncio.to_thread(self._update_sync, state["job_id"], {
+            "queue_status": "queued",
+            "worker_id": None,
+            "lease_expires_at": None,
+            "attempts": 0,
+            "state": state,
+            "finished_at": None,
+        }, None, "done")
+        return updated == 1
+
+    async def get_state(self, job_id: str) -> Optional[PipelineState]:
+        return await asyncio.to_thread(self._get_state_sync, job_id)
+
+    async def get_batch_states(self, batch_id: str) -> list[PipelineState]:
+        return await asyncio.to_thread(self._get_batch_states_sync, batch_id)
+
+    async def pending_count(self) -> int:
+        return await asyncio.to_thread(self._pending_count_sync)
+
+
+# ===== 인메모리 백엔드 (단일 프로세스) =====
+
+class InMemoryJobQueue(JobQueueBackend):
+    """
+    프로세스 내부 큐 (로컬 개발 / 테스트용)
+    SQLJobQueue와 동일한 claim / lease 규칙, 인스턴스 간 공유는 되지 않음
+    """
+
+    def __init__(self, max_attempts: int):
+        super().__init__(max_attempts)
+        self._jobs: dict[str, dict] = {}    # 등록 순서 유지
+
+    def _claimable(self, job: dict, now: datetime) -> bool:
+        if job["queue_status"] == "queued":
+            return True
+        return job["queue_status"] == "running" and job["lease_expires_at"] < now
+
+    async def enqueue(self, state: PipelineState):
+        self._jobs[state["job_id"]] = {
+            "queue_status": "queued",
+            "worker_id": None,
+            "lease_expires_at": None,
+            "attempts": 0,
+            "state": copy.deepcopy(state),
+        }
+
+    async def claim(self, worker_id: str, lease_seconds: int) -> Optional[PipelineState]:
+        now = _utcnow()
+        for job_id, job in self._jobs.items():
+            if not self._claimable(job, now):
+                continue
+            if job["attempts"] >= self.max_attempts:
+                job["queue_status"] = "done"
+                job["state"] = _fail_state(job["state"], "최대 재시도 횟수를 초과했습니다.")
+                continue
+            job["queue_status"] = "running"
+            job["worker_id"] = worker_id
+            job["lease_expires_at"] = now + timedelta(seconds=lease_seconds)
+            job["attempts"] += 1
+            return copy.deepcopy(job["state"])
+        return None
+
+    async def heartbeat(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return False
+        job["lease_expires_at"] = _utcnow() + timedelta(seconds=lease_seconds)
+        return True
+
+    def _owned(self, job_id: str, worker_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if not job or job["worker_id"] != worker_id or job["queue_status"] != "running":
+            return None
+        return job
+
+    async def save_state(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return False
+        job["state"] = copy.deepcopy(state)
+        return True
+
+    async def finish(self, job_id: str, state: PipelineState, worker_id: str) -> bool:
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return False
+        job["queue_status"] = "done"
+        job["lease_expires_at"] = None
+        job["state"] = copy.deepcopy(state)
+        return True
+
+    async def requeue(self, job_id: str, worker_id: str):
+        job = self._jobs.get(job_id)
+        if job and job["worker_id"] == worker_id:
+            job["queue_status"] = "queued"
+            job["worker_id"] = None
+            job["lease_expires_at"] = None
+
+    async def resubmit(self, state: PipelineState) -> bool:
+        job = self._jobs.get(state["job_id"])
+        if job is None or job["queue_status"] != "done":
+            return False
+        # 대기열 맨 뒤로 이동
+        del self._jobs[state["job_id"]]
+        job.update({
+            "queue_status": "queued",
+            "worker_id": None,
+            "lease_expires_at": None,
+            "attempts": 0,
+            "state": copy.deepcopy(state),
+        })
+        self._jobs[state["job_id"]] = job
+        return True
+
+    async def get_state(self, job_id: str) -> Optional[PipelineState]:
+        job = self._jobs.get(job_id)
+        return copy.deepcopy(job["state"]) if job else None
+
+    async def get_batch_states(self, batch_id: str) -> list[PipelineState]:
+        return [
+            copy.deepcopy(job["state"]) for job in self._jobs.values()
+            if job["state"].get("batch_id") == batch_id
+        ]
+
+    async def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["queue_status"] == "queued")
+
+
+# ===== 백엔드 선택 =====
+QUEUE_BACKENDS = {
+    "sql": SQLJobQueue,
+    "memory": InMemoryJobQueue,
+}
+
+# 싱글톤
+_job_queue: Optional[JobQueueBackend] = None
+
+def get_job_queue() -> JobQueueBackend:
+    """설정(PIPELINE_QUEUE_BACKEND)에 따른 job 큐 싱글톤"""
+    global _job_queue
+    if _job_queue is None:
+        backend = settings.PIPELINE_QUEUE_BACKEND
+        if backend not in QUEUE_BACKENDS:
+            raise ValueError(f"지원하지 않는 큐 백엔드: {backend} (선택 가능: {list(QUEUE_BACKENDS)})")
+        _job_queue = QUEUE_BACKENDS[backend](max_attempts=settings.PIPELINE_MAX_ATTEMPTS)
+        logger.info(f"✅ Pipeline job 큐 초기화: {backend}")
+    return _job_queue
@@ -4,13 +4,20 @@ AdGen Pipeline Nodes
 pre_check → 실행 → post_check → WebSocket 상태 전송
 """
 import uuid
+import asyncio
 import logging
 from datetime import datetime
-from typing import Callable, Optional
+from typing import Awaitable, Callable, Optional
 
-from app.services.pipeline.state import PipelineState, STEP_NAMES
+from app.services.pipeline.state import PipelineState, STEP_NAMES, STEP_WRITES, PROGRESS_KEYS
 from app.services.pipeline.validators import PRE_CHECKS, POST_CHECKS
+from app.services.pipeline.artifacts import get_artifact_store
+from app.services.pipeline.batch import SHARED_STEP_ARTIFACTS, get_shared_step_registry
+from app.services.pipeline.result_cache import get_result_cache, image_fingerprint, make_cache_key
+from app.core.image_encoding import resolve_policy
+from app.core.metrics import begin_step_recording, current_step_elapsed, observe_step, provider_call
 from app.utils.style_matcher import auto_match_style
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +30,15 @@ def set_ws_broadcast(fn: Callable):
     global _ws_broadcast
     _ws_broadcast = fn
 
-async def _broadcast(job_id: str, state: PipelineState):
-    """현재 상태를 WebSocket으로 전송"""
+async def _broadcast(job_id: str, update: dict, branch: Optional[str] = None):
+    """
+    노드 부분 업데이트를 WebSocket으로 전송 (수신 측에서 병합)
+    멀티 스타일 분기 노드의 업데이트는 branches[스타일] 아래로 전달
+    """
+    if branch:
+        update = {"branches": {branch: update}, "updated_at": update.get("updated_at") or _now()}
     if _ws_broadcast:
-        await _ws_broadcast(job_id, state)
+        await _ws_broadcast(job_id, update)
 
 
 # ===== 노드 래퍼 =====
@@ -34,13 +46,58 @@ async def _broadcast(job_id: str, state: PipelineState):
 def _now() -> str:
     return datetime.utcnow().isoformat()
 
+
+def _working_copy(state: PipelineState) -> PipelineState:
+    """노드 전용 작업 사본 (병렬 분기끼리 steps dict 공유 방지)"""
+    copied = dict(state)
+    copied["steps"] = {name: dict(step) for name, step in state["steps"].items()}
+    return copied
+
+
+def _record_timing(state: PipelineState, step_name: str, status: str, elapsed: float, calls: list):
+    """단계 소요 시간 + provider 호출 기록을 상태에 저장하고 메트릭으로 내보냄"""
+    state["steps"][step_name]["duration_ms"] = round(elapsed * 1000, 1)
+    state["steps"][step_name]["provider_calls"] = calls
+    observe_step(step_name, status, elapsed)
+
+
+def _history_seconds(state: PipelineState, *step_names: str) -> float:
+    """히스토리 processing_time: 선행 단계 소요 시간 합 + 현재 단계 경과 시간 (Numeric(5,2) 범위)"""
+    total = current_step_elapsed()
+    for name in step_names:
+        total += (state["steps"][name].get("duration_ms") or 0) / 1000
+    return round(min(total, 999.99), 2)
+
+
+def _node_update(state: PipelineState, step_name: str) -> dict:
+    """
+    노드가 기록한 키만 추출한 부분 업데이트
+    STEP_WRITES에 선언된 키 + 진행 상태 + 자기 단계 상태
+    """
+    update = {key: state.get(key) for key in STEP_WRITES[step_name] + PROGRESS_KEYS}
+    update["steps"] = {step_name: state["steps"][step_name]}
+    return update
+
+
 async def _run_node(
     state: PipelineState,
     step_num: int,
     execute_fn: Callable,
-) -> PipelineState:
+) -> dict:
     step_name = STEP_NAMES[step_num]
 
+    # join 노드: 다른 분기가 이미 실패했다면 실행하지 않음
+    if state["status"] == "failed":
+        logger.info(f"[Node {step_num}] - {step_name} 건너뜀 (선행 분기 실패)")
+        return {}
+
+    # 재개된 job: 체크포인트에 성공으로 기록된 단계는 결과를 재사용
+    if state["steps"][step_name]["status"] == "success":
+        logger.info(f"[Node {step_num}] - {step_name} 건너뜀 (체크포인트 재사용)")
+        return {}
+
+    state = _working_copy(state)
+
     # pre_check
     pre_check = PRE_CHECKS.get(step_name)
     if pre_check:
@@ -52,9 +109,9 @@ async def _run_node(
             state["error"] = err
             state["error_step"] = step_num
             state["updated_at"] = _now()
-            await _broadcast(state["job_id"], state)
+            await _broadcast(state["job_id"], _node_update(state, step_name), state.get("branch"))
             logger.error(f"[Node {step_num}] pre_check 실패: {err}")
-            return state
+            return _node_update(state, step_name)
 
     # 실행 중 상태
     state["current_step"] = step_num
@@ -62,11 +119,12 @@ async def _run_node(
     state["steps"][step_name]["status"] = "running"
     state["steps"][step_name]["started_at"] = _now()
     state["updated_at"] = _now()
-    await _broadcast(state["job_id"], state)
+    await _broadcast(state["job_id"], _node_update(state, step_name), state.get("branch"))
 
-    # ⭐ 시작 시간 기록
+    # ⭐ 시작 시간 기록 + provider 호출 기록 시작
     import time
     start_time = time.time()
+    calls = begin_step_recording()
     logger.info(f"[Node {step_num}] ▶ {step_name} 시작")
 
     try:
@@ -74,6 +132,7 @@ async def _run_node(
     except Exception as e:
         elapsed = time.time() - start_time
         err = str(e)
+        _record_timing(state, step_name, "failed", elapsed, calls)
         state["steps"][step_name]["status"] = "failed"
         state["steps"][step_name]["error"] = err
         state["steps"][step_name]["completed_at"] = _now()
@@ -81,9 +140,9 @@ async def _run_node(
         state["error"] = err
         state["error_step"] = step_num
         state["updated_at"] = _now()
-        await _broadcast(state["job_id"], state)
+        await _broadcast(state["job_id"], _node_update(state, step_name), state.get("branch"))
         logger.error(f"[Node {step_num}] ✗ {step_name} 실패 ({elapsed:.1f}s): {e}", exc_info=True)
-        return state
+        return _node_update(state, step_name)
 
     # post_check
     post_check = POST_CHECKS.get(step_name)
@@ -91,6 +150,7 @@ async def _run_node(
         ok, err = post_check(state)
         if not ok:
             elapsed = time.time() - start_time
+            _record_timing(state, step_name, "failed", elapsed, calls)
             state["steps"][step_name]["status"] = "failed"
             state["steps"][step_name]["error"] = err
             state["steps"][step_name]["completed_at"] = _now()
@@ -98,22 +158,137 @@ async def _run_node(
             state["error"] = err
             state["error_step"] = step_num
             state["updated_at"] = _now()
-            await _broadcast(state["job_id"], state)
+            await _broadcast(state["job_id"], _node_update(state, step_name), state.get("branch"))
             logger.error(f"[Node {step_num}] ✗ {step_name} post_check 실패 ({elapsed:.1f}s): {err}")
-            return state
+            return _node_update(state, step_name)
 
     # 성공
     elapsed = time.time() - start_time
+    _record_timing(state, step_name, "success", elapsed, calls)
     state["steps"][step_name]["status"] = "success"
     state["steps"][step_name]["completed_at"] = _now()
     state["updated_at"] = _now()
-    await _broadcast(state["job_id"], state)
+    await _broadcast(state["job_id"], _node_update(state, step_name), state.get("branch"))
     logger.info(f"[Node {step_num}] ✓ {step_name} 완료 ({elapsed:.1f}s)")  # ⭐
+    return _node_update(state, step_name)
+
+# ===== 결과 이미지 전달 =====
+
+def _artifact_key(state: PipelineState, key: str) -> str:
+    """멀티 스타일 분기: 스타일별 결과가 섞이지 않도록 artifact 키에 스타일 추가"""
+    branch = state.get("branch")
+    return f"{branch}/{key}" if branch else key
+
+
+def _store_result(state: PipelineState, step_name: str, key: str, image) -> str:
+    """
+    결과 이미지를 artifact 저장소에 보관 (다음 노드가 디코딩된 이미지를 바로 사용)
+    GCS 업로드는 백그라운드로 진행, 완료 시 result_url을 WebSocket으로 전송
+    업로드 포맷은 settings.IMAGE_ENCODING[key] 정책 (파일 확장자도 정책에 따름)
+
+    Returns:
+        결과 이미지 공개 URL (업로드 경로로부터 즉시 결정)
+    """
+    job_id = state["job_id"]
+    store = get_artifact_store(job_id)
+    policy = resolve_policy(image, key)
+    filename = f"{key}.{policy.extension}"
+    artifact_key = _artifact_key(state, key)
+    store.put(artifact_key, image)
+
+    return store.upload_in_background(
+        artifact_key,
+        destination_path=f"pipeline/{job_id}/{_artifact_key(state, filename)}",
+        content_type=policy.mime_type,
+        on_uploaded=_result_url_broadcaster(job_id, step_name, state.get("branch")),
+        stage=key,
+        policy=policy,
+        owner=(step_name, state.get("branch")),
+    )
+
+
+def _result_url_broadcaster(job_id: str, step_name: str, branch: Optional[str] = None):
+    """업로드 완료 시 단계 result_url 전송 콜백"""
+    async def _on_uploaded(url: str):
+        await _broadcast(job_id, {"steps": {step_name: {"result_url": url}}, "updated_at": _now()}, branch)
+    return _on_uploaded
+
+
+async def _execute_shared(state: PipelineState, step_name: str, execute_fn: Callable) -> PipelineState:
+    """
+    배치 job: 같은 배치·같은 콘텐츠의 다른 스타일 job과 단계 결과 공유
+    먼저 도착한 job만 실행하고, 나머지는 결과(STEP_WRITES 값 + 업로드 URL)를 받아 사용
+    (이미지는 다음 노드가 load_image로 업로드 완료 후 URL에서 로드)
+    """
+    batch_id = state.get("batch_id")
+    if not batch_id:
+        return await execute_fn(state)
+
+    registry = get_shared_step_registry()
+    shared_key = (batch_id, state["content_id"], step_name)
+    future, is_leader = registry.acquire(shared_key)
+    store = get_artifact_store(state["job_id"])
+
+    if is_leader:
+        try:
+            state = await execute_fn(state)
+        except BaseException as e:
+            # 실패 결과는 남기지 않음 → 기다리던 job은 실패하고, 이후 재개되는 job이 다시 실행
+            registry.release(shared_key, future)
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError(f"{step_name} 공유 실행 중단"))
+            raise
+        # 디코딩된 이미지는 공유하지 않음 (레지스트리에 오래 남아 메모리 한도 밖에서 유지되므로)
+        future.set_result({
+            "values": {key: state.get(key) for key in STEP_WRITES[step_name]},
+            "result_url": state["steps"][step_name].get("result_url"),
+            "artifacts": {key: store.export_upload(key) for key in SHARED_STEP_ARTIFACTS[step_name]},
+        })
+        return state
+
+    shared = await asyncio.shield(future)
+    logger.info(f"[Batch] {step_name} 결과 공유 사용 (content_id={state['content_id']})")
+    state.update(shared["values"])
+    if shared["result_url"]:
+        state["steps"][step_name]["result_url"] = shared["result_url"]
+    for key, (upload, url) in shared["artifacts"].items():
+        store.adopt_upload(
+            key, upload, url,
+            on_uploaded=_result_url_broadcaster(state["job_id"], step_name),
+            owner=(step_name, state.get("branch")),
+        )
     return state
 
+
+async def _cached_result(
+    stage: str,
+    source_image,
+    compute: Callable[[], Awaitable],
+    **key_parts,
+):
+    """
+    결과 캐시 조회 → 없으면 compute 실행 후 캐시에 저장
+    key_parts: style / model_image / prompt / provider_version (결과를 결정하는 입력)
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return await compute()
+
+    source_hash = await asyncio.to_thread(image_fingerprint, source_image)
+    key = make_cache_key(stage, source_hash, **key_parts)
+
+    cached = await cache.get_image(stage, key)
+    if cached is not None:
+        logger.info(f"[Cache] ✓ {stage} 캐시 적중 ({key[:12]})")
+        return cached
+
+    result = await compute()
+    cache.put_image_in_background(stage, key, result)
+    return result
+
+
 # ===== 각 노드 구현 =====
 
-async def node_select_image(state: PipelineState) -> PipelineState:
+async def node_select_image(state: PipelineState) -> dict:
     """Node 1: 상품 이미지 선택 및 메타데이터 로드"""
     async def _execute(state: PipelineState) -> PipelineState:
         from app.db.base import SessionLocal
@@ -136,113 +311,111 @@ async def node_select_image(state: PipelineState) -> PipelineState:
 
         return state
 
-    return await _run_node(state, 1, _execute)
+    return await _run_node(state, 1, lambda s: _execute_shared(s, "select_image", _execute))
 
 
-async def node_remove_background(state: PipelineState) -> PipelineState:
+async def node_remove_background(state: PipelineState) -> dict:
     """Node 2: 배경 제거 (RMBG-2.0)"""
     async def _execute(state: PipelineState) -> PipelineState:
-        import io
-        import requests
-        from PIL import Image
-        from app.services.img_processing.background_removal import BackgroundRemovalService
-        from app.core.storage import upload_to_gcs_async
-
-        # 이미지 다운로드
-        resp = requests.get(state["product_image_url"], timeout=30)
-        resp.raise_for_status()
-        original_image = Image.open(io.BytesIO(resp.content))
+        from app.services.img_processing.background_removal import get_background_removal_service
+        from app.services.img_processing.content_crop import crop_to_content
+
+        # 원본 이미지 (job 최초 1회 다운로드)
+        store = get_artifact_store(state["job_id"])
+        original_image = await store.load_image("original", state["product_image_url"])
+
+        # 배경 제거 (결정적 → 결과 캐시)
+        service = get_background_removal_service()
+        removed = await _cached_result(
+            "remove_background",
+            original_image,
+            lambda: service.remove_background(original_image),
+            provider_version=service.model_name,
+        )
 
-        # 배경 제거
-        service = BackgroundRemovalService()
-        removed = await service.remove_background(original_image)
+        # 투명 여백 제거 → PNG 인코딩/업로드, VTON 입력 크기 감소 (원래 위치는 메타데이터로 보관)
+        crop = None
+        if settings.CROP_TO_CONTENT:
+            removed, crop = crop_to_content(removed, settings.CROP_MARGIN)
+        state["removed_bg_crop"] = crop.to_metadata() if crop else None
 
-        # GCS 업로드
-        buf = io.BytesIO()
-        removed.save(buf, format="PNG")
-        result_url = await upload_to_gcs_async(
-            file_data=buf.getvalue(),
-            destination_path=f"pipeline/{state['job_id']}/removed_bg.png",
-            content_type="image/png"
+        state["removed_bg_url"] = _store_result(
+            state, "remove_background", "removed_bg", removed
         )
-
-        state["removed_bg_url"] = result_url
-        state["steps"]["remove_background"]["result_url"] = result_url
         return state
 
-    return await _run_node(state, 2, _execute)
+    return await _run_node(state, 2, lambda s: _execute_shared(s, "remove_background", _execute))
 
 
-async def node_virtual_fitting(state: PipelineState) -> PipelineState:
+async def node_virtual_fitting(state: PipelineState) -> dict:
     """Node 3: 가상 모델 피팅 (IDM-VTON) - 카테고리 충돌 감지 포함"""
     async def _execute(state: PipelineState) -> PipelineState:
-        import io
-        import requests
-        from PIL import Image
-        from app.services.generation.vton_replicate_generator import get_vton_service
-        from app.core.storage import upload_to_gcs_async
-
-        # 배경 제거 이미지 로드
-        resp = requests.get(state["removed_bg_url"], timeout=30)
-        resp.raise_for_status()
-        garment_image = Image.open(io.BytesIO(resp.content))
-
-        # VTON 실행
-        vton_service = get_vton_service()
-        result_image = vton_service.generate_fashion_ad(
-            garment_image=garment_image,
+        from app.services.generation.vton_replicate_generator import get_vton_service, VTON_MODEL_VERSION
+
+        # 배경 제거 이미지 (artifact 저장소에서 디코딩된 상태로 전달)
+        store = get_artifact_store(state["job_id"])
+        garment_image = await store.load_image("removed_bg", state["removed_bg_url"])
+
+        # Replicate는 URL로 의류 이미지를 받으므로 배경 제거 결과 업로드 완료만 대기
+        # (임시 파일 재인코딩/재업로드 생략)
+        await store.wait_uploaded("removed_bg")
+
+        # VTON 실행 (최초 생성 시 GCS 모델 목록 로드가 동기 호출이므로 스레드에서)
+        vton_service = await asyncio.to_thread(get_vton_service)
+
+        # seed 고정 → 의류 + 모델 이미지가 같으면 결과 동일 (결과 캐시)
+        model_image_url = vton_service.select_model_image(state["style"], state.get("model_index"))
+        result_image = await _cached_result(
+            "virtual_fitting",
+            garment_image,
+            lambda: vton_service.agenerate_fashion_ad(
+                garment_image=garment_image,
+                style=state["style"],
+                model_index=state.get("model_index"),
+                user_prompt=state.get("user_prompt"),
+                garment_url=state["removed_bg_url"],
+                model_image_url=model_image_url,
+            ),
             style=state["style"],
-            model_index=state.get("model_index"),
-            user_prompt=state.get("user_prompt"),
+            model_image=model_image_url,
+            provider_version=VTON_MODEL_VERSION,
         )
 
-        # GCS 업로드
-        buf = io.BytesIO()
-        result_image.save(buf, format="PNG")
-        result_url = await upload_to_gcs_async(
-            file_data=buf.getvalue(),
-            destination_path=f"pipeline/{state['job_id']}/fitted.png",
-            content_type="image/png"
+        state["fitted_image_url"] = _store_result(
+            state, "virtual_fitting", "fitted", result_image
         )
-
-        state["fitted_image_url"] = result_url
-        state["steps"]["virtual_fitting"]["result_url"] = result_url
         return state
 
     return await _run_node(state, 3, _execute)
 
 
-async def node_generate_background(state: PipelineState) -> PipelineState:
+async def node_generate_background(state: PipelineState) -> dict:
     """Node 4: 배경 생성 (Gemini 2.5 Flash Image)"""
     async def _execute(state: PipelineState) -> PipelineState:
-        import io
-        import requests
-        from PIL import Image
-        from app.services.generation.gemini_generator import GeminiImageGenerator  # ← 변경
-        from app.core.storage import upload_to_gcs_async
+        from app.services.generation.gemini_generator import get_gemini_generator
 
-        resp = requests.get(state["fitted_image_url"], timeout=30)
-        resp.raise_for_status()
-        fitted_image = Image.open(io.BytesIO(resp.content))
+        store = get_artifact_store(state["job_id"])
+        fitted_image = await store.load_image(_artifact_key(state, "fitted"), state["fitted_image_url"])
 
         # Gemini 이미지 생성 (GPU 서버 대신)
-        generator = GeminiImageGenerator()
-        result_image = generator.generate_fashion_ad(
-            product_image=fitted_image,
+        generator = get_gemini_generator()
+        result_image = await _cached_result(
+            "generate_background",
+            fitted_image,
+            lambda: generator.agenerate_fashion_ad(
+                product_image=fitted_image,
+                style=state["style"],
+                user_prompt=state.get("user_prompt"),
+            ),
             style=state["style"],
-            user_prompt=state.get("user_prompt"),
+            prompt=state.get("user_prompt"),
+            provider_version=generator.model,
         )
 
-        buf = io.BytesIO()
-        result_image.save(buf, format="PNG")
-        result_url = await upload_to_gcs_async(
-            file_data=buf.getvalue(),
-            destination_path=f"pipeline/{state['job_id']}/background.png",
-            content_type="image/png"
+        result_url = _store_result(
+            state, "generate_background", "background", result_image
         )
-
         state["background_image_url"] = result_url
-        state["steps"]["generate_background"]["result_url"] = result_url
 
         # GenerationHistory DB 저장
         import uuid as _uuid
@@ -256,7 +429,9 @@ async def node_generate_background(state: PipelineState) -> PipelineState:
                 user_id=state["user_id"],
                 style=state["style"],
                 result_url=result_url,
-                processing_time=0,
+                prompt=state.get("user_prompt"),
+                # 배경 제거 → 가상 피팅 → 배경 생성 소요 시간
+                processing_time=_history_seconds(state, "remove_background", "virtual_fitting"),
             )
             db.add(history)
             db.commit()
@@ -270,14 +445,17 @@ async def node_generate_background(state: PipelineState) -> PipelineState:
     return await _run_node(state, 4, _execute)
 
 
-async def node_generate_caption(state: PipelineState) -> PipelineState:
-    """Node 5: 광고 캡션 생성 (OpenAI GPT-4o)"""
+async def node_generate_caption(state: PipelineState) -> dict:
+    """
+    Node 5: 광고 캡션 생성 (OpenAI GPT-4o)
+    스타일/카테고리만 사용하므로 이미지 생성 분기와 병렬 실행됨.
+    AdCaption 저장은 generation_id가 필요하므로 Node 6에서 수행
+    """
     async def _execute(state: PipelineState) -> PipelineState:
         import json
-        from openai import OpenAI
-        from config import settings
+        from app.core.clients import get_openai_client
 
-        client = OpenAI(api_key=settings.OPENAI_API_KEY, timeout=30.0)
+        client = get_openai_client()
 
         system_prompt = """당신은 패션 광고 카피라이터입니다.
 1-2문장으로 간결하고 감성적인 한글 광고 캡션을 작성하세요. (최대 50자, 이모지 포함)
@@ -307,15 +485,21 @@ async def node_generate_caption(state: PipelineState) -> PipelineState:
                 user_message += f"\n위 문구를 캡션에 자연스럽게 포함시키세요."
                 print(f"   - 필수 문구: {must_include}")
 
-        response = client.chat.completions.create(
-            model="gpt-5-chat-latest",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.8,
-            max_tokens=200,
-            response_format={"type": "json_object"},
+        response = await provider_call(
+            "openai",
+            "caption",
+            lambda: client.chat.completions.create(
+                model="gpt-5-chat-latest",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message},
+                ],
+                temperature=0.8,
+                max_tokens=200,
+                response_format={"type": "json_object"},
+            ),
+            request_bytes=len((system_prompt + user_message).encode("utf-8")),
+            response_bytes=lambda r: len((r.choices[0].message.content or "").encode("utf-8")),
         )
 
         result = json.loads(response.choices[0].message.content)
@@ -325,43 +509,19 @@ async def node_generate_caption(state: PipelineState) -> PipelineState:
             raise ValueError("캡션 생성 결과가 비어있습니다.")
 
         state["caption"] = caption
-
-        # AdCaption DB 저장
-        import uuid as _uuid
-        from app.db.base import SessionLocal
-        from app.models.caption_system import AdCaption
-        db = SessionLocal()
-        try:
-            ad_caption = AdCaption(
-                caption_id=str(_uuid.uuid4()),
-                content_id=state["content_id"],
-                user_id=state["user_id"],
-                generation_id=state["generation_id"],
-                ai_caption=caption,
-                final_caption=caption,
-                is_modified=False,
-                style=state["style"],
-            )
-            db.add(ad_caption)
-            db.commit()
-            db.refresh(ad_caption)
-            state["caption_id"] = ad_caption.caption_id
-        finally:
-            db.close()
-
         return state
 
     return await _run_node(state, 5, _execute)
 
 
-async def node_generate_html(state: PipelineState) -> PipelineState:
+async def node_generate_html(state: PipelineState) -> dict:
     """Node 6: HTML 광고 페이지 생성 (OpenAI GPT-4o)"""
     async def _execute(state: PipelineState) -> PipelineState:
-        from app.services.html.ad_generator import AdGenerator
+        from app.services.html.ad_generator import get_ad_generator
         from app.db.base import SessionLocal
         from app.models.schemas import UserContent
         import uuid as _uuid
-        from app.models.caption_system import AdCopyHistory
+        from app.models.caption_system import AdCaption, AdCopyHistory
 
         # Vision AI 결과 조회
         db = SessionLocal()
@@ -398,8 +558,8 @@ async def node_generate_html(state: PipelineState) -> PipelineState:
             print(f"✅ 최종 선택 스타일: {selected_style}")
             print("=" * 50)
             
-            generator = AdGenerator()
-            result = generator.generate_html_with_template(
+            generator = get_ad_generator()
+            result = await generator.agenerate_html_with_template(
                 vision_result=vision_result,
                 image_url=state["background_image_url"],
                 template_name=selected_style,
@@ -408,7 +568,21 @@ async def node_generate_html(state: PipelineState) -> PipelineState:
             )
 
             state["html_content"] = result["html"]
-            state["selected_style"] = selected_style
+
+            # AdCaption DB 저장 (Node 5 캡션 + Node 4 generation_id)
+            ad_caption = AdCaption(
+                caption_id=str(_uuid.uuid4()),
+                content_id=state["content_id"],
+                user_id=state["user_id"],
+                generation_id=state["generation_id"],
+                ai_caption=state["caption"],
+                final_caption=state["caption"],
+                is_modified=False,
+                style=state["style"],
+            )
+            db.add(ad_caption)
+            db.flush()
+            state["caption_id"] = ad_caption.caption_id
 
             # AdCopyHistory DB 저장
             ad_copy = AdCopyHistory(
@@ -420,6 +594,8 @@ async def node_generate_html(state: PipelineState) -> PipelineState:
                 ad_copy_data=result["ad_copy"],
                 template_used=selected_style,
                 html_content=result["html"],
+                # 캡션 생성 + HTML 생성 소요 시간
+                processing_time=_history_seconds(state, "generate_caption"),
             )
             db.add(ad_copy)
             db.commit()
@@ -433,11 +609,11 @@ async def node_generate_html(state: PipelineState) -> PipelineState:
     return await _run_node(state, 6, _execute)
 
 
-async def node_save_image(state: PipelineState) -> PipelineState:
+async def node_save_image(state: PipelineState) -> dict:
     """Node 7: HTML → PNG 이미지 저장 (Playwright)"""
     async def _execute(state: PipelineState) -> PipelineState:
         from app.core.html_renderer import render_html_to_png
-        from app.core.storage import upload_to_gcs_async   
+        from app.core.storage import get_storage
         import uuid as _uuid
         from app.db.base import SessionLocal
         from app.models.caption_system import AdCopyHistory
@@ -446,6 +622,9 @@ async def node_save_image(state: PipelineState) -> PipelineState:
         logger.info("🔵 [DEBUG] save_image 실행 시작")
         logger.info(f"🔵 [DEBUG] HTML content length: {len(state.get('html_content', ''))}")
 
+        # HTML이 배경 이미지를 URL로 참조하므로 업로드 완료 대기
+        await get_artifact_store(state["job_id"]).wait_uploaded(_artifact_key(state, "background"))
+
         # HTML → PNG
         try:
             logger.info("🔵 [DEBUG] render_html_to_png 호출 시작")
@@ -466,15 +645,11 @@ async def node_save_image(state: PipelineState) -> PipelineState:
         logger.info(f"🔵 [DEBUG] 이미지 크기: {len(image_bytes)} bytes")
 
         try:
-            logger.info("🔵 [DEBUG] upload_to_gcs_async 호출 시작")
-            image_url = await upload_to_gcs_async(
-                file_data=image_bytes,
-                destination_path=destination_path,
-                content_type='image/png'
-            )
-            logger.info(f"🔵 [DEBUG] upload_to_gcs_async 완료: {image_url}")
+            logger.info("🔵 [DEBUG] storage.put 호출 시작")
+            image_url = await get_storage().put(destination_path, image_bytes, content_type='image/png')
+            logger.info(f"🔵 [DEBUG] storage.put 완료: {image_url}")
         except Exception as e:
-            logger.error(f"🔴 [ERROR] upload_to_gcs_async 실패: {e}", exc_info=True)
+            logger.error(f"🔴 [ERROR] storage.put 실패: {e}", exc_info=True)
             raise
 
         state["final_image_url"] = image_url
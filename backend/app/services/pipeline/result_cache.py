@@ -0,0 +1,338 @@
+"""
+AdGen Pipeline Result Cache
+비용이 큰 단계(배경 제거 / VTON / 배경 생성) 결과의 내용 기반 캐시
+
+- 키: 단계 + 입력 이미지 픽셀 해시 + 스타일 + 모델 이미지 + 프롬프트 + 제공자 버전 → sha256
+  (VTON은 seed 고정, rembg는 결정적이므로 동일 입력 = 동일 결과)
+- 백엔드:
+  - disk: 로컬 디스크 LRU (인스턴스별)
+  - db: DB 인덱스 + GCS 저장 (인스턴스 간 공유)
+- TTL / 전체 크기 한도 초과 시 오래 사용되지 않은 항목부터 제거
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+from config import settings
+from app.core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def image_fingerprint(image: Image.Image) -> str:
+    """이미지 픽셀 내용 해시 (인코딩 방식과 무관)"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_cache_key(
+    stage: str,
+    source_hash: str,
+    style: Optional[str] = None,
+    model_image: Optional[str] = None,
+    prompt: Optional[str] = None,
+    provider_version: Optional[str] = None,
+) -> str:
+    """결과를 결정하는 모든 입력으로 캐시 키 생성"""
+    payload = json.dumps({
+        "stage": stage,
+        "source": source_hash,
+        "style": style,
+        "model_image": model_image,
+        "prompt": prompt,
+        "provider_version": provider_version,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ===== 추상 클래스 =====
+
+class ResultCacheBackend(ABC):
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """캐시된 결과 bytes (없거나 만료 시 None)"""
+
+    @abstractmethod
+    async def put(self, key: str, stage: str, data: bytes):
+        """결과 저장 (한도 초과 시 eviction)"""
+
+
+# ===== 로컬 디스크 LRU =====
+
+class DiskLRUCache(ResultCacheBackend):
+    """
+    로컬 디스크 LRU 캐시
+    접근 시각(atime)으로 LRU 순서, 수정 시각(mtime)으로 TTL 판단 → 재시작 후에도 순서 유지
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl_seconds: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None     # key → size (LRU 순서)
+        self._total_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.bin"
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        if self.root.exists():
+            entries = []
+            for path in self.root.glob("*/*.bin"):
+                st = path.stat()
+                entries.append((st.st_atime, path.stem, st.st_size))
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._total_bytes += size
+        logger.info(f"[ResultCache] 디스크 캐시 로드: {len(self._index)}개, {self._total_bytes / 1024 / 1024:.1f}MB")
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+
+    def _get_sync(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                self._remove(key)
+                return None
+            if time.time() - st.st_mtime > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            os.utime(path, (time.time(), st.st_mtime))
+            return path.read_bytes()
+
+    def _put_sync(self, key: str, data: bytes):
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                oldest = next(iter(self._index))
+                self._remove(oldest)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def put(self, key: str, stage: str, data: bytes):
+        await asyncio.to_thread(self._put_sync, key, data)
+
+
+# ===== DB 인덱스 + GCS =====
+
+class DBIndexCache(ResultCacheBackend):
+    """
+    result_cache_entries 테이블로 색인, 결과 bytes는 GCS에 저장
+    모든 인스턴스가 같은 캐시를 공유
+    """
+
+    BLOB_PREFIX = "result-cache"
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def _get_sync(self, key: str) -> Optional[bytes]:
+        from app.db.base import SessionLocal
+        from app.models.result_cache import ResultCacheEntry
+        from app.core.storage import get_storage
+
+        db = SessionLocal()
+        try:
+            entry = db.query(ResultCacheEntry).filter(ResultCacheEntry.cache_key == key).first()
+            if entry is None:
+                return None
+
+            now = datetime.now(timezone.utc)
+            created_at = entry.created_at
+            if created_at is not None and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if created_at is not None and now - created_at > timedelta(seconds=self.ttl_seconds):
+                self._delete_entries(db, [entry])
+                return None
+
+            blob_path = entry.blob_path
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_accessed_at = now
+            db.commit()
+        finally:
+            db.close()
+
+        try:
+            return get_storage().get_sync(blob_path)
+        except Exception as e:
+            logger.warning(f"[ResultCache] 캐시 blob 조회 실패: {blob_path}, error={e}")
+            return None
+
+    def _put_sync(self, key: str, stage: str, data: bytes):
+        from sqlalchemy import func
+        from app.db.base import SessionLocal
+        from app.models.result_cache import ResultCacheEntry
+        from app.core.storage import get_storage
+
+        blob_path = f"{self.BLOB_PREFIX}/{stage}/{key}.png"
+        get_storage().put_sync(blob_path, data, content_type="image/png")
+
+        db = SessionLocal()
+        try:
+            db.merge(ResultCacheEntry(
+                cache_key=key,
+                stage=stage,
+                blob_path=blob_path,
+                size_bytes=len(data),
+                hit_count=0,
+                created_at=datetime.now(timezone.utc),
+                last_accessed_at=datetime.now(timezone.utc),
+            ))
+            db.commit()
+
+            # 전체 크기 한도 초과 시 LRU 순서로 제거
+            total = db.query(func.coalesce(func.sum(ResultCacheEntry.size_bytes), 0)).scalar()
+            if total > self.max_bytes:
+                victims = []
+                for entry in db.query(ResultCacheEntry).order_by(ResultCacheEntry.last_accessed_at).yield_per(100):
+                    if total <= self.max_bytes:
+                        break
+                    if entry.cache_key == key:
+                        continue
+                    victims.append(entry)
+                    total -= entry.size_bytes
+                self._delete_entries(db, victims)
+        finally:
+            db.close()
+
+    def _delete_entries(self, db, entries: list):
+        from app.core.storage import get_storage
+
+        for entry in entries:
+            try:
+                get_storage().delete_sync(entry.blob_path)
+            except Exception as e:
+                logger.warning(f"[ResultCache] blob 삭제 실패: {entry.blob_path}, error={e}")
+            db.delete(entry)
+        db.commit()
+        if entries:
+            logger.info(f"[ResultCache] {len(entries)}개 항목 제거")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def put(self, key: str, stage: str, data: bytes):
+        await asyncio.to_thread(self._put_sync, key, stage, data)
+
+
+# ===== 캐시 (통계 + 백그라운드 저장) =====
+
+class ResultCache:
+    """단계별 hit/miss 집계 + 캐시 오류는 miss로 처리 (파이프라인을 실패시키지 않음)"""
+
+    def __init__(self, backend: ResultCacheBackend):
+        self.backend = backend
+        self.stats: dict[str, dict[str, int]] = {}
+        self._pending: set[asyncio.Task] = set()
+
+    def _count(self, stage: str, field: str):
+        stage_stats = self.stats.setdefault(stage, {"hits": 0, "misses": 0, "errors": 0})
+        stage_stats[field] += 1
+        CACHE_LOOKUPS.labels(stage=stage, result=field).inc()
+
+    async def get_image(self, stage: str, key: str) -> Optional[Image.Image]:
+        """캐시된 결과 이미지 (없거나 조회 / 디코딩 실패 시 None, 조회 1회당 hit 또는 miss 1회 집계)"""
+        try:
+            data = await self.backend.get(key)
+            if data is None:
+                self._count(stage, "misses")
+                return None
+            image = Image.open(io.BytesIO(data))
+            await asyncio.to_thread(image.load)
+        except Exception as e:
+            # 백엔드 오류 / 손상된 캐시 데이터 → 단계를 실패시키지 않고 다시 계산
+            logger.warning(f"[ResultCache] 조회 실패 → miss 처리 ({stage}): {e}")
+            self._count(stage, "misses")
+            return None
+
+        self._count(stage, "hits")
+        return image
+
+    def put_image_in_background(self, stage: str, key: str, image: Image.Image):
+        """결과 저장은 노드 진행을 막지 않도록 백그라운드에서"""
+        async def _put():
+            try:
+                buf = io.BytesIO()
+                await asyncio.to_thread(image.save, buf, format="PNG")
+                await self.backend.put(key, stage, buf.getvalue())
+            except Exception as e:
+                logger.warning(f"[ResultCache] 저장 실패 ({stage}): {e}")
+                self._count(stage, "errors")
+
+        task = asyncio.create_task(_put())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def get_stats(self) -> dict:
+        result = {}
+        for stage, stage_stats in self.stats.items():
+            lookups = stage_stats["hits"] + stage_stats["misses"]
+            result[stage] = {
+                **stage_stats,
+                "hit_rate": round(stage_stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+        return result
+
+
+# 싱글톤
+_result_cache: Optional[ResultCache] = None
+_initialized = False
+
+def get_result_cache() -> Optional[ResultCache]:
+    """설정(RESULT_CACHE_BACKEND)에 따른 결과 캐시 (none이면 None)"""
+    global _result_cache, _initialized
+    if not _initialized:
+        _initialized = True
+        backend = settings.RESULT_CACHE_BACKEND
+        max_bytes = settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+        ttl_seconds = settings.RESULT_CACHE_TTL_HOURS * 3600
+
+        if backend == "disk":
+            _result_cache = ResultCache(DiskLRUCache(settings.RESULT_CACHE_DIR, max_bytes, ttl_seconds))
+        elif backend == "db":
+            _result_cache = ResultCache(DBIndexCache(max_bytes, ttl_seconds))
+        elif backend != "none":
+            raise ValueError(f"지원하지 않는 캐시 백엔드: {backend} (선택 가능: disk, db, none)")
+
+        logger.info(f"✅ 결과 캐시 초기화: {backend}")
+    return _result_cache
@@ -2,7 +2,7 @@
 AdGen Pipeline State
 LangGraph에서 각 노드 간 공유되는 상태 정의
 """
-from typing import TypedDict, Optional, Literal
+from typing import TypedDict, Optional, Literal, Annotated
 from datetime import datetime
 
 
@@ -20,6 +20,45 @@ class StepState(TypedDict):
     completed_at: Optional[str]
     error: Optional[str]
     result_url: Optional[str]   # 이미지 결과물이 있는 경우
+    duration_ms: Optional[float]        # 단계 소요 시간
+    provider_calls: Optional[list]      # 외부 API 호출 기록 (지연 시간 / payload / 재시도)
+
+
+# ===== 병렬 분기 병합 규칙 (reducer) =====
+# 독립 노드가 같은 superstep에서 동시에 실행되므로
+# 여러 노드가 공통으로 갱신하는 키는 병합 규칙이 필요함
+
+def merge_steps(left: dict, right: dict) -> dict:
+    """단계별 상태 병합 (각 노드는 자기 단계만 갱신)"""
+    merged = dict(left or {})
+    for name, step in (right or {}).items():
+        merged[name] = {**merged.get(name, {}), **step}
+    return merged
+
+
+def merge_status(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """한 분기라도 실패하면 파이프라인 전체를 failed로 유지"""
+    if left == "failed" or right == "failed":
+        return "failed"
+    return right
+
+
+def keep_first(left, right):
+    """최초 값 유지 (가장 먼저 실패한 단계의 에러 보존)"""
+    return left if left is not None else right
+
+
+def keep_latest(left, right):
+    """더 큰 값 유지 (current_step, updated_at)"""
+    return max(left, right)
+
+
+def merge_branches(left: dict, right: dict) -> dict:
+    """스타일별 분기 상태 병합 (분기 내부 키도 같은 reducer 규칙 적용)"""
+    merged = dict(left or {})
+    for style, update in (right or {}).items():
+        merged[style] = _merge_with_reducers(merged.get(style) or {}, update)
+    return merged
 
 
 class PipelineState(TypedDict):
@@ -31,6 +70,12 @@ class PipelineState(TypedDict):
     job_id: str                     # 파이프라인 실행 ID (UUID)
     user_id: str
     content_id: str                 # 선택된 상품 이미지
+    batch_id: Optional[str]         # 배치 실행 ID (배치 요청으로 생성된 job만)
+
+    # ===== 멀티 스타일 모드 =====
+    styles: Optional[list]          # 스타일 목록 (공통 단계 1회 실행 후 스타일별 분기)
+    branch: Optional[str]           # 분기 실행 상태인 경우 해당 스타일
+    branches: Annotated[dict, merge_branches]   # 스타일 → 분기 상태 (BRANCH_KEYS)
 
     # ===== 상품 메타데이터 (Node 1에서 로드) =====
     product_category: Optional[str]     # 상의/하의/원피스/아우터
@@ -44,6 +89,7 @@ class PipelineState(TypedDict):
 
     # ===== 각 단계 결과 이미지 =====
     removed_bg_url: Optional[str]       # Node 2: 배경제거 결과
+    removed_bg_crop: Optional[dict]     # Node 2: 원본 캔버스 내 crop 위치 (box, canvas_size / None=crop 안 함)
     fitted_image_url: Optional[str]     # Node 3: 가상피팅 결과
     background_image_url: Optional[str] # Node 4: 배경생성 결과
     caption: Optional[str]              # Node 5: 생성된 캡션
@@ -56,17 +102,87 @@ class PipelineState(TypedDict):
     ad_copy_id: Optional[str]       # AdCopyHistory ID
 
     # ===== 파이프라인 상태 =====
-    status: PipelineStatus
-    current_step: int               # 현재 실행 중인 단계 (1~7)
-    error: Optional[str]            # 실패 시 에러 메시지
-    error_step: Optional[int]       # 실패한 단계 번호
+    status: Annotated[PipelineStatus, merge_status]
+    current_step: Annotated[int, keep_latest]           # 현재 실행 중인 단계 중 가장 뒤 (1~7)
+    error: Annotated[Optional[str], keep_first]         # 실패 시 에러 메시지
+    error_step: Annotated[Optional[int], keep_first]    # 실패한 단계 번호
 
     # ===== 각 단계별 상세 상태 (WebSocket 전송용) =====
-    steps: dict[str, StepState]     # key: "node1" ~ "node7"
+    steps: Annotated[dict[str, StepState], merge_steps]     # key: STEP_NAMES 값
 
     # ===== 메타 =====
     created_at: str
-    updated_at: str
+    updated_at: Annotated[str, keep_latest]
+
+
+# reducer가 지정된 키 (그 외 키는 단일 노드만 기록 → 덮어쓰기)
+STATE_REDUCERS = {
+    "status": merge_status,
+    "current_step": keep_latest,
+    "error": keep_first,
+    "error_step": keep_first,
+    "steps": merge_steps,
+    "branches": merge_branches,
+    "updated_at": keep_latest,
+}
+
+# 모든 노드가 공통으로 갱신하는 진행 상태 키
+PROGRESS_KEYS = ("status", "current_step", "error", "error_step", "updated_at")
+
+# 멀티 스타일 분기 상태에 보관하는 키 (단계 결과는 STEP_WRITES 기준으로 추가)
+BRANCH_KEYS = ("style", "steps") + PROGRESS_KEYS
+
+
+def _merge_with_reducers(base: dict, update: dict) -> dict:
+    merged = dict(base)
+    for key, value in update.items():
+        reducer = STATE_REDUCERS.get(key)
+        if reducer and merged.get(key) is not None:
+            merged[key] = reducer(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def apply_state_update(state: PipelineState, update: dict) -> PipelineState:
+    """
+    노드 부분 업데이트를 상태에 병합 (LangGraph reducer와 동일한 규칙)
+    WebSocket/폴링용 상태 저장소에서 사용
+    """
+    merged = _merge_with_reducers(state, update)
+    if update.get("branches"):
+        merged["steps"] = aggregate_branch_steps(merged)
+    return PipelineState(**merged)
+
+
+def aggregate_branch_steps(state: PipelineState) -> dict:
+    """
+    멀티 스타일 job: 분기 단계의 상태를 전체 분기 기준으로 집계
+    (하나라도 실패 → failed, 실행 중 → running, 모두 성공 → success)
+    """
+    steps = {name: dict(step) for name, step in state["steps"].items()}
+    branches = state.get("branches") or {}
+    if not branches:
+        return steps
+
+    for name in steps:
+        # 실패한 분기에서 실행되지 않은 단계는 집계에서 제외
+        statuses = [
+            branch["steps"][name]["status"]
+            for branch in branches.values()
+            if name in (branch.get("steps") or {})
+            and not (branch.get("status") == "failed" and branch["steps"][name]["status"] == "pending")
+        ]
+        if not statuses:
+            continue
+        if "failed" in statuses:
+            steps[name]["status"] = "failed"
+        elif set(statuses) == {"success"}:
+            # 실패한 분기 때문에 일부 스타일에서 실행되지 않았다면 미완료
+            steps[name]["status"] = "success" if len(statuses) == len(state.get("styles") or ()) else "pending"
+        elif set(statuses) != {"pending"}:
+            steps[name]["status"] = "running"
+    return steps
 
 
 # ===== 단계 이름 매핑 =====
@@ -91,6 +207,165 @@ STEP_LABELS = {
 }
 
 
+# ===== 단계별 입출력 선언 =====
+# 그래프는 이 선언으로부터 의존 관계를 계산하여
+# 서로 의존하지 않는 단계를 병렬로 실행함 (graph.py 참고)
+
+STEP_READS = {
+    "select_image": ("content_id",),
+    "remove_background": ("product_image_url",),
+    "virtual_fitting": ("removed_bg_url", "style", "model_index", "user_prompt"),
+    "generate_background": ("fitted_image_url", "style", "user_prompt", "content_id", "user_id"),
+    "generate_caption": ("style", "product_category", "user_prompt", "ad_inputs"),
+    "generate_html": (
+        "content_id", "user_id", "style", "ad_inputs",
+        "caption", "background_image_url", "generation_id",
+    ),
+    "save_image": ("html_content", "ad_copy_id", "user_id"),
+}
+
+STEP_WRITES = {
+    "select_image": ("product_image_url", "product_category"),
+    "remove_background": ("removed_bg_url", "removed_bg_crop"),
+    "virtual_fitting": ("fitted_image_url",),
+    "generate_background": ("background_image_url", "generation_id"),
+    "generate_caption": ("caption",),
+    "generate_html": ("html_content", "caption_id", "ad_copy_id"),
+    "save_image": ("final_image_url",),
+}
+
+
+def mark_upload_failed(state: PipelineState, step_name: str, branch: Optional[str], error: str) -> PipelineState:
+    """
+    결과 업로드 실패 → 그 결과를 만든 단계를 실패로 되돌리고 기록한 값(URL 등) 제거
+    (성공으로 남으면 재개 시 건너뛰어 존재하지 않는 blob URL이 유지되므로)
+
+    Args:
+        step_name: 업로드할 결과를 만든 단계
+        branch: 멀티 스타일 분기 (None이면 공통 단계)
+        error: 업로드 오류 메시지
+    """
+    failed = dict(state)
+    step_num = next(num for num, name in STEP_NAMES.items() if name == step_name)
+    error = f"결과 업로드 실패: {error}"
+
+    target = failed
+    if branch:
+        branches = dict(failed.get("branches") or {})
+        target = dict(branches.get(branch) or {})
+        branches[branch] = target
+        failed["branches"] = branches
+
+    if step_name in (target.get("steps") or {}):
+        target["steps"] = {name: dict(step) for name, step in target["steps"].items()}
+        target["steps"][step_name].update(status="failed", error=error, result_url=None)
+    for key in STEP_WRITES[step_name]:
+        target[key] = None
+    target["status"] = "failed"
+    target["error"] = target.get("error") or error
+    target["error_step"] = min(target.get("error_step") or step_num, step_num)
+
+    if branch:
+        failed["steps"] = aggregate_branch_steps(failed)
+        failed["status"] = "failed"
+        failed["error"] = failed.get("error") or f"[{branch}] {error}"
+        failed["error_step"] = min(failed.get("error_step") or step_num, step_num)
+    return PipelineState(**failed)
+
+
+def create_resume_state(state: PipelineState) -> PipelineState:
+    """
+    실패한 job의 재개용 상태 생성
+
+    성공한 단계(체크포인트)는 결과(removed_bg_url, fitted_image_url 등)와 상태를 그대로 유지하고
+    실패/미실행 단계만 pending으로 되돌림 → 그래프 재실행 시 성공 단계는 건너뜀
+    """
+    resumed = dict(state)
+    resumed["steps"] = {}
+    for name, step in state["steps"].items():
+        if step["status"] == "success":
+            resumed["steps"][name] = dict(step)
+            continue
+        resumed["steps"][name] = StepState(
+            status="pending",
+            started_at=None,
+            completed_at=None,
+            error=None,
+            result_url=None,
+            duration_ms=None,
+            provider_calls=None,
+        )
+        for key in STEP_WRITES[name]:
+            resumed[key] = None
+
+    # 멀티 스타일: 분기 상태는 유지 (성공한 분기는 건너뛰고, 실패한 분기는
+    # create_branch_state에서 분기 내 성공 단계만 남기고 재실행)
+    resumed["branches"] = dict(state.get("branches") or {})
+
+    resumed["status"] = "pending"
+    resumed["current_step"] = 0
+    resumed["error"] = None
+    resumed["error_step"] = None
+    resumed["updated_at"] = datetime.utcnow().isoformat()
+    return PipelineState(**resumed)
+
+
+def summarize_branches(state: PipelineState) -> dict:
+    """상태 조회 / WebSocket 응답용 분기별 진행 상황 (html_content 등 큰 값 제외)"""
+    return {
+        style: {
+            "status": branch.get("status"),
+            "current_step": branch.get("current_step"),
+            "steps": branch.get("steps", {}),
+            "error": branch.get("error"),
+            "error_step": branch.get("error_step"),
+            "final_image_url": branch.get("final_image_url"),
+            "updated_at": branch.get("updated_at"),
+        }
+        for style, branch in (state.get("branches") or {}).items()
+    }
+
+
+def create_branch_state(state: PipelineState, style: str, branch_steps: list[str]) -> PipelineState:
+    """
+    멀티 스타일 job의 스타일별 분기 실행 상태 생성
+
+    공통 단계 결과(product_image_url, removed_bg_url 등)는 그대로 사용하고
+    분기 단계는 이전 분기 실행(재개 시)에서 성공한 단계만 유지
+    """
+    previous = (state.get("branches") or {}).get(style) or {}
+    previous_steps = previous.get("steps") or {}
+
+    branch = dict(state)
+    branch["steps"] = {name: dict(step) for name, step in state["steps"].items()}
+    for name in branch_steps:
+        step = previous_steps.get(name)
+        if step and step["status"] == "success":
+            branch["steps"][name] = dict(step)
+            for key in STEP_WRITES[name]:
+                branch[key] = previous.get(key)
+            continue
+        branch["steps"][name] = StepState(
+            status="pending",
+            started_at=None,
+            completed_at=None,
+            error=None,
+            result_url=None,
+            duration_ms=None,
+            provider_calls=None,
+        )
+        for key in STEP_WRITES[name]:
+            branch[key] = None
+
+    branch["style"] = style
+    branch["branch"] = style
+    branch["branches"] = {}
+    branch["status"] = "running"
+    branch["error"] = None
+    branch["error_step"] = None
+    return PipelineState(**branch)
+
+
 def create_initial_state(
     job_id: str,
     user_id: str,
@@ -98,15 +373,24 @@ def create_initial_state(
     style: str,
     model_index: Optional[int] = None,
     user_prompt: Optional[str] = None,
-    ad_inputs: Optional[dict] = None
+    ad_inputs: Optional[dict] = None,
+    batch_id: Optional[str] = None,
+    styles: Optional[list] = None
 ) -> PipelineState:
-    """초기 파이프라인 상태 생성"""
+    """
+    초기 파이프라인 상태 생성
+    styles가 2개 이상이면 멀티 스타일 모드 (style은 첫 번째 스타일)
+    """
     now = datetime.utcnow().isoformat()
 
     return PipelineState(
         job_id=job_id,
         user_id=user_id,
         content_id=content_id,
+        batch_id=batch_id,
+        styles=styles,
+        branch=None,
+        branches={},
         product_category=None,
         product_image_url=None,
         style=style,
@@ -114,6 +398,7 @@ def create_initial_state(
         user_prompt=user_prompt,
         ad_inputs=ad_inputs,
         removed_bg_url=None,
+        removed_bg_crop=None,
         fitted_image_url=None,
         background_image_url=None,
         caption=None,
@@ -133,6 +418,8 @@ def create_initial_state(
                 completed_at=None,
                 error=None,
                 result_url=None,
+                duration_ms=None,
+                provider_calls=None,
             )
             for name in STEP_NAMES.values()
         },
@@ -120,8 +120,10 @@ def post_check_generate_background(state: dict) -> Tuple[bool, Optional[str]]:
 
 
 def pre_check_generate_caption(state: dict) -> Tuple[bool, Optional[str]]:
-    """Node 5: 캡션 생성 전 검증"""
-    return validate_image_url(state.get("background_image_url"), "캡션 생성 입력")
+    """Node 5: 캡션 생성 전 검증 (이미지 생성 분기와 병렬 실행 → 스타일만 필요)"""
+    if not state.get("style"):
+        return False, "캡션 생성 입력: 스타일이 없습니다."
+    return True, None
 
 
 def post_check_generate_caption(state: dict) -> Tuple[bool, Optional[str]]:
@@ -130,9 +132,11 @@ def post_check_generate_caption(state: dict) -> Tuple[bool, Optional[str]]:
 
 
 def pre_check_generate_html(state: dict) -> Tuple[bool, Optional[str]]:
-    """Node 6: HTML 생성 전 검증"""
+    """Node 6: HTML 생성 전 검증 (캡션 분기 + 배경 생성 분기 합류 지점)"""
     ok, err = validate_text_output(state.get("caption"), "HTML 생성 입력")
-    return ok, err
+    if not ok:
+        return ok, err
+    return validate_image_url(state.get("background_image_url"), "HTML 생성 입력")
 
 
 def post_check_generate_html(state: dict) -> Tuple[bool, Optional[str]]:
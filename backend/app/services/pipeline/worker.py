@@ -0,0 +1,160 @@
+"""
+AdGen Pipeline Worker Pool
+job 큐에서 파이프라인을 가져와 실행하는 고정 크기 워커 풀
+
+- 인스턴스당 동시 실행 수 = PIPELINE_WORKER_CONCURRENCY (버스트 시에도 일정한 처리량)
+- 실행 중 heartbeat로 lease 연장, 소유권을 잃으면 실행 중인 job 취소 (다른 워커와 중복 실행 방지)
+- 종료 시 실행 중 job은 대기열로 반환 → 다른 인스턴스가 이어서 실행
+"""
+import os
+import socket
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+from app.services.pipeline.state import PipelineState
+from app.services.pipeline.job_queue import JobQueueBackend, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+# (claim한 상태, worker_id) → 상태 저장 / 종료 시 worker_id로 소유권 확인
+JobHandler = Callable[[PipelineState, str], Awaitable[None]]
+
+
+class PipelineWorkerPool:
+    """job 큐 소비 워커 풀"""
+
+    def __init__(
+        self,
+        backend: JobQueueBackend,
+        handler: JobHandler,
+        concurrency: int,
+        poll_interval: float,
+        lease_seconds: int,
+    ):
+        self.backend = backend
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self._instance_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.active_jobs: dict[str, str] = {}   # job_id → worker_id
+
+    def start(self):
+        for i in range(self.concurrency):
+            worker_id = f"{self._instance_id}-{i}"
+            self._tasks.append(asyncio.create_task(self._worker_loop(worker_id)))
+        logger.info(f"✅ Pipeline 워커 {self.concurrency}개 시작 ({self._instance_id})")
+
+    def notify(self):
+        """새 job 등록 알림 (폴링 주기를 기다리지 않고 즉시 claim)"""
+        self._wakeup.set()
+
+    async def _worker_loop(self, worker_id: str):
+        while not self._stopping:
+            try:
+                state = await self.backend.claim(worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"[Worker {worker_id}] claim 실패: {e}", exc_info=True)
+                state = None
+
+            if state is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self._run_job(worker_id, state)
+
+    async def _run_job(self, worker_id: str, state: PipelineState):
+        job_id = state["job_id"]
+        self.active_jobs[job_id] = worker_id
+        job = asyncio.create_task(self.handler(state, worker_id))
+        heartbeat = asyncio.create_task(self._heartbeat_loop(job_id, worker_id, job))
+        logger.info(f"[Worker {worker_id}] ▶ job 실행: {job_id}")
+
+        try:
+            await job
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False:
+                # lease 상실로 취소됨 → 다른 워커가 실행 중이므로 반환하지 않고 다음 job으로
+                if asyncio.current_task().cancelling():
+                    raise
+                logger.warning(f"[Worker {worker_id}] lease 상실로 job 중단: {job_id}")
+                return
+            # 인스턴스 종료: 다른 워커가 바로 가져갈 수 있도록 반환
+            logger.warning(f"[Worker {worker_id}] job 중단 → 대기열 반환: {job_id}")
+            await asyncio.shield(self.backend.requeue(job_id, worker_id))
+            raise
+        except Exception as e:
+            logger.error(f"[Worker {worker_id}] job 처리 오류: {job_id}, error={e}", exc_info=True)
+        finally:
+            heartbeat.cancel()
+            self.active_jobs.pop(job_id, None)
+
+    async def _heartbeat_loop(self, job_id: str, worker_id: str, job: asyncio.Task) -> bool:
+        """lease 연장, 소유권을 잃으면 job task를 취소하고 False 반환"""
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.backend.heartbeat(job_id, worker_id, self.lease_seconds):
+                    logger.warning(f"[Worker {worker_id}] lease 소유권 상실 → job 취소: {job_id}")
+                    job.cancel()
+                    return False
+            except Exception as e:
+                logger.error(f"[Worker {worker_id}] heartbeat 실패: {job_id}, error={e}")
+
+    async def stop(self, timeout: float):
+        """
+        새 job claim 중단 후 실행 중 job 완료를 timeout까지 대기
+        남은 job은 취소하여 대기열로 반환
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if not self._tasks:
+            return
+
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks.clear()
+        logger.info(f"Pipeline 워커 종료 (중단된 job {len(pending)}개)")
+
+
+# 싱글톤
+_worker_pool: Optional[PipelineWorkerPool] = None
+
+def start_worker_pool(handler: JobHandler) -> PipelineWorkerPool:
+    """워커 풀 생성 및 시작 (앱 시작 시 1회)"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = PipelineWorkerPool(
+            backend=get_job_queue(),
+            handler=handler,
+            concurrency=settings.PIPELINE_WORKER_CONCURRENCY,
+            poll_interval=settings.PIPELINE_POLL_INTERVAL,
+            lease_seconds=settings.PIPELINE_LEASE_SECONDS,
+        )
+        _worker_pool.start()
+    return _worker_pool
+
+
+def get_worker_pool() -> Optional[PipelineWorkerPool]:
+    return _worker_pool
+
+
+async def stop_worker_pool():
+    """앱 종료 시 워커 풀 정리"""
+    global _worker_pool
+    if _worker_pool is not None:
+        await _worker_pool.stop(timeout=settings.PIPELINE_SHUTDOWN_TIMEOUT)
+        _worker_pool = None
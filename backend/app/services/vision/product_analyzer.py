@@ -2,7 +2,8 @@
 제품 이미지 분석 (Vision AI)
 """
 import json
-from typing import Optional, Dict
+import mimetypes
+from typing import Optional, Dict, Union
 from pathlib import Path
 from config import settings
 from .providers import GeminiVisionProvider
@@ -28,29 +29,37 @@ class ProductAnalyzer:
     
     async def analyze(
         self, 
-        image_path: str,
-        custom_prompt: Optional[str] = None  # ⭐ Few-shot 프롬프트
+        image: Union[str, bytes],
+        custom_prompt: Optional[str] = None,  # ⭐ Few-shot 프롬프트
+        mime_type: Optional[str] = None
     ) -> Dict:
         """
         이미지 분석 실행 (Few-shot Learning 지원)
         
         Args:
-            image_path: 이미지 파일 경로
+            image: 이미지 파일 경로 또는 인코딩된 이미지 bytes (업로드 시 축소 디코딩 결과)
             custom_prompt: 커스텀 프롬프트 (Few-shot Learning용, 선택)
+            mime_type: bytes의 MIME 타입 (None이면 경로로 추정, 기본 image/jpeg)
             
         Returns:
             Dict: 분석 결과
                 - success: bool
                 - category, sub_category, color, material, fit, style_tags, confidence
         """
-        print(f"\n🔍 이미지 분석 시작: {image_path}")
-        
-        # 파일 존재 확인
-        if not Path(image_path).exists():
-            return {
-                'success': False,
-                'error': f'File not found: {image_path}'
-            }
+        if isinstance(image, bytes):
+            print(f"\n🔍 이미지 분석 시작: {len(image)} bytes")
+            image_bytes = image
+        else:
+            print(f"\n🔍 이미지 분석 시작: {image}")
+            
+            # 파일 존재 확인
+            if not Path(image).exists():
+                return {
+                    'success': False,
+                    'error': f'File not found: {image}'
+                }
+            image_bytes = Path(image).read_bytes()
+            mime_type = mime_type or mimetypes.guess_type(image)[0]
         
         # ⭐ 프롬프트 선택
         if custom_prompt:
@@ -61,7 +70,7 @@ class ProductAnalyzer:
             print("📝 기본 프롬프트 사용")
         
         # Vision AI 호출
-        response = await self.vision_provider.analyze_image(image_path, prompt)
+        response = await self.vision_provider.analyze_image(image_bytes, mime_type or "image/jpeg", prompt)
         
         if not response.get('success'):
             print(f"❌ Vision AI 실패: {response.get('error')}")
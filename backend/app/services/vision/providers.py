@@ -3,9 +3,9 @@
 """
 from abc import ABC, abstractmethod
 from typing import Dict, Any
-from google import genai
 from google.genai import types
-import mimetypes
+
+from app.core.clients import get_genai_client
 
 
 # 1. 추상 클래스
@@ -14,59 +14,44 @@ class VisionProvider(ABC):
     @abstractmethod
     async def analyze_image(
         self, 
-        image_path: str, 
+        image_bytes: bytes, 
+        mime_type: str,
         prompt: str,) -> Dict[str, Any]:
-        """이미지 분석 (하위 클래스에서 구현)"""
+        """이미지 분석 (하위 클래스에서 구현) - 인코딩된 이미지 bytes를 직접 받음"""
         pass
 
 # 2. 구현 클래스
 class GeminiVisionProvider(VisionProvider):
     def __init__(self, api_key: str):
-        # 1. Client 생성
-        self.client = genai.Client(api_key=api_key)
+        # 1. Client (API 키별 공용 인스턴스)
+        self.client = get_genai_client(api_key)
  
     async def analyze_image(
             self, 
-            image_path: str, 
+            image_bytes: bytes, 
+            mime_type: str,
             prompt: str) -> Dict[str, Any]:
         """Gemini API로 이미지 분석"""
         
         try:
-            # 1. 이미지 로드
-            with open(image_path, 'rb') as f:
-                image_bytes = f.read()
-
-            # 2. MIME 타입 자동 감지
-            
-            mime_type, _ = mimetypes.guess_type(image_path)
-            if not mime_type:
-                mime_type = "image/jpeg"  # 기본값
-
-            # 3. Part 객체 생성
+            # 1. Part 객체 생성 (bytes + MIME 타입은 호출 측에서 전달)
             image_part = types.Part.from_bytes(
-                data=image_bytes,  # 파일 바이트
+                data=image_bytes,  # 인코딩된 이미지 바이트
                 mime_type=mime_type
             )
 
-            # 4. API 호출
-            response = self.client.models.generate_content(
+            # 2. API 호출 (비동기, 이벤트 루프 비차단)
+            response = await self.client.aio.models.generate_content(
                 model='gemini-2.5-flash',  # 최신 모델!
                 contents=[prompt, image_part]
             )
             
-            # 5. 응답 받기
+            # 3. 응답 받기
             return {
                 "content": response.text,
                 "success": True
             }
         
-        except FileNotFoundError:
-            return {
-                "content": None,
-                "success": False,
-                "error": f"이미지 파일을 찾을 수 없습니다: {image_path}"
-            }
-
         except Exception as e:
             return {
                 "content": None,
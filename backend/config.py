@@ -25,12 +25,28 @@ class Settings(BaseSettings):
     # ===== GCS =====
     GCS_BUCKET_NAME: Optional[str] = None
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None  
+
+    # ===== Storage (app/core/storage.py) =====
+    STORAGE_BACKEND: str = "gcs"  # gcs / local (개발·벤치마크) / memory (테스트)
+    STORAGE_CONCURRENCY: int = 16  # 인스턴스당 동시 스토리지 요청 수
+    STORAGE_MAX_CONNECTIONS: int = 32  # GCS HTTP 연결 풀 크기 (재사용)
+    STORAGE_LOCAL_ROOT: str = "./storage"  # local 백엔드 저장 디렉토리
+    STORAGE_PUBLIC_BASE_URL: Optional[str] = None  # local 백엔드 공개 URL (None = file:// URI)
+    ZIP_FETCH_CONCURRENCY: int = 8  # 일괄 다운로드(ZIP) 동시 조회 수 (app/core/zip_stream.py)
+    BLOB_CACHE_ENABLED: bool = True  # 스토리지 읽기 캐시 (app/core/blob_cache.py)
+    BLOB_CACHE_DIR: str = "/tmp/adgen_blob_cache"  # 디스크 계층 사용 시 마운트된 볼륨 경로로 지정
+    BLOB_CACHE_MEMORY_MB: int = 128
+    BLOB_CACHE_DISK_MB: int = 0  # 0 = 메모리만 사용 (Cloud Run의 /tmp는 메모리이므로 기본 비활성)
+    IMAGE_DELIVERY_MODE: str = "proxy"  # redirect (서명 URL로 스토리지 직접 다운로드) / proxy (API 경유, ETag·Range 지원)
+    SIGNED_URL_TTL_SECONDS: int = 300
+    IMAGE_CACHE_MAX_AGE: int = 3600  # proxy 응답 Cache-Control max-age (초)
     
     # ===== Replicate API =====
     REPLICATE_API_TOKEN: Optional[str] = None  
 
     # ===== Google Gemini API ===== 
     GOOGLE_API_KEY: Optional[str] = None
+    VISION_MAX_SIDE: int = 1024  # Vision 분석 입력 최대 변 길이 (큰 원본은 축소 디코딩 후 전송)
     
     # ===== Google Gemini Image Generation API =====
     GOOGLE_MODEL_API_KEY: Optional[str] = None  # ← 추가된 부분
@@ -43,6 +59,65 @@ class Settings(BaseSettings):
     GPU_SERVER_TIMEOUT: int = 120  # 초 단위
     USE_GPU_SERVER: bool = True  # ← 추가: GPU 서버 사용 여부
 
+    # ===== 외부 API HTTP 연결 (공용 클라이언트) =====
+    HTTP_TIMEOUT: float = 60.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    PROVIDER_MAX_RETRIES: int = 2  # 일시적 오류(네트워크, 429, 5xx) 재시도 횟수
+    PROVIDER_RETRY_BACKOFF: float = 1.0  # 초 단위, 재시도마다 2배
+    PROVIDER_CONCURRENCY: dict = {"replicate": 4, "gemini": 4, "openai": 8}  # 인스턴스당 provider별 동시 호출 수
+
+    # ===== Background Removal (rembg) =====
+    REMBG_MODEL: str = "u2net"  # u2net / u2netp / isnet-general-use / u2net_custom (REMBG_MODEL_PATH, int8 양자화 모델 등)
+    REMBG_MODEL_PATH: Optional[str] = None  # u2net_custom용 ONNX 파일 경로
+    REMBG_SESSION_POOL_SIZE: int = 1  # 프로세스당 ONNX 세션 수 (= 동시 추론 수)
+    REMBG_INTRA_OP_THREADS: int = 0  # 세션당 추론 스레드 수 (0 = onnxruntime 기본값)
+    REMBG_WARMUP: bool = True  # 앱 시작 시 세션 로드 + 1회 추론
+    REMBG_MAX_BATCH_SIZE: int = 8  # 동시 요청을 묶어 한 번에 추론하는 최대 이미지 수
+    REMBG_BATCH_WINDOW: float = 0.02  # 초 단위, 요청 수집 대기 시간 (micro-batch)
+
+    # ===== Image Process Pool =====
+    IMAGE_PROCESS_WORKERS: int = 2  # OpenCV/PIL 필터 실행 프로세스 수 (0 = 프로세스 풀 대신 스레드)
+    IMAGE_TILE_WORKERS: int = 0  # 큰 이미지 타일 병렬 처리 스레드 수 (0 = CPU 코어 수 / 프로세스 수, 1 = 끔)
+    IMAGE_TILE_MIN_PIXELS: int = 1_000_000  # 이보다 작은 이미지는 타일로 나누지 않음
+
+    # ===== Content Crop (배경 제거 결과) =====
+    CROP_TO_CONTENT: bool = True  # 배경 제거 결과를 알파 영역(+여백)으로 잘라 저장/업로드
+    CROP_MARGIN: int = 32  # 알파 bbox 바깥으로 남길 여백 (px)
+
+    # ===== Image Encoding (단계별 인코딩 정책: png / png-fast / webp-lossless / jpeg) =====
+    IMAGE_ENCODING: dict = {
+        "removed_bg": "webp-lossless",    # 배경 제거 결과 (투명 영역 → 무손실)
+        "fitted": "jpeg",                 # 가상 피팅 결과 (불투명)
+        "background": "jpeg",             # 배경 생성 결과 (불투명)
+        "vton_garment": "webp-lossless",  # VTON 임시 의류 업로드
+        "gemini_input": "jpeg",           # Gemini 배경 생성 입력 (투명 영역이 있으면 png-fast)
+    }
+
+    # ===== Pipeline Artifacts =====
+    ARTIFACT_MEMORY_LIMIT_MB: int = 256  # job별 메모리 보관 한도 (초과 시 디스크 spill)
+    ARTIFACT_SPILL_DIR: Optional[str] = None  # None = 시스템 임시 디렉토리
+
+    # ===== Pipeline Job Queue =====
+    PIPELINE_QUEUE_BACKEND: str = "sql"  # sql (인스턴스 간 공유) / memory (단일 프로세스 개발·테스트용)
+    PIPELINE_WORKER_CONCURRENCY: int = 4  # 인스턴스당 동시 실행 job 수 (provider 호출은 PROVIDER_CONCURRENCY로 별도 제한)
+    PIPELINE_MAX_PENDING: int = 50  # 대기 job이 이 수 이상이면 신규 요청 429
+    PIPELINE_BATCH_MAX_JOBS: int = 50  # 배치 요청 1회 최대 job 수 (상품 수 × 스타일 수, PIPELINE_MAX_PENDING 이하)
+    PIPELINE_POLL_INTERVAL: float = 2.0  # 초 단위 (빈 큐 폴링 / 다른 인스턴스 job 상태 동기화)
+    PIPELINE_LEASE_SECONDS: int = 120  # 워커 lease (heartbeat 없으면 만료 후 재실행)
+    PIPELINE_MAX_ATTEMPTS: int = 3
+    PIPELINE_SHUTDOWN_TIMEOUT: float = 8.0  # 종료 시 실행 중 job 대기 시간 (Cloud Run SIGTERM 유예 10초)
+
+    # ===== Pipeline Result Cache =====
+    RESULT_CACHE_BACKEND: str = "db"  # db (DB 인덱스 + GCS, 인스턴스 간 공유) / disk (인스턴스별) / none
+    RESULT_CACHE_DIR: str = "/tmp/adgen_result_cache"  # disk 사용 시 마운트된 볼륨 경로로 지정 (Cloud Run의 /tmp는 메모리)
+    RESULT_CACHE_MAX_MB: int = 1024
+    RESULT_CACHE_TTL_HOURS: int = 168  # 7일
+
+    # ===== Pipeline WebSocket =====
+    WS_COALESCE_INTERVAL: float = 0.1  # 초 단위, 이 시간 안의 상태 변경은 한 번에 전송 (0 = 즉시)
+    WS_SEND_TIMEOUT: float = 5.0  # 연결별 전송 제한 시간 (초과 시 연결 해제)
+
     # ===== CORS ===== 
     ALLOWED_ORIGINS: str = '["http://localhost:3000", "https://adgen-frontend-613605394208.asia-northeast3.run.app"]'
     
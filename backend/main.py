@@ -1,17 +1,53 @@
 """
 AdGen Pipeline - FastAPI Entry Point
 """
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from config import settings
+from app.core.clients import close_clients
+from app.core.storage import close_storage
 from app.api.routes import auth, contents, history
-from app.api.routes.pipeline import router as pipeline_router
+from app.api.routes.pipeline import (
+    router as pipeline_router,
+    start_pipeline_workers,
+    stop_pipeline_workers,
+)
+from app.services.img_processing.background_removal import warmup_background_removal
+from app.services.img_processing.process_pool import shutdown_image_pool
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 배경 제거 모델 미리 로드 (첫 job이 모델 로드 비용을 부담하지 않도록)
+    if settings.REMBG_WARMUP:
+        try:
+            await asyncio.to_thread(warmup_background_removal)
+        except Exception as e:
+            logger.error(f"rembg warmup 실패 (첫 요청 시 로드): {e}")
+
+    # 파이프라인 워커 풀 시작 (job 큐 소비)
+    start_pipeline_workers()
+    yield
+    # 실행 중 job 정리 후 공용 외부 API 클라이언트 연결 정리
+    await stop_pipeline_workers()
+    await shutdown_image_pool()
+    await close_clients()
+    close_storage()
+
 
 app = FastAPI(
     title="AdGen Pipeline API",
     description="LangGraph 기반 AI 광고 생성 파이프라인",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -35,3 +71,9 @@ app.include_router(pipeline_router, prefix="/api/v1", tags=["pipeline"])
 @app.get("/health")
 async def health():
     return {"status": "ok", "version": "2.0.0"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 메트릭 (단계별 / provider별 지연 시간 히스토그램)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
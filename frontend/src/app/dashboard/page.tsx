@@ -12,6 +12,7 @@ import GenerateButton from './components/GenerateButton';
 import StepCard from './components/StepCard';
 import AdInputForm from './components/AdInputForm';
 import { API_URL } from '@/lib/api';
+import { applyPipelineMessage } from '@/lib/pipelineSocket';
 
 export default function DashboardPage() {
   const router = useRouter();
@@ -246,12 +247,16 @@ export default function DashboardPage() {
     const baseUrl = API_URL.replace(/\/$/, '');
     const wsUrl = API_URL.replace('http://', 'ws://').replace('https://', 'wss://');
     const ws = new WebSocket(`${wsUrl}/api/v1/ws/pipeline/${jobId}`);
+    // 서버는 snapshot 1회 후 변경분(patch)만 전송 → 누적 적용한 전체 상태로 처리
+    let pipelineState: any = null;
   
     ws.onopen = () => console.log('🔌 WebSocket 연결됨');
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
-      if (data.type !== 'ping') {
-        handleWebSocketUpdate(data);
+      if (data.type === 'ping') return;
+      pipelineState = applyPipelineMessage(pipelineState, data);
+      if (pipelineState) {
+        handleWebSocketUpdate(pipelineState);
       }
     };
     ws.onerror = (error) => console.error('❌ WebSocket 에러:', error);
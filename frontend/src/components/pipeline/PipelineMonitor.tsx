@@ -12,6 +12,7 @@ import ReactFlow, {
 } from 'reactflow';
 import 'reactflow/dist/style.css';
 import PipelineNodeComponent from './PipelineNode';
+import { applyPipelineMessage } from '@/lib/pipelineSocket';
 
 // ===== 타입 =====
 export type StepStatus = 'pending' | 'running' | 'success' | 'failed' | 'skipped';
@@ -32,6 +33,8 @@ export interface PipelineStateMsg {
   error?: string;
   error_step?: number;
   final_image_url?: string;
+  styles?: string[] | null;
+  branches?: Record<string, Omit<PipelineStateMsg, 'job_id' | 'styles' | 'branches'>>;
   updated_at: string;
 }
 
@@ -99,6 +102,8 @@ export default function PipelineMonitor({ jobId, apiBaseUrl }: PipelineMonitorPr
 
     const wsUrl = apiBaseUrl.replace('https://', 'wss://').replace('http://', 'ws://');
     const ws = new WebSocket(`${wsUrl}/ws/pipeline/${jobId}`);
+    // snapshot 이후 patch를 누적 적용한 최신 상태
+    let current: PipelineStateMsg | null = null;
 
     ws.onopen = () => {
       setWsStatus('connected');
@@ -109,7 +114,9 @@ export default function PipelineMonitor({ jobId, apiBaseUrl }: PipelineMonitorPr
         const data = JSON.parse(event.data);
         if (data.type === 'ping') return;
 
-        const msg = data as PipelineStateMsg;
+        current = applyPipelineMessage(current, data);
+        if (!current) return;
+        const msg = current;
         setPipelineState(msg);
 
         // 노드 상태 업데이트
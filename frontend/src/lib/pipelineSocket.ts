@@ -0,0 +1,45 @@
+// 파이프라인 WebSocket 메시지 처리
+// 서버는 연결 직후 전체 상태(snapshot)를 보내고, 이후에는 변경분만 JSON Patch로 전송
+
+export interface JsonPatchOp {
+  op: 'add' | 'remove' | 'replace';
+  path: string;
+  value?: any;
+}
+
+const unescapePointer = (token: string) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+
+// JSON Patch 적용 (변경된 경로만 복사 → React 상태 비교에 안전)
+export function applyJsonPatch<T extends Record<string, any>>(doc: T, ops: JsonPatchOp[]): T {
+  let result: any = doc;
+  for (const { op, path, value } of ops) {
+    const keys = path.split('/').slice(1).map(unescapePointer);
+    const root = { ...result };
+    let target = root;
+    for (const key of keys.slice(0, -1)) {
+      target[key] = { ...(target[key] ?? {}) };
+      target = target[key];
+    }
+    const last = keys[keys.length - 1];
+    if (op === 'remove') {
+      delete target[last];
+    } else {
+      target[last] = value;
+    }
+    result = root;
+  }
+  return result;
+}
+
+// snapshot / patch 메시지 → 최신 상태 (ping 등 상태 메시지가 아니면 이전 상태 유지)
+export function applyPipelineMessage<T extends Record<string, any>>(prev: T | null, data: any): T | null {
+  if (data.type === 'snapshot') {
+    const { type, ...state } = data;
+    return state as T;
+  }
+  if (data.type === 'patch') {
+    if (!prev) return prev;
+    return applyJsonPatch(prev, data.ops);
+  }
+  return prev;
+}